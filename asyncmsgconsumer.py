@@ -0,0 +1,158 @@
+import abc
+import asyncio
+import logging
+from queue import Empty
+from threading import Thread, Lock, current_thread
+from typing import TYPE_CHECKING, Callable, Optional
+
+import globalvars
+from errors import ParameterError
+from moduleid import ModuleID
+from msgconsumer import BaseMsgConsumer
+from msgqueue import nonBlocking
+from msgs.message import Message
+
+if TYPE_CHECKING:
+    from dispatcher import Dispatcher
+
+"""
+Asyncio message consumer - alternative to the thread-based MsgConsumer.
+All asyncio consumers of one dispatcher share a single event loop of the SegmentRunner.
+"""
+
+# maximum messages consumed in one drain before yielding the loop to other consumers
+DRAIN_BATCH = 32
+
+
+class SegmentRunner(Thread):
+    """
+    Event loop thread hosting all asyncio consumers of one dispatcher
+    """
+
+    def __init__(self, dispatcher: 'Dispatcher'):
+        Thread.__init__(self, name='SegmentRunner ' + dispatcher.name)
+        self.setDaemon(True)
+        self.loop = asyncio.new_event_loop()
+        dispatcher.segmentRunner = self
+        self.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            # consumers distribute in the loop thread, a full queue of a receiver must not stall the whole loop
+            with nonBlocking():
+                self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def isLoopThread(self) -> bool:
+        return current_thread() is self
+
+    def callSoon(self, fn: Callable, *args) -> None:
+        """
+        Thread-safe
+        """
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def callLater(self, delay: float, fn: Callable, *args) -> None:
+        """
+        Thread-safe
+        """
+        if self.isLoopThread():
+            self.loop.call_later(delay, fn, *args)
+        else:
+            self.loop.call_soon_threadsafe(self.loop.call_later, delay, fn, *args)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class AsyncMsgConsumer(BaseMsgConsumer):
+    """
+    Same contract as MsgConsumer - _consume, _initializeInThread, _getGroupIDs.
+    Both methods are called in the loop thread of the segment runner and must not block.
+    _consume can also be a coroutine, it is then scheduled as a task.
+    """
+
+    # noinspection PyShadowingBuiltins
+    def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher'):
+        if dispatcher.segmentRunner is None:
+            raise ParameterError("No segment runner for " + str(dispatcher))
+        super().__init__(id, name, dispatcher)
+        self._runner = dispatcher.segmentRunner  # type: SegmentRunner
+        self._drainLock = Lock()
+        self._drainScheduled = False
+        globalvars.consumerRegistry.register(self)
+        self._runner.callSoon(self.__initialize)
+
+    def __initialize(self):
+        try:
+            self._initializeInThread()
+        except Exception as e:
+            logging.error(e, exc_info=True)
+
+    def is_alive(self) -> bool:
+        return not self.stopped() and self._runner.is_alive()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._stopEvent.wait(timeout)
+
+    def receive(self, msg: 'Message'):
+        self.receiveQ.put(msg)
+        self._scheduleDrain()
+
+    def _scheduleDrain(self) -> None:
+        # one scheduled drain serves all messages queued meanwhile
+        with self._drainLock:
+            if self._drainScheduled:
+                return
+            self._drainScheduled = True
+        self._runner.callSoon(self._drain)
+
+    def _drain(self) -> None:
+        with self._drainLock:
+            self._drainScheduled = False
+        for _ in range(DRAIN_BATCH):
+            try:
+                msg, enqueuedAt = self.receiveQ.getEntry(block=False)
+            except Empty:
+                return
+            if msg is not None and not self.stopped():
+                try:
+                    self._consumeEntry(msg, enqueuedAt)
+                except Exception as e:
+                    # a failing batch must not end draining
+                    logging.error(e, exc_info=True)
+        # more messages waiting, continuing after other consumers get their turn
+        self._scheduleDrain()
+
+    def _consumeOne(self, msg: 'Message') -> None:
+        try:
+            result = self._consume(msg)
+            if asyncio.iscoroutine(result):
+                self._runner.loop.create_task(result)
+        except Exception as e:
+            logging.error(e, exc_info=True)
+
+    def _callLater(self, delay: float, fn: Callable, *args) -> None:
+        """
+        Timer running in the loop, replaces threading.Timer
+        """
+        self._runner.callLater(delay, self.__callIfRunning, fn, *args)
+
+    def __callIfRunning(self, fn: Callable, *args) -> None:
+        if not self.stopped():
+            try:
+                fn(*args)
+            except Exception as e:
+                logging.error(e, exc_info=True)
+
+    # consuming the message
+    @abc.abstractmethod
+    def _consume(self, msg: 'Message'):
+        """
+        Consume the message
+        :param msg: Message to consume
+        :return: was consumed, or a coroutine
+        """
+        pass
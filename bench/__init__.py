@@ -0,0 +1,5 @@
+"""
+Headless benchmark of the PC/MCU/RC dispatcher topology with synthetic modules.
+
+Usage: python3 -m bench [--transport STREAM] [--mix status --mix bursts] [--count 10000] [--rate 2000]
+"""
@@ -0,0 +1,43 @@
+import argparse
+import json
+import logging
+import sys
+
+from bench.runner import runMix
+from bench.topology import Topology
+from bench.traffic import MIXES, getMixNames
+from gateways import GatewayTransport
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python3 -m bench', description="Dispatcher topology benchmark")
+    parser.add_argument('--transport', choices=[t.name for t in GatewayTransport], default='IN_PROCESS',
+                        help="transport of both gateway pairs")
+    parser.add_argument('--mix', action='append', choices=getMixNames(),
+                        help="traffic mix, can be repeated. Default: all")
+    parser.add_argument('--count', type=int, default=10000, help="messages per mix")
+    parser.add_argument('--rate', type=float, default=None, help="messages per second. Default: as fast as possible")
+    parser.add_argument('--output', default=None, help="JSON result file. Default: stdout")
+    args = parser.parse_args()
+
+    transport = GatewayTransport[args.transport]
+    topology = Topology(transport, transport)
+    results = {
+        'transport': transport.name,
+        'count': args.count,
+        'rate': args.rate,
+        'mixes': {name: runMix(topology, MIXES[name], args.count, args.rate)
+                  for name in (args.mix or getMixNames())},
+    }
+    topology.close()
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s:%(message)s')
+    main()
@@ -0,0 +1,75 @@
+from threading import Lock
+from time import monotonic
+from typing import TYPE_CHECKING, List
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgconsumer import MsgConsumer
+from msgs.message import Message, NO_CORRELATION
+
+if TYPE_CHECKING:
+    from dispatcher import Dispatcher
+
+"""
+Synthetic modules of the benchmark topology
+"""
+
+# correlationID is 16 bits wide
+MAX_SEQUENCE = 0xFFFF
+
+
+class SendClock:
+    """
+    Send times of messages in flight, indexed by the sequence carried in msg.correlationID.
+    Unlike msg.createdAt the correlationID survives encoding by stream and shared memory gateways.
+    """
+
+    def __init__(self):
+        self._sentAt = [0.0] * (MAX_SEQUENCE + 1)
+        self._lastSequence = NO_CORRELATION
+        self._lock = Lock()
+        # disabled for replayed traffic carrying its own correlationIDs
+        self.enabled = True
+
+    def stamp(self, msg: Message) -> None:
+        with self._lock:
+            self._lastSequence = self._lastSequence % MAX_SEQUENCE + 1
+            msg.correlationID = self._lastSequence
+        self._sentAt[msg.correlationID] = monotonic()
+
+    def getLatency(self, msg: Message, receivedAt: float) -> float:
+        return receivedAt - self._sentAt[msg.correlationID]
+
+
+class SyntheticModule(MsgConsumer):
+    """
+    Producer and sink in place of a real source or UI, records the end-to-end latency of each received message
+    """
+
+    # noinspection PyShadowingBuiltins
+    def __init__(self, id: ModuleID, dispatcher: 'Dispatcher', groupIDs: List[GroupID], clock: SendClock):
+        self._groupIDs = groupIDs
+        self._clock = clock
+        self._latencies = []  # type: List[float]
+        self.lastReceivedAt = 0.0
+        self.receivedCount = 0
+        super().__init__(id, name='Synthetic ' + id.name, dispatcher=dispatcher)
+
+    def _consume(self, msg: Message):
+        receivedAt = monotonic()
+        self.receivedCount += 1
+        self.lastReceivedAt = receivedAt
+        if msg.correlationID != NO_CORRELATION and self._clock.enabled:
+            self._latencies.append(self._clock.getLatency(msg, receivedAt))
+
+    def _getGroupIDs(self) -> List[GroupID]:
+        return self._groupIDs
+
+    def send(self, msg: Message) -> None:
+        self._clock.stamp(msg)
+        self.dispatcher.distribute(msg, self.id)
+
+    def takeLatencies(self) -> List[float]:
+        latencies = self._latencies
+        self._latencies = []
+        return latencies
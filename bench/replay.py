@@ -0,0 +1,104 @@
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import List, Optional
+
+import globalvars
+from bench.runner import waitForDelivery, summarizeHop, countDropped
+from bench.topology import Topology
+from gateways import GatewayTransport
+from msgid import MsgID
+from msgs.message import Message
+from trafficrecorder import RecordedMsg, mergeRecordings
+
+"""
+Replay of traffic recorded by trafficrecorder against the synthetic topology.
+
+Usage: python3 -m bench.replay RECORDING [RECORDING ...] [--speed 2] [--fast] [--transport STREAM]
+"""
+
+
+def replay(topology: Topology, records: List[RecordedMsg], speed: Optional[float]) -> dict:
+    """
+    Only messages originated by modules of the topology are injected, at the dispatchers of those modules.
+    Messages relayed by gateways in the recording are reproduced by the topology itself.
+    :param speed: multiple of the recorded pace, None = as fast as possible
+    """
+    originals = [record for record in records
+                 if record.senderID == record.msg.fromID and record.msg.fromID in topology.modules]
+    consumers = globalvars.consumerRegistry.getAll()
+    droppedBefore = countDropped(consumers)
+    receivedBefore = sum(module.receivedCount for module in topology.modules.values())
+    for consumer in consumers:
+        consumer.metrics.reset()
+    maxLagSecs = 0.0
+    startedAt = time.monotonic()
+    recordedStart = originals[0].timestamp if originals else 0.0
+    for record in originals:
+        if speed is not None:
+            due = startedAt + (record.timestamp - recordedStart) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                maxLagSecs = max(maxLagSecs, -delay)
+        _renewCreatedAt(record.msg)
+        module = topology.modules[record.msg.fromID]
+        module.dispatcher.distribute(record.msg, module.id)
+    sentSecs = time.monotonic() - startedAt
+    waitForDelivery(topology)
+    lastReceivedAt = max([startedAt] + [module.lastReceivedAt for module in topology.modules.values()])
+    return {
+        'recorded': len(records),
+        'replayed': len(originals),
+        'delivered': sum(module.receivedCount for module in topology.modules.values()) - receivedBefore,
+        'recordedSecs': (originals[-1].timestamp - recordedStart) if originals else 0.0,
+        'sendSecs': sentSecs,
+        'durationSecs': lastReceivedAt - startedAt,
+        'maxLagSecs': maxLagSecs,
+        'hops': {consumer.name: summarizeHop(consumer) for consumer in consumers},
+        'dropped': countDropped(consumers) - droppedBefore,
+    }
+
+
+def _renewCreatedAt(msg: Message) -> None:
+    """
+    TTLs count from the replay, not from reading the recording
+    """
+    msg.createdAt = time.monotonic()
+    if msg.typeID == MsgID.BATCH_MSG:
+        for innerMsg in msg.msgs:
+            innerMsg.createdAt = msg.createdAt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python3 -m bench.replay', description="Replay of recorded traffic")
+    parser.add_argument('recordings', nargs='+', help="recording files, segment recordings are merged")
+    parser.add_argument('--transport', choices=[t.name for t in GatewayTransport], default='IN_PROCESS',
+                        help="transport of both gateway pairs")
+    parser.add_argument('--speed', type=float, default=1.0, help="multiple of the recorded pace")
+    parser.add_argument('--fast', action='store_true', help="as fast as possible, ignoring the recorded pace")
+    parser.add_argument('--output', default=None, help="JSON result file. Default: stdout")
+    args = parser.parse_args()
+
+    records = mergeRecordings(args.recordings)
+    transport = GatewayTransport[args.transport]
+    topology = Topology(transport, transport)
+    # replayed correlationIDs are not benchmark sequences
+    topology.clock.enabled = False
+    results = replay(topology, records, None if args.fast else args.speed)
+    results['transport'] = transport.name
+    topology.close()
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s:%(message)s')
+    main()
@@ -0,0 +1,98 @@
+import time
+from typing import Dict, List, Optional
+
+import globalvars
+from bench.topology import Topology
+from bench.traffic import TrafficMix
+
+"""
+Driving a traffic mix through the topology and collecting the results
+"""
+
+# delivery is complete when no message arrived for this long
+SETTLE_SECS = 0.5
+SETTLE_TIMEOUT = 30.0
+PERCENTILES = (('p50', 0.5), ('p99', 0.99), ('p999', 0.999))
+
+
+def runMix(topology: Topology, mix: TrafficMix, count: int, rate: Optional[float]) -> dict:
+    """
+    :param rate: messages per second, None = as fast as possible
+    """
+    consumers = globalvars.consumerRegistry.getAll()
+    droppedBefore = countDropped(consumers)
+    coalescedBefore = _countCoalesced(consumers)
+    for consumer in consumers:
+        consumer.metrics.reset()
+    startedAt = time.monotonic()
+    for index in range(count):
+        mix.send(topology.modules, index)
+        if mix.burstPauseSecs > 0 and (index + 1) % mix.burstSize == 0:
+            time.sleep(mix.burstPauseSecs)
+        elif rate is not None:
+            delay = startedAt + (index + 1) / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    sentSecs = time.monotonic() - startedAt
+    waitForDelivery(topology)
+    latencies = []  # type: List[float]
+    lastReceivedAt = startedAt
+    for module in topology.modules.values():
+        latencies.extend(module.takeLatencies())
+        lastReceivedAt = max(lastReceivedAt, module.lastReceivedAt)
+    durationSecs = max(lastReceivedAt - startedAt, 1e-9)
+    return {
+        'sent': count,
+        'delivered': len(latencies),
+        'sendSecs': sentSecs,
+        'durationSecs': durationSecs,
+        'msgsPerSec': count / durationSecs,
+        'deliveriesPerSec': len(latencies) / durationSecs,
+        'latency': _summarize(latencies),
+        'hops': {consumer.name: summarizeHop(consumer) for consumer in consumers},
+        'coalesced': _countCoalesced(consumers) - coalescedBefore,
+        'dropped': countDropped(consumers) - droppedBefore,
+    }
+
+
+def waitForDelivery(topology: Topology) -> None:
+    deadline = time.monotonic() + SETTLE_TIMEOUT
+    while time.monotonic() < deadline:
+        lastReceivedAt = max(module.lastReceivedAt for module in topology.modules.values())
+        queued = sum(queue.qsize() for consumer in globalvars.consumerRegistry.getAll()
+                     for queue in consumer.getQueues().values())
+        if queued == 0 and time.monotonic() - lastReceivedAt > SETTLE_SECS:
+            return
+        time.sleep(0.05)
+
+
+def _summarize(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    latencies.sort()
+    summary = {name: latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+               for name, fraction in PERCENTILES}
+    summary['mean'] = sum(latencies) / len(latencies)
+    summary['max'] = latencies[-1]
+    return summary
+
+
+def summarizeHop(consumer) -> dict:
+    """
+    Queueing time of the consumer, percentiles are bucket bounds of its histogram
+    """
+    histogram = consumer.metrics.queueLatency
+    summary = {name: histogram.percentile(fraction) for name, fraction in PERCENTILES}
+    summary['count'] = histogram.count
+    summary['mean'] = histogram.total / histogram.count if histogram.count > 0 else 0.0
+    summary['max'] = histogram.max
+    return summary
+
+
+def countDropped(consumers) -> int:
+    return sum(sum(queue.droppedCounts.values()) + queue.expiredCount
+               for consumer in consumers for queue in consumer.getQueues().values())
+
+
+def _countCoalesced(consumers) -> int:
+    return sum(queue.coalescedCount for consumer in consumers for queue in consumer.getQueues().values())
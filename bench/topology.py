@@ -0,0 +1,73 @@
+import time
+from typing import Dict
+
+import globalvars
+from dispatcher import Dispatcher
+from gateways import GatewayTransport, createGatewayPair
+from groupid import GroupID
+from moduleid import ModuleID
+from bench.consumers import SendClock, SyntheticModule
+
+"""
+The three segments of control.py with synthetic modules in place of the real sources and UIs
+"""
+
+PC_GATEWAY_IDS = [ModuleID.PC_MCU_SENDER]
+MCU_GATEWAY_IDS = [ModuleID.MCU_PC_SENDER, ModuleID.MCU_RC_SENDER]
+RC_GATEWAY_IDS = [ModuleID.RC_MCU_SENDER]
+
+ROUTES_TIMEOUT = 5.0
+
+# segment name -> modules with their groups, same placement as in control.py
+SEGMENT_MODULES = {
+    'PC': [(ModuleID.FILE_SOURCE, [GroupID.SOURCE]),
+           (ModuleID.RADIO_SOURCE, [GroupID.SOURCE]),
+           (ModuleID.CD_SOURCE, [GroupID.SOURCE]),
+           (ModuleID.WEBUI_PC, [GroupID.UI])],
+    'MCU': [(ModuleID.ANALOG_SOURCE, [GroupID.SOURCE]),
+            (ModuleID.VOLUME_OPERATOR, []),
+            (ModuleID.HEARTBEAT, [])],
+    'RC': [(ModuleID.UI_CONSOLE, [GroupID.UI]),
+           (ModuleID.WEBUI_RC, [GroupID.UI])],
+}
+
+
+class Topology:
+    """
+    Built once per process - consumers register in the global consumer registry
+    """
+
+    def __init__(self, pcMCUTransport: GatewayTransport, mcuRCTransport: GatewayTransport):
+        self.dispatchers = {
+            'PC': Dispatcher("On PC", gatewayIDs=PC_GATEWAY_IDS),
+            'MCU': Dispatcher("On MCU", gatewayIDs=MCU_GATEWAY_IDS),
+            'RC': Dispatcher("On RC", gatewayIDs=RC_GATEWAY_IDS),
+        }  # type: Dict[str, Dispatcher]
+        createGatewayPair(pcMCUTransport,
+                          'PC', self.dispatchers['PC'], ModuleID.PC_MCU_SENDER, ModuleID.MCU_PC_RECEIVER,
+                          'MCU', self.dispatchers['MCU'], ModuleID.MCU_PC_SENDER, ModuleID.PC_MCU_RECEIVER)
+        createGatewayPair(mcuRCTransport,
+                          'MCU', self.dispatchers['MCU'], ModuleID.MCU_RC_SENDER, ModuleID.RC_MCU_RECEIVER,
+                          'RC', self.dispatchers['RC'], ModuleID.RC_MCU_SENDER, ModuleID.MCU_RC_RECEIVER)
+        self.clock = SendClock()
+        self.modules = {}  # type: Dict[ModuleID, SyntheticModule]
+        for segment, modules in SEGMENT_MODULES.items():
+            for moduleID, groupIDs in modules:
+                self.modules[moduleID] = SyntheticModule(moduleID, self.dispatchers[segment], groupIDs, self.clock)
+        globalvars.consumersReadyEvent.set()
+        self._waitForRoutes()
+
+    def _waitForRoutes(self) -> None:
+        """
+        Announcements of all modules must cross the gateways before measuring
+        """
+        deadline = time.monotonic() + ROUTES_TIMEOUT
+        while not all(dispatcher.hasRouteTo(moduleID) for dispatcher in self.dispatchers.values()
+                      for moduleID in self.modules):
+            if time.monotonic() > deadline:
+                raise TimeoutError("Routes of synthetic modules not learned in " + str(ROUTES_TIMEOUT) + " s")
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        for consumer in globalvars.consumerRegistry.getAll():
+            consumer.close()
@@ -0,0 +1,96 @@
+from typing import Callable, Dict, List, Tuple
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgs.integermsg import IntegerMsg, BiIntegerMsg
+from msgs.message import Message
+from msgs.nodemsg import NodeMsg, NodeStruct, NodeItem
+from msgs.requestmsg import RequestMsg
+from bench.consumers import SyntheticModule
+
+"""
+Traffic mixes - sequences of (sender, message) driven through the topology
+"""
+
+# sender module and the message it distributes
+Traffic = Tuple[ModuleID, Message]
+
+NODE_CHILDREN = 200
+
+
+class TrafficMix:
+    def __init__(self, name: str, createTraffic: Callable[[int], Traffic], burstSize: int = 1,
+                 burstPauseSecs: float = 0.0):
+        """
+        :param createTraffic: index of the message -> traffic
+        :param burstSize: messages sent back to back before pausing for burstPauseSecs
+        """
+        self.name = name
+        self.createTraffic = createTraffic
+        self.burstSize = burstSize
+        self.burstPauseSecs = burstPauseSecs
+
+    def send(self, modules: Dict[ModuleID, SyntheticModule], index: int) -> None:
+        senderID, msg = self.createTraffic(index)
+        modules[senderID].send(msg)
+
+
+def _createStatus(index: int) -> Traffic:
+    """
+    Broadcasts to all UIs from sources on PC and MCU
+    """
+    kind = index % 3
+    if kind == 0:
+        return ModuleID.FILE_SOURCE, BiIntegerMsg(value1=index, value2=300, fromID=ModuleID.FILE_SOURCE,
+                                                  typeID=MsgID.TIME_POS_INFO, groupID=GroupID.UI)
+    elif kind == 1:
+        return ModuleID.VOLUME_OPERATOR, IntegerMsg(value=index % 100, fromID=ModuleID.VOLUME_OPERATOR,
+                                                    typeID=MsgID.CURRENT_VOL_INFO, groupID=GroupID.UI)
+    return ModuleID.ANALOG_SOURCE, IntegerMsg(value=1, fromID=ModuleID.ANALOG_SOURCE,
+                                              typeID=MsgID.SOURCE_STATUS_INFO, groupID=GroupID.UI)
+
+
+def _createCommand(index: int) -> Traffic:
+    """
+    Directed commands and requests from UIs on RC and PC
+    """
+    kind = index % 3
+    if kind == 0:
+        return ModuleID.WEBUI_RC, IntegerMsg(value=index % 100, fromID=ModuleID.WEBUI_RC, typeID=MsgID.SET_VOL,
+                                             forID=ModuleID.VOLUME_OPERATOR)
+    elif kind == 1:
+        return ModuleID.UI_CONSOLE, IntegerMsg(value=index, fromID=ModuleID.UI_CONSOLE, typeID=MsgID.PLAY_NODE,
+                                               forID=ModuleID.FILE_SOURCE)
+    return ModuleID.WEBUI_PC, RequestMsg(fromID=ModuleID.WEBUI_PC, typeID=MsgID.REQ_SOURCE_STATUS,
+                                         groupID=GroupID.SOURCE)
+
+
+def _createNode(index: int) -> Traffic:
+    """
+    Large NODE_INFO replies from the file source on PC to UIs on RC
+    """
+    children = [NodeItem(nodeID=1000 + i, label="Track " + str(i) + " - Some artist - Some album", isPlayable=True,
+                         isLeaf=True, bookmarkID=None) for i in range(NODE_CHILDREN)]
+    node = NodeItem(nodeID=index, label="Album", isPlayable=True, isLeaf=False, bookmarkID=None)
+    root = NodeItem(nodeID=1, label="Hudba", isPlayable=True, isLeaf=False, bookmarkID=None)
+    struct_ = NodeStruct(node=node, rootNode=root, totalParents=2, parentID=7, children=children,
+                         fromChildIndex=0, totalChildren=NODE_CHILDREN)
+    forID = ModuleID.WEBUI_RC if index % 2 == 0 else ModuleID.UI_CONSOLE
+    return ModuleID.FILE_SOURCE, NodeMsg(nodeStruct=struct_, fromID=ModuleID.FILE_SOURCE, forID=forID)
+
+
+def _createMixed(index: int) -> Traffic:
+    return _createStatus(index // 2) if index % 2 == 0 else _createCommand(index // 2)
+
+
+MIXES = {mix.name: mix for mix in [
+    TrafficMix('status', _createStatus),
+    TrafficMix('commands', _createCommand),
+    TrafficMix('nodes', _createNode),
+    TrafficMix('bursts', _createMixed, burstSize=200, burstPauseSecs=0.05),
+]}  # type: Dict[str, TrafficMix]
+
+
+def getMixNames() -> List[str]:
+    return list(MIXES.keys())
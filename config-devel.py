@@ -15,3 +15,6 @@ MPV_LOG_FILE = "/tmp/mpv.log"
 # MPV_LOG_FILE = None
 
 DEV_CDROM = '/dev/cdrom'
+
+# persistent index of the FileSource library, None = in-memory index rebuilt after each start
+LIBRARY_INDEX_FILE = "/var/tmp/aio-library.db"
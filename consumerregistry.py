@@ -0,0 +1,49 @@
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from errors import ParameterError
+from moduleid import ModuleID
+
+if TYPE_CHECKING:
+    from msgconsumer import MsgConsumer
+
+"""
+Registry of all message consumers within the process, keyed by their module IDs
+"""
+
+
+class ConsumerRegistry:
+    """
+    Consumers register upon construction, dispatchers resolve target IDs to consumers.
+    The map is replaced (copy-on-write) on every change so that lookups need no lock.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._consumersByID = {}  # type: Dict[ModuleID, MsgConsumer]
+        # incremented on every change, lets dispatchers detect stale cached consumers
+        self.version = 0
+
+    def register(self, consumer: 'MsgConsumer') -> None:
+        with self._lock:
+            if consumer.id in self._consumersByID:
+                raise ParameterError("Module ID " + str(consumer.id) + " already registered")
+            consumersByID = dict(self._consumersByID)
+            consumersByID[consumer.id] = consumer
+            self._consumersByID = consumersByID
+            self.version += 1
+
+    def unregister(self, consumer: 'MsgConsumer') -> None:
+        with self._lock:
+            if self._consumersByID.get(consumer.id) is consumer:
+                consumersByID = dict(self._consumersByID)
+                del consumersByID[consumer.id]
+                self._consumersByID = consumersByID
+                self.version += 1
+
+    # noinspection PyShadowingBuiltins
+    def get(self, id: ModuleID) -> Optional['MsgConsumer']:
+        return self._consumersByID.get(id)
+
+    def getAll(self) -> List['MsgConsumer']:
+        return list(self._consumersByID.values())
@@ -1,23 +1,30 @@
 #!/usr/bin/python3
 
-# usage: python control.py
+# usage: python control.py [--processes] [--tty [DEVICE1 DEVICE2]]
+#   --processes: each segment (PC, MCU, RC) runs in its own OS process
+#   --tty: PC and MCU segments connected by a serial line - the two devices joined by a null-modem cable,
+#          a pseudo terminal pair when no devices are given
 #
 import logging
+import os
 import signal
+import sys
 import time
-from typing import List
+from typing import List, Optional, Tuple
 
 import globalvars
+from asyncmsgconsumer import SegmentRunner
 from dispatcher import Dispatcher
-from exiting import exitHandler, exitCleanly
+from exiting import exitHandler, exitCleanly, addChildProcess, forgetChildProcesses
+from gateways import GatewayTransport, createGatewayPair, createLinkedGateway, createLinkPair
 from heartbeat import Heartbeat
+from metricsserver import MetricsServer
 from moduleid import ModuleID
-from serialreciever import SerialReciever
-from serialsender import SerialSender
 from sources.analogsource import AnalogSource
 from sources.cdsource import CDSource
 from sources.filesource import FileSource
 from sources.radiosource import RadioSource
+from trafficrecorder import TrafficRecorder
 from uis.inputconsoleui import InputConsoleUI
 from uis.webui import WebUI
 from volumeoperator import VolumeOperator
@@ -53,65 +60,169 @@ RC:
 globalvars.realSourceIDs = [ModuleID.ANALOG_SOURCE, ModuleID.FILE_SOURCE, ModuleID.RADIO_SOURCE,
                             ModuleID.CD_SOURCE]  # type: List[ModuleID]
 
+# transport of each gateway pair
+PC_MCU_TRANSPORT = GatewayTransport.DIRECT
+MCU_RC_TRANSPORT = GatewayTransport.DIRECT
+# transport of gateway pairs between segment processes: SHARED_MEMORY or STREAM
+PROCESS_TRANSPORT = GatewayTransport.SHARED_MEMORY
+
+PC_GATEWAY_IDS = [ModuleID.PC_MCU_SENDER]
+MCU_GATEWAY_IDS = [ModuleID.MCU_PC_SENDER, ModuleID.MCU_RC_SENDER]
+RC_GATEWAY_IDS = [ModuleID.RC_MCU_SENDER]
+
+
+def startPCSegment(dispatcherOnPC: Dispatcher):
+    # all consumers register in globalvars.consumerRegistry upon construction
+    WebUI(id=ModuleID.WEBUI_PC, name='WebUI PC', dispatcher=dispatcherOnPC, port=8081)
+    FileSource(dispatcherOnPC)
+    RadioSource(dispatcherOnPC)
+    CDSource(dispatcherOnPC)
+
+
+def startMCUSegment(dispatcherOnMCU: Dispatcher):
+    # single event loop for all asyncio consumers of the segment
+    SegmentRunner(dispatcherOnMCU)
+    VolumeOperator(dispatcherOnMCU)
+    AnalogSource(dispatcherOnMCU)
+    Heartbeat(dispatcher=dispatcherOnMCU)
+
+
+def startRCSegment(dispatcherOnRC: Dispatcher):
+    InputConsoleUI(id=ModuleID.UI_CONSOLE, dispatcher=dispatcherOnRC)
+    if globalvars.startSecondWebUI:
+        WebUI(id=ModuleID.WEBUI_RC, name='WebUI RC', dispatcher=dispatcherOnRC, port=8082)
+
+
+def startRecording(segmentName: Optional[str]):
+    """
+    Must precede creating the consumers, to record their announcements
+    :param segmentName: None when all segments run in this process
+    """
+    if globalvars.trafficRecordFile is not None:
+        path = globalvars.trafficRecordFile
+        if segmentName is not None:
+            path += '.' + segmentName
+        globalvars.trafficRecorder = TrafficRecorder(path)
+
+
+def consumersReady(metricsPort: Optional[int]):
+    globalvars.consumersReadyEvent.set()
+    if metricsPort is not None:
+        MetricsServer(metricsPort)
+
+
+def runInOneProcess(pcMCUTransport: GatewayTransport = PC_MCU_TRANSPORT):
+    startRecording(None)
+    dispatcherOnPC = Dispatcher("On PC", gatewayIDs=PC_GATEWAY_IDS)
+    dispatcherOnMCU = Dispatcher("On MCU", gatewayIDs=MCU_GATEWAY_IDS)
+    dispatcherOnRC = Dispatcher("On RC", gatewayIDs=RC_GATEWAY_IDS)
+
+    createGatewayPair(pcMCUTransport,
+                      'PC', dispatcherOnPC, ModuleID.PC_MCU_SENDER, ModuleID.MCU_PC_RECEIVER,
+                      'MCU', dispatcherOnMCU, ModuleID.MCU_PC_SENDER, ModuleID.PC_MCU_RECEIVER)
+    createGatewayPair(MCU_RC_TRANSPORT,
+                      'MCU', dispatcherOnMCU, ModuleID.MCU_RC_SENDER, ModuleID.RC_MCU_RECEIVER,
+                      'RC', dispatcherOnRC, ModuleID.RC_MCU_SENDER, ModuleID.MCU_RC_RECEIVER)
+
+    startMCUSegment(dispatcherOnMCU)
+    startPCSegment(dispatcherOnPC)
+    startRCSegment(dispatcherOnRC)
+    consumersReady(globalvars.metricsPort)
+
+
+def runInProcesses(pcMCUTransport: GatewayTransport = PROCESS_TRANSPORT):
+    """
+    MCU segment runs in this process, PC and RC segments in forked child processes.
+    Gateway pairs are links (PROCESS_TRANSPORT by default), routes are learned over them as in one process.
+    Forking must precede starting any thread.
+    """
+    pcLink, mcuToPCLink = createLinkPair(pcMCUTransport)
+    mcuToRCLink, rcLink = createLinkPair(PROCESS_TRANSPORT)
+    allLinks = [pcLink, mcuToPCLink, mcuToRCLink, rcLink]
+
+    if _forkSegment(pcLink, allLinks):
+        startRecording('PC')
+        dispatcherOnPC = Dispatcher("On PC", gatewayIDs=PC_GATEWAY_IDS)
+        createLinkedGateway(pcLink, 'PC', dispatcherOnPC, ModuleID.PC_MCU_SENDER, ModuleID.MCU_PC_RECEIVER, 'MCU')
+        startPCSegment(dispatcherOnPC)
+        consumersReady(_getMetricsPort(0))
+        return
+
+    if _forkSegment(rcLink, allLinks):
+        startRecording('RC')
+        dispatcherOnRC = Dispatcher("On RC", gatewayIDs=RC_GATEWAY_IDS)
+        createLinkedGateway(rcLink, 'RC', dispatcherOnRC, ModuleID.RC_MCU_SENDER, ModuleID.MCU_RC_RECEIVER, 'MCU')
+        startRCSegment(dispatcherOnRC)
+        consumersReady(_getMetricsPort(2))
+        return
+
+    pcLink.release()
+    rcLink.release()
+    startRecording('MCU')
+    dispatcherOnMCU = Dispatcher("On MCU", gatewayIDs=MCU_GATEWAY_IDS)
+    createLinkedGateway(mcuToPCLink, 'MCU', dispatcherOnMCU, ModuleID.MCU_PC_SENDER, ModuleID.PC_MCU_RECEIVER, 'PC')
+    createLinkedGateway(mcuToRCLink, 'MCU', dispatcherOnMCU, ModuleID.MCU_RC_SENDER, ModuleID.RC_MCU_RECEIVER, 'RC')
+    startMCUSegment(dispatcherOnMCU)
+    consumersReady(_getMetricsPort(1))
+
+
+def _forkSegment(ownLink, allLinks: List) -> bool:
+    """
+    :return: True in the child process
+    """
+    pid = os.fork()
+    if pid == 0:
+        forgetChildProcesses()
+        for link in allLinks:
+            if link is not ownLink:
+                link.release()
+        return True
+    addChildProcess(pid)
+    return False
+
+
+def _parseTtyOption(args: List[str]) -> Optional[Tuple[str, ...]]:
+    """
+    :return: None = no --tty option, empty tuple = --tty without devices
+    """
+    if '--tty' not in args:
+        return None
+    devices = args[args.index('--tty') + 1:args.index('--tty') + 3]
+    if len(devices) == 2 and not any(device.startswith('--') for device in devices):
+        return devices[0], devices[1]
+    return ()
+
+
+def _getMetricsPort(segmentIndex: int) -> Optional[int]:
+    # each segment process serves its own metrics
+    if globalvars.metricsPort is None:
+        return None
+    return globalvars.metricsPort + segmentIndex
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
     signal.signal(signal.SIGINT, exitHandler)
     signal.signal(signal.SIGTERM, exitHandler)
     try:
-        dispatcherOnPC = Dispatcher("On PC", gatewayIDs=[ModuleID.PC_MCU_SENDER])
-        dispatcherOnMCU = Dispatcher("On MCU", gatewayIDs=[ModuleID.MCU_PC_SENDER, ModuleID.MCU_RC_SENDER])
-        dispatcherOnRC = Dispatcher("On RC", gatewayIDs=[ModuleID.RC_MCU_SENDER])
-
-        receiverMCU_PC = SerialReciever(
-            id=ModuleID.MCU_PC_RECEIVER, name='MCU->PC', dispatcher=dispatcherOnPC,
-            mySideSenderID=ModuleID.PC_MCU_SENDER)
-        receiverPC_MCU = SerialReciever(
-            id=ModuleID.PC_MCU_RECEIVER, name='PC->MCU', dispatcher=dispatcherOnMCU,
-            mySideSenderID=ModuleID.MCU_PC_SENDER)
-        receiverRC_MCU = SerialReciever(
-            id=ModuleID.RC_MCU_RECEIVER, name='RC->MCU', dispatcher=dispatcherOnMCU,
-            mySideSenderID=ModuleID.MCU_RC_SENDER)
-        receiverMCU_RC = SerialReciever(
-            id=ModuleID.MCU_RC_RECEIVER, name='MCU->RC', dispatcher=dispatcherOnRC,
-            mySideSenderID=ModuleID.RC_MCU_SENDER)
-
-        senderPC_MCU = SerialSender(
-            id=ModuleID.PC_MCU_SENDER, name='PC->MCU', dispatcher=dispatcherOnPC, otherSideReceiver=receiverPC_MCU)
-        senderMCU_PC = SerialSender(
-            id=ModuleID.MCU_PC_SENDER, name='MCU->PC', dispatcher=dispatcherOnMCU, otherSideReceiver=receiverMCU_PC)
-        senderMCU_RC = SerialSender(
-            id=ModuleID.MCU_RC_SENDER, name='MCU->RC', dispatcher=dispatcherOnMCU, otherSideReceiver=receiverMCU_RC)
-        senderRC_MCU = SerialSender(
-            id=ModuleID.RC_MCU_SENDER, name='RC->MCU', dispatcher=dispatcherOnRC, otherSideReceiver=receiverRC_MCU)
-
-        globalvars.msgConsumers = [
-            senderPC_MCU,
-            senderMCU_PC,
-            senderMCU_RC,
-            senderRC_MCU,
-            receiverMCU_PC,
-            receiverPC_MCU,
-            receiverRC_MCU,
-            receiverMCU_RC,
-            VolumeOperator(dispatcherOnMCU),
-            WebUI(id=ModuleID.WEBUI_PC, name='WebUI PC', dispatcher=dispatcherOnPC, port=8081),
-            InputConsoleUI(id=ModuleID.UI_CONSOLE, dispatcher=dispatcherOnRC),
-            AnalogSource(dispatcherOnMCU),
-            FileSource(dispatcherOnPC),
-            RadioSource(dispatcherOnPC),
-            CDSource(dispatcherOnPC),
-            Heartbeat(dispatcher=dispatcherOnMCU)
-        ]
-        if globalvars.startSecondWebUI:
-            globalvars.msgConsumers.append(
-                WebUI(id=ModuleID.WEBUI_RC, name='WebUI RC', dispatcher=dispatcherOnRC, port=8082)
-            )
-        globalvars.consumersReadyEvent.set()
+        parentPID = os.getpid()
+        ttyDevices = _parseTtyOption(sys.argv[1:])
+        if ttyDevices:
+            globalvars.ttyDevices = ttyDevices
+        processes = '--processes' in sys.argv[1:]
+        if ttyDevices is not None:
+            transport = GatewayTransport.TTY
+        else:
+            transport = PROCESS_TRANSPORT if processes else PC_MCU_TRANSPORT
+        if processes:
+            runInProcesses(transport)
+        else:
+            runInOneProcess(transport)
         while True:
             time.sleep(5)
-            # dispatcherOnPC.printStats()
-            # dispatcherOnMCU.printStats()
-            pass
+            if os.getpid() != parentPID and os.getppid() != parentPID:
+                # the MCU process is gone, segment processes do not outlive it
+                exitCleanly(0)
     except Exception as e:
         logging.error(e, exc_info=True)
         exitCleanly(1)
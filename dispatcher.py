@@ -1,22 +1,71 @@
 import logging
-from typing import TYPE_CHECKING, DefaultDict, List, Iterator
+from contextlib import contextmanager
+from copy import copy
+from threading import Lock, local
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Iterator, Tuple, Optional
 
 import globalvars
+from dispatchmetrics import DispatcherMetrics
+from dispatchtrace import Direction
 from errors import ParameterError
 from groupid import GroupID
 from moduleid import ModuleID
 from msgid import MsgID
+from msgs.batchmsg import BatchMsg
 from msgs.integermsg import IntegerMsg
 from msgs.message import Message
+from msgs.subscriptionsmsg import SubscriptionsMsg, FILTERABLE_MSG_IDS, Pattern, matches
 
 if TYPE_CHECKING:
+    from asyncmsgconsumer import SegmentRunner
     from msgconsumer import MsgConsumer
 """
 Message dispatcher
 """
 
-log = logging.getLogger("dispatcher")
-log.setLevel(logging.DEBUG)
+
+# latest values broadcast to UIs, replayed to UI consumers announcing themselves.
+# Ordered - UIs need the source status before other source details
+RETAINED_MSG_IDS = (
+    MsgID.SOURCE_STATUS_INFO,
+    MsgID.CURRENT_VOL_INFO,
+    MsgID.SOURCE_PLAYBACK_INFO,
+    MsgID.TRACK_INFO,
+    MsgID.AUDIOPARAMS_INFO,
+    MsgID.METADATA_INFO,
+)  # type: Tuple[MsgID, ...]
+
+# routing messages are never held back in a batch
+UNBATCHED_MSG_IDS = frozenset([
+    MsgID.IN_GROUPS_MSG,
+    MsgID.SUBSCRIPTIONS_MSG,
+    MsgID.BATCH_MSG,
+])  # type: FrozenSet[MsgID]
+
+# (typeID, forID, groupID, senderID, fromID of filterable messages or None)
+Shape = Tuple[MsgID, ModuleID, GroupID, ModuleID, Optional[ModuleID]]
+
+
+class RoutingTable:
+    """
+    Immutable snapshot of the route, group and subscription maps.
+    Targets are compiled once per message shape and cached in the snapshot.
+    Any change of the maps produces a new snapshot, readers never lock.
+    """
+
+    def __init__(self, routeMap: Dict[ModuleID, ModuleID], groupMap: Dict[GroupID, Tuple[ModuleID, ...]],
+                 memberMap: Dict[GroupID, Tuple[ModuleID, ...]], subscriptionMap: Dict[ModuleID, FrozenSet[Pattern]],
+                 registryVersion: int):
+        self.routeMap = routeMap
+        # group -> bordering senders (consumers or gateways) leading to its members
+        self.groupMap = groupMap
+        # group -> member modules
+        self.memberMap = memberMap
+        # module -> its subscriptions, modules not present are not filtered
+        self.subscriptionMap = subscriptionMap
+        # consumers are cached in targets, registry changes must invalidate the snapshot
+        self.registryVersion = registryVersion
+        self.targetsByShape = {}  # type: Dict[Shape, Tuple[MsgConsumer, ...]]
 
 
 class Dispatcher:
@@ -25,11 +74,19 @@ class Dispatcher:
         super().__init__()
         self.name = 'Dispatcher ' + name
         self._gatewayIDs = gatewayIDs
-        self._routeMap = self._initRouteMap(gatewayIDs)  # type: DefaultDict[ModuleID, ModuleID]
-        self._groupMap = {}  # type: DefaultDict[GroupID, List[ModuleID]]
-        self._msgCount = 0
+        # guards creation of new routing snapshots, not needed for reading
+        self._lock = Lock()
+        self._routingTable = RoutingTable(self._initRouteMap(gatewayIDs), {}, {}, {},
+                                          globalvars.consumerRegistry.version)
+        self.metrics = DispatcherMetrics()
+        # last retained message for each (typeID, fromID)
+        self._retained = {}  # type: Dict[Tuple[MsgID, ModuleID], Message]
+        # event loop of asyncio consumers, created in control.py for segments hosting them
+        self.segmentRunner = None  # type: Optional[SegmentRunner]
+        # messages collected by batch() in the current thread
+        self._batches = local()
 
-    def _initRouteMap(self, gatewayIDs: List[ModuleID]) -> DefaultDict[ModuleID, ModuleID]:
+    def _initRouteMap(self, gatewayIDs: List[ModuleID]) -> Dict[ModuleID, ModuleID]:
         """
         Initial filling the route map with gateways
         """
@@ -43,62 +100,231 @@ class Dispatcher:
         Distributing the message.
         :param senderID: bordering sender. Not the original sender (stored in msg.fromID)!
         """
-        log.debug(self.name + ": from sender " + str(getMsgConsumer(senderID)) + ": " + str(msg))
-        self._updateRouteMap(msg, senderID)
+        batchedMsgs = getattr(self._batches, 'msgs', None)  # type: Optional[List[Message]]
+        if batchedMsgs is not None and senderID == self._batches.ownerID and msg.typeID not in UNBATCHED_MSG_IDS:
+            batchedMsgs.append(msg)
+            return
+        if globalvars.trafficRecorder is not None:
+            globalvars.trafficRecorder.record(self.name, senderID, msg)
+        self.metrics.msgDistributed(msg.typeID)
+        traced = globalvars.dispatchTrace.isTraced(msg)
+        if traced:
+            globalvars.dispatchTrace.record(self.name, Direction.IN, senderID, msg)
+        table = self._routingTable
+        if msg.fromID not in table.routeMap:
+            table = self._updateRouteMap(msg, senderID)
         if msg.typeID == MsgID.IN_GROUPS_MSG:
             msg = msg  # type: IntegerMsg
-            self._updateGroupMap(msg.value, senderID)
-            self._distributeToGateways(msg, senderID)
-        elif msg.forID is not ModuleID.ANY and msg.forID in self._routeMap.keys():
-            self._distributeToForID(msg)
-        elif msg.groupID is not GroupID.ANY and msg.groupID in self._groupMap.keys():
-            self._distributeToGroupID(msg, senderID)
+            table = self._updateGroupMap(msg, senderID)
+        elif msg.typeID == MsgID.SUBSCRIPTIONS_MSG:
+            msg = msg  # type: SubscriptionsMsg
+            table = self._updateSubscriptionMap(msg)
+        if table.registryVersion != globalvars.consumerRegistry.version:
+            table = self._refreshConsumers()
+        if msg.typeID == MsgID.BATCH_MSG:
+            msg = msg  # type: BatchMsg
+            self._distributeBatch(table, msg, senderID, traced)
+            return
+        for consumer in self._getTargets(table, msg, senderID):
+            self._submitToConsumer(msg, consumer, traced)
+        if self._isRetained(msg):
+            self._retained[(msg.typeID, msg.fromID)] = msg
+        elif msg.typeID == MsgID.IN_GROUPS_MSG and GroupID.UI in decodeGroupIDs(msg.value):
+            # announcements reach all segments, local or not
+            self._replayRetained(table, msg.fromID, RETAINED_MSG_IDS)
+        elif msg.typeID == MsgID.SUBSCRIPTIONS_MSG:
+            self._replayRetained(table, msg.fromID, FILTERABLE_MSG_IDS)
+
+    @contextmanager
+    def batch(self, ownerID: ModuleID):
+        """
+        Messages distributed by the owner in this thread within the context are sent as one BatchMsg at its end.
+        Nested contexts join the outer batch.
+        """
+        if getattr(self._batches, 'msgs', None) is not None:
+            yield
+            return
+        self._batches.msgs = []
+        self._batches.ownerID = ownerID
+        try:
+            yield
+        finally:
+            msgs = self._batches.msgs
+            self._batches.msgs = None
+            if len(msgs) == 1:
+                self.distribute(msgs[0], ownerID)
+            elif msgs:
+                self.distribute(BatchMsg(msgs, fromID=ownerID), ownerID)
+
+    def _distributeBatch(self, table: RoutingTable, batch: BatchMsg, senderID: ModuleID, traced: bool) -> None:
+        """
+        Inner messages are routed one by one, each target receives one envelope with the messages routed to it
+        """
+        msgsByTarget = {}  # type: Dict[MsgConsumer, List[Message]]
+        for msg in batch.msgs:
+            for consumer in self._getTargets(table, msg, senderID):
+                msgsByTarget.setdefault(consumer, []).append(msg)
+            if self._isRetained(msg):
+                self._retained[(msg.typeID, msg.fromID)] = msg
+        for consumer, msgs in msgsByTarget.items():
+            if len(msgs) == 1:
+                self._submitToConsumer(msgs[0], consumer, traced)
+            elif len(msgs) == len(batch.msgs):
+                self._submitToConsumer(batch, consumer, traced)
+            else:
+                self._submitToConsumer(BatchMsg(msgs, fromID=batch.fromID, forID=batch.forID,
+                                                groupID=batch.groupID), consumer, traced)
+
+    def _getTargets(self, table: RoutingTable, msg: Message, senderID: ModuleID) -> Tuple['MsgConsumer', ...]:
+        # filterable messages are routed by their sender too
+        shape = (msg.typeID, msg.forID, msg.groupID, senderID,
+                 msg.fromID if msg.typeID in FILTERABLE_MSG_IDS else None)
+        targets = table.targetsByShape.get(shape)
+        if targets is None:
+            targets = self._compileTargets(table, shape)
+        return targets
+
+    @staticmethod
+    def _isRetained(msg: Message) -> bool:
+        return msg.groupID == GroupID.UI and msg.forID == ModuleID.ANY and msg.typeID in RETAINED_MSG_IDS
+
+    def hasRouteTo(self, moduleID: ModuleID) -> bool:
+        return moduleID in self._routingTable.routeMap
+
+    def _replayRetained(self, table: RoutingTable, consumerID: ModuleID, msgIDs: Iterable[MsgID]) -> None:
+        """
+        Instant state sync of a (re)starting UI, instead of requests to all sources.
+        Each dispatcher on the way of the announcement replays the values of its local modules only - values
+        of remote modules can be missing here (pruned by subscriptions) and each value is replayed once.
+        Values for a remote consumer are addressed copies, the other dispatchers do not broadcast them again.
+        """
+        targetID = table.routeMap.get(consumerID)
+        if targetID is None:
+            return
+        target = getMsgConsumer(targetID)
+        patterns = table.subscriptionMap.get(consumerID)
+        # dict copy is atomic, other threads keep retaining
+        retained = dict(self._retained)
+        for msgID in msgIDs:
+            for (typeID, fromID), msg in retained.items():
+                if typeID != msgID or fromID == consumerID or table.routeMap.get(fromID) != fromID:
+                    continue
+                if typeID in FILTERABLE_MSG_IDS and patterns is not None and not matches(patterns, typeID, fromID):
+                    continue
+                if targetID != consumerID:
+                    msg = copy(msg)
+                    msg.forID = consumerID
+                self._submitToConsumer(msg, target, False)
+
+    def _compileTargets(self, table: RoutingTable, shape: Shape) -> Tuple['MsgConsumer', ...]:
+        typeID, forID, groupID, senderID, fromID = shape
+        if typeID == MsgID.IN_GROUPS_MSG or typeID == MsgID.SUBSCRIPTIONS_MSG:
+            targetIDs = self._getGatewayTargetIDs(senderID)
+        elif forID is not ModuleID.ANY and forID in table.routeMap:
+            targetIDs = [table.routeMap[forID]]
+        elif groupID is not GroupID.ANY and groupID in table.groupMap:
+            targetIDs = [targetID for targetID in table.groupMap[groupID] if targetID != senderID]
+            if fromID is not None:
+                # pruning the fan-out to targets with someone interested behind them
+                targetIDs = [targetID for targetID in targetIDs
+                             if self._isSubscribedVia(table, targetID, groupID, typeID, fromID)]
         else:
             # no specific targets found, sending to all gateways
-            self._distributeToGateways(msg, senderID)
-
-    def _distributeToGroupID(self, msg, senderID):
-        for targetID in self._groupMap[msg.groupID]:
-            if targetID != senderID:
-                self._submitToTargetID(msg, targetID)
-
-    def _distributeToForID(self, msg):
-        targetID = self._routeMap[msg.forID]  # type: ModuleID
-        # checking just in case
-        if targetID is not None:
-            self._submitToTargetID(msg, targetID)
-
-    def _updateRouteMap(self, msg: Message, senderID: ModuleID) -> None:
-        if msg.fromID not in self._routeMap.keys():
-            self._routeMap[msg.fromID] = senderID
-
-    def _updateGroupMap(self, encodedGroupIDs: int, senderID: ModuleID) -> None:
-        for groupID in decodeGroupIDs(encodedGroupIDs):
-            if groupID not in self._groupMap.keys():
-                self._groupMap[groupID] = []
-            if senderID not in self._groupMap[groupID]:
-                self._groupMap[groupID].append(senderID)
-
-    def _distributeToGateways(self, msg: Message, senderID: ModuleID):
+            targetIDs = self._getGatewayTargetIDs(senderID)
+        targets = tuple(getMsgConsumer(targetID) for targetID in targetIDs if targetID is not None)
+        table.targetsByShape[shape] = targets
+        return targets
+
+    @staticmethod
+    def _isSubscribedVia(table: RoutingTable, targetID: ModuleID, groupID: GroupID, typeID: MsgID,
+                         fromID: ModuleID) -> bool:
+        """
+        Whether any group member routed via the target wants the message
+        """
+        members = [memberID for memberID in table.memberMap.get(groupID, ())
+                   if table.routeMap.get(memberID) == targetID]
+        if not members:
+            # members unknown
+            return True
+        for memberID in members:
+            patterns = table.subscriptionMap.get(memberID)
+            if patterns is None or matches(patterns, typeID, fromID):
+                return True
+        return False
+
+    def _getGatewayTargetIDs(self, senderID: ModuleID) -> List[ModuleID]:
         # distribute to all other gateways
-        for gatewayID in self._gatewayIDs:
-            if senderID != gatewayID:
-                self._submitToTargetID(msg, gatewayID)
+        return [gatewayID for gatewayID in self._gatewayIDs if gatewayID != senderID]
+
+    def _updateRouteMap(self, msg: Message, senderID: ModuleID) -> RoutingTable:
+        with self._lock:
+            table = self._routingTable
+            if msg.fromID not in table.routeMap:
+                routeMap = dict(table.routeMap)
+                routeMap[msg.fromID] = senderID
+                table = self._replaceRoutingTable(table, routeMap=routeMap)
+            return table
+
+    def _updateGroupMap(self, msg: IntegerMsg, senderID: ModuleID) -> RoutingTable:
+        with self._lock:
+            table = self._routingTable
+            groupMap = dict(table.groupMap)
+            memberMap = dict(table.memberMap)
+            changed = False
+            for groupID in decodeGroupIDs(msg.value):
+                targetIDs = groupMap.get(groupID, ())
+                if senderID not in targetIDs:
+                    groupMap[groupID] = targetIDs + (senderID,)
+                    changed = True
+                memberIDs = memberMap.get(groupID, ())
+                if msg.fromID not in memberIDs:
+                    memberMap[groupID] = memberIDs + (msg.fromID,)
+                    changed = True
+            if changed:
+                table = self._replaceRoutingTable(table, groupMap=groupMap, memberMap=memberMap)
+            return table
+
+    def _updateSubscriptionMap(self, msg: SubscriptionsMsg) -> RoutingTable:
+        with self._lock:
+            table = self._routingTable
+            if table.subscriptionMap.get(msg.fromID) != msg.patterns:
+                subscriptionMap = dict(table.subscriptionMap)
+                subscriptionMap[msg.fromID] = msg.patterns
+                table = self._replaceRoutingTable(table, subscriptionMap=subscriptionMap)
+            return table
+
+    def _refreshConsumers(self) -> RoutingTable:
+        with self._lock:
+            return self._replaceRoutingTable(self._routingTable)
+
+    def _replaceRoutingTable(self, table: RoutingTable, routeMap: Optional[Dict[ModuleID, ModuleID]] = None,
+                             groupMap: Optional[Dict[GroupID, Tuple[ModuleID, ...]]] = None,
+                             memberMap: Optional[Dict[GroupID, Tuple[ModuleID, ...]]] = None,
+                             subscriptionMap: Optional[Dict[ModuleID, FrozenSet[Pattern]]] = None) -> RoutingTable:
+        """
+        New snapshot with the given maps replaced. Must be called with self._lock held
+        """
+        self._routingTable = RoutingTable(table.routeMap if routeMap is None else routeMap,
+                                          table.groupMap if groupMap is None else groupMap,
+                                          table.memberMap if memberMap is None else memberMap,
+                                          table.subscriptionMap if subscriptionMap is None else subscriptionMap,
+                                          globalvars.consumerRegistry.version)
+        return self._routingTable
 
-    def _submitToTargetID(self, msg: Message, targetID):
-        if msg.fromID == targetID:
+    def _submitToConsumer(self, msg: Message, consumer: 'MsgConsumer', traced: bool):
+        if msg.fromID == consumer.id:
             logging.warning("Trying to send msg " + msg.__str__() + " to originator, skipping")
             return
 
-        consumer = getMsgConsumer(targetID)
-        if consumer is not None:
-            consumer.receive(msg)
-            log.debug(self.name + ": to: " + str(consumer) + " submitted " + str(msg))
-            # increment message counter
-            self._msgCount += 1
+        consumer.receive(msg)
+        if traced:
+            globalvars.dispatchTrace.record(self.name, Direction.OUT, consumer.id, msg)
+        # increment message counter
+        self.metrics.msgSubmitted()
 
     def printStats(self):
-        print(str(self) + ": " + str(self._msgCount))
+        snapshot = self.metrics.snapshot()
+        print(str(self) + ": " + str(snapshot['count']) + " msgs, " + str(snapshot['submitted']) + " submitted")
 
     def __str__(self) -> str:
         return "Dispatcher " + self.name
@@ -106,12 +332,14 @@ class Dispatcher:
 
 # noinspection PyShadowingBuiltins
 def getMsgConsumer(id: ModuleID) -> 'MsgConsumer':
-    # wait untill all consumers are instantiated
-    globalvars.consumersReadyEvent.wait()
-    for consumer in globalvars.msgConsumers:
-        if consumer.id == id:
-            return consumer
-    raise ParameterError("Unknown module ID " + str(id))
+    consumer = globalvars.consumerRegistry.get(id)
+    if consumer is None and not globalvars.consumersReadyEvent.is_set():
+        # slow path during startup only - wait untill all consumers are instantiated
+        globalvars.consumersReadyEvent.wait()
+        consumer = globalvars.consumerRegistry.get(id)
+    if consumer is None:
+        raise ParameterError("Unknown module ID " + str(id))
+    return consumer
 
 
 def bits(number: int) -> Iterator[int]:
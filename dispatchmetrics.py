@@ -0,0 +1,213 @@
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+from time import monotonic
+from typing import TYPE_CHECKING, DefaultDict, Dict, List, Tuple
+
+import globalvars
+from msgid import MsgID
+
+if TYPE_CHECKING:
+    from dispatcher import Dispatcher
+    from msgqueue import MsgQueue
+
+"""
+Dispatch metrics - message rates per MsgID and dispatcher, consumer latency histograms, queue depths and drops
+"""
+
+# upper bounds of histogram buckets in seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    """
+    Fixed buckets, observing is a bisect and an increment
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self._bounds = bounds
+        # last bucket for values over the highest bound
+        self._counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Upper bound of the bucket holding the percentile, max for the overflow bucket
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        cumulative = 0
+        for bound, count in zip(self._bounds, self._counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        for bound, count in zip(self._bounds, self._counts):
+            buckets['<=' + str(bound)] = count
+        buckets['>' + str(self._bounds[-1])] = self._counts[-1]
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count > 0 else 0.0,
+            'max': self.max,
+            'buckets': buckets,
+        }
+
+
+class DispatcherMetrics:
+    """
+    Thread-safe, updated by all threads distributing messages
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._startTime = monotonic()
+        self._countsByMsgID = defaultdict(int)  # type: DefaultDict[MsgID, int]
+        self.submittedCount = 0
+
+    def msgDistributed(self, msgID: MsgID) -> None:
+        with self._lock:
+            self._countsByMsgID[msgID] += 1
+
+    def msgSubmitted(self) -> None:
+        with self._lock:
+            self.submittedCount += 1
+
+    def snapshot(self) -> dict:
+        """
+        Raw counters only, each reader calculates rates for its own period (RateWindow).
+        Reading changes nothing, any number of readers can poll
+        """
+        with self._lock:
+            counts = dict(self._countsByMsgID)
+            submittedCount = self.submittedCount
+        return {
+            'startTime': self._startTime,
+            'time': monotonic(),
+            'count': sum(counts.values()),
+            'submitted': submittedCount,
+            'msgs': {msgID.name: {'count': count} for msgID, count in counts.items()},
+        }
+
+
+class RateWindow:
+    """
+    Rates of dispatcher snapshots since the previous call of the same reader, thread-safe
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        # dispatcher name -> its previous snapshot
+        self._lastSnapshots = {}  # type: Dict[str, dict]
+
+    def addRates(self, snapshot: dict) -> dict:
+        """
+        Adds 'rate' next to each 'count' of the dispatchers in a snapshotAll() result.
+        The first call reports rates since the start of the dispatcher
+        """
+        with self._lock:
+            for name, metrics in snapshot['dispatchers'].items():
+                last = self._lastSnapshots.get(name, {'time': metrics['startTime'], 'count': 0, 'msgs': {}})
+                self._lastSnapshots[name] = metrics
+                elapsed = max(metrics['time'] - last['time'], 1e-9)
+                metrics['rate'] = (metrics['count'] - last['count']) / elapsed
+                for msgName, msgMetrics in metrics['msgs'].items():
+                    lastCount = last['msgs'].get(msgName, {'count': 0})['count']
+                    msgMetrics['rate'] = (msgMetrics['count'] - lastCount) / elapsed
+        return snapshot
+
+
+class ConsumerMetrics:
+    """
+    Thread-safe, a direct SerialSender records relays in every distributing thread
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        # from enqueueing to the start of _consume
+        self.queueLatency = Histogram()
+        # time spent inside _consume
+        self.consumeTime = Histogram()
+
+    def msgConsumed(self, queuedSecs: float, consumeSecs: float) -> None:
+        with self._lock:
+            self.queueLatency.observe(queuedSecs)
+            self.consumeTime.observe(consumeSecs)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queueLatency = Histogram()
+            self.consumeTime = Histogram()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'queueLatency': self.queueLatency.snapshot(),
+                'consumeTime': self.consumeTime.snapshot(),
+            }
+
+
+def snapshotAll() -> dict:
+    consumers = sorted(globalvars.consumerRegistry.getAll(), key=lambda c: c.id.value)
+    dispatchers = []  # type: List[Dispatcher]
+    for consumer in consumers:
+        if consumer.dispatcher not in dispatchers:
+            dispatchers.append(consumer.dispatcher)
+    return {
+        'dispatchers': {str(d.name): d.metrics.snapshot() for d in dispatchers},
+        'consumers': {str(c.name): _snapshotConsumer(c) for c in consumers},
+    }
+
+
+def _snapshotConsumer(consumer) -> dict:
+    snapshot = {
+        'id': consumer.id.name,
+        'queues': {name: _snapshotQueue(queue) for name, queue in consumer.getQueues().items()},
+    }
+    snapshot.update(consumer.metrics.snapshot())
+    return snapshot
+
+
+def _snapshotQueue(queue: 'MsgQueue') -> dict:
+    return {
+        'depth': queue.qsize(),
+        'peakDepth': queue.peakSize,
+        'laneDepths': {priority.name: depth for priority, depth in queue.getLaneDepths().items()},
+        'coalesced': queue.coalescedCount,
+        'dropped': {msgID.name: count for msgID, count in dict(queue.droppedCounts).items()},
+        'expired': queue.expiredCount,
+    }
+
+
+def renderText(snapshot: dict) -> str:
+    """
+    :param snapshot: snapshotAll() with rates added by RateWindow.addRates
+    """
+    lines = []  # type: List[str]
+    for name, metrics in snapshot['dispatchers'].items():
+        lines.append("%s: %d msgs, %.1f msgs/s, %d submitted"
+                     % (name, metrics['count'], metrics['rate'], metrics['submitted']))
+        for msgName, msgMetrics in sorted(metrics['msgs'].items()):
+            lines.append("    %-22s %8d  %8.1f/s" % (msgName, msgMetrics['count'], msgMetrics['rate']))
+    for name, metrics in snapshot['consumers'].items():
+        latency = metrics['queueLatency']
+        consumeTime = metrics['consumeTime']
+        lines.append("%s: queued mean %.6f s max %.6f s, consume mean %.6f s max %.6f s"
+                     % (name, latency['mean'], latency['max'], consumeTime['mean'], consumeTime['max']))
+        for queueName, queue in metrics['queues'].items():
+            lines.append("    %-10s depth %d (peak %d), coalesced %d, dropped %d, expired %d"
+                         % (queueName, queue['depth'], queue['peakDepth'], queue['coalesced'],
+                            sum(queue['dropped'].values()), queue['expired']))
+    return '\n'.join(lines) + '\n'
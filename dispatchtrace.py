@@ -0,0 +1,89 @@
+import time
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from typing import TYPE_CHECKING, Deque, List, Optional, Set, Tuple
+
+from errors import ParameterError
+from moduleid import ModuleID
+from msgid import MsgID
+
+if TYPE_CHECKING:
+    from msgs.message import Message
+
+"""
+Dispatch trace - fixed-size in-memory ring buffer of dispatched messages.
+Only references and timestamps are stored, text is rendered upon dump.
+"""
+
+# number of records kept in the ring buffer
+TRACE_SIZE = 2000
+# every n-th distributed message is traced
+TRACE_SAMPLE_EVERY = 1
+
+
+class Direction(Enum):
+    # message entered the dispatcher from the bordering sender
+    IN = 1
+    # message submitted to the target consumer
+    OUT = 2
+
+
+class DispatchTrace:
+    def __init__(self, size: int = TRACE_SIZE, sampleEvery: int = TRACE_SAMPLE_EVERY,
+                 msgIDs: Optional[Set[MsgID]] = None):
+        self.enabled = True
+        self.sampleEvery = sampleEvery
+        # None = all message types traced
+        self.msgIDs = msgIDs
+        self._counter = 0
+        self._records = deque(maxlen=size)  # type: Deque[Tuple[float, str, Direction, ModuleID, Message]]
+
+    def configure(self, size: Optional[int] = None, sampleEvery: Optional[int] = None,
+                  msgIDs: Optional[Set[MsgID]] = None, allMsgIDs: bool = False) -> None:
+        """
+        :param allMsgIDs: removes the msgIDs filter
+        """
+        if size is not None and size < 1:
+            raise ParameterError("Trace size must be at least 1, got " + str(size))
+        if sampleEvery is not None and sampleEvery < 1:
+            raise ParameterError("Trace sampling must be at least 1, got " + str(sampleEvery))
+        if size is not None:
+            self._records = deque(self._records, maxlen=size)
+        if sampleEvery is not None:
+            self.sampleEvery = sampleEvery
+        if msgIDs is not None:
+            self.msgIDs = msgIDs
+        elif allMsgIDs:
+            self.msgIDs = None
+
+    def isTraced(self, msg: 'Message') -> bool:
+        """
+        Decided once for each distributed message, its submissions follow the decision
+        """
+        if not self.enabled:
+            return False
+        if self.msgIDs is not None and msg.typeID not in self.msgIDs:
+            return False
+        self._counter += 1
+        return self._counter % self.sampleEvery == 0
+
+    def record(self, dispatcherName: str, direction: Direction, peerID: ModuleID, msg: 'Message') -> None:
+        # deque.append is atomic, no locking needed
+        self._records.append((time.time(), dispatcherName, direction, peerID, msg))
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def dump(self) -> List[str]:
+        return [self._render(record) for record in list(self._records)]
+
+    @staticmethod
+    def _render(record: Tuple[float, str, Direction, ModuleID, 'Message']) -> str:
+        timestamp, dispatcherName, direction, peerID, msg = record
+        peer = "from " if direction == Direction.IN else "to "
+        return datetime.fromtimestamp(timestamp).strftime('%H:%M:%S.%f') \
+               + " " + dispatcherName \
+               + " " + direction.name \
+               + " " + peer + str(peerID) \
+               + ": " + str(msg)
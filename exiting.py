@@ -1,12 +1,33 @@
 import logging
+import os
+import signal
 import sys
-from typing import TYPE_CHECKING
+import time
+from threading import Thread, current_thread
+from typing import TYPE_CHECKING, List
 
 import globalvars
 
 if TYPE_CHECKING:
     from msgconsumer import MsgConsumer
 
+# overall time for closing all consumers
+EXIT_TIMEOUT = 1.0
+
+# segment processes started by this process, terminated on exit
+_childPIDs = []  # type: List[int]
+
+
+def addChildProcess(pid: int) -> None:
+    _childPIDs.append(pid)
+
+
+def forgetChildProcesses() -> None:
+    """
+    In a forked child - the inherited processes are its siblings, not its children
+    """
+    _childPIDs.clear()
+
 
 def exitHandler(signum, frame):
     exitCleanly(0)
@@ -14,9 +35,59 @@ def exitHandler(signum, frame):
 
 def exitCleanly(exitValue: int):
     logging.debug("Exiting...")
-    for consumer in globalvars.msgConsumers:
-        consumer = consumer  # type: MsgConsumer
-        consumer.close()
-        if consumer.is_alive():
-            consumer.join(0.1)
+    for pid in _childPIDs:
+        _terminate(pid)
+    consumers = globalvars.consumerRegistry.getAll()  # type: List[MsgConsumer]
+    # closing in parallel - some consumers (web servers, mpv) take time to close
+    closers = [Thread(target=_close, args=(consumer,), daemon=True) for consumer in consumers]
+    for closer in closers:
+        closer.start()
+    deadline = time.monotonic() + EXIT_TIMEOUT
+    for thread in closers + consumers:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.warning("Not all consumers closed in " + str(EXIT_TIMEOUT) + " secs")
+            break
+        if thread is not current_thread() and thread.is_alive():
+            thread.join(remaining)
+    _reapChildren(deadline)
+    if globalvars.trafficRecorder is not None:
+        globalvars.trafficRecorder.close()
     sys.exit(exitValue)
+
+
+def _close(consumer: 'MsgConsumer'):
+    try:
+        consumer.close()
+    except Exception as e:
+        logging.error(e, exc_info=True)
+
+
+def _terminate(pid: int):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def _reapChildren(deadline: float):
+    pending = list(_childPIDs)
+    while pending:
+        for pid in list(pending):
+            try:
+                donePID, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                donePID = pid
+            if donePID != 0:
+                pending.remove(pid)
+        if pending:
+            if time.monotonic() > deadline:
+                logging.warning("Killing segment processes " + str(pending))
+                for pid in pending:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                        os.waitpid(pid, 0)
+                    except (ProcessLookupError, ChildProcessError):
+                        pass
+                break
+            time.sleep(0.01)
@@ -0,0 +1,79 @@
+from enum import Enum
+from typing import TYPE_CHECKING, Tuple, Union
+
+import globalvars
+import shmring
+import streamlink
+from errors import ParameterError
+from moduleid import ModuleID
+from serialreciever import SerialReciever
+from serialsender import SerialSender
+from streamlink import StreamLink
+
+if TYPE_CHECKING:
+    from dispatcher import Dispatcher
+
+"""
+Creating gateway pairs connecting two segments
+"""
+
+
+class GatewayTransport(Enum):
+    # python objects handed over to the other side receiver queue
+    IN_PROCESS = 1
+    # encoded messages framed over a byte stream (socket pair)
+    STREAM = 2
+    # encoded messages in shared memory rings, for segments in forked processes on the same host
+    SHARED_MEMORY = 3
+    # other side dispatcher called synchronously in the distributing thread, no thread handoffs
+    DIRECT = 4
+    # encoded messages framed over a serial line - devices of globalvars.ttyDevices, pseudo terminals if None
+    TTY = 5
+
+
+# transports with a link, their sides can run in different processes
+LINKED_TRANSPORTS = (GatewayTransport.STREAM, GatewayTransport.SHARED_MEMORY, GatewayTransport.TTY)
+
+
+def createLinkPair(transport: GatewayTransport) -> Tuple[Union[StreamLink, shmring.ShmLink], ...]:
+    if transport == GatewayTransport.SHARED_MEMORY:
+        return shmring.createShmPair()
+    elif transport == GatewayTransport.STREAM:
+        return streamlink.createSocketPair()
+    elif transport == GatewayTransport.TTY:
+        if globalvars.ttyDevices is not None:
+            return streamlink.openTtyPair(*globalvars.ttyDevices)
+        return streamlink.createPtyPair()
+    raise ParameterError(str(transport) + " has no link")
+
+
+def createGatewayPair(transport: GatewayTransport,
+                      name1: str, dispatcher1: 'Dispatcher', senderID1: ModuleID, receiverID1: ModuleID,
+                      name2: str, dispatcher2: 'Dispatcher', senderID2: ModuleID, receiverID2: ModuleID) -> None:
+    """
+    Sender on side 1 relays to receiver on side 2 and vice versa
+    """
+    if transport in LINKED_TRANSPORTS:
+        link1, link2 = createLinkPair(transport)
+        createLinkedGateway(link1, name1, dispatcher1, senderID1, receiverID1, name2)
+        createLinkedGateway(link2, name2, dispatcher2, senderID2, receiverID2, name1)
+    else:
+        receiver1 = SerialReciever(id=receiverID1, name=name2 + '->' + name1, dispatcher=dispatcher1,
+                                   mySideSenderID=senderID1)
+        receiver2 = SerialReciever(id=receiverID2, name=name1 + '->' + name2, dispatcher=dispatcher2,
+                                   mySideSenderID=senderID2)
+        direct = transport == GatewayTransport.DIRECT
+        SerialSender(id=senderID1, name=name1 + '->' + name2, dispatcher=dispatcher1, otherSideReceiver=receiver2,
+                     direct=direct)
+        SerialSender(id=senderID2, name=name2 + '->' + name1, dispatcher=dispatcher2, otherSideReceiver=receiver1,
+                     direct=direct)
+
+
+def createLinkedGateway(link: Union[StreamLink, shmring.ShmLink], name: str, dispatcher: 'Dispatcher', senderID: ModuleID,
+                        receiverID: ModuleID, otherSideName: str) -> None:
+    """
+    One side of a gateway pair over a stream link, the other side can run in another process
+    """
+    SerialReciever(id=receiverID, name=otherSideName + '->' + name, dispatcher=dispatcher,
+                   mySideSenderID=senderID, link=link)
+    SerialSender(id=senderID, name=name + '->' + otherSideName, dispatcher=dispatcher, link=link)
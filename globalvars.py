@@ -1,12 +1,33 @@
 from threading import Event
-from typing import List
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
+from consumerregistry import ConsumerRegistry
+from dispatchtrace import DispatchTrace
 from moduleid import ModuleID
 
-msgConsumers = None  # type: List['MsgConsumer']
-# flag for access to msgConsumers list
+if TYPE_CHECKING:
+    from trafficrecorder import TrafficRecorder
+
+# all consumers register themselves upon construction
+consumerRegistry = ConsumerRegistry()
+# set once all consumers of the initial topology are constructed
 consumersReadyEvent = Event()
 
+# ring buffer of dispatched messages, shared by all dispatchers
+dispatchTrace = DispatchTrace()
+
+# port of the HTTP endpoint with dispatch metrics, None disables it
+metricsPort = 8083  # type: Optional[int]
+
+# file recording all distributed messages for a replay, None disables it.
+# Segment processes record to the file suffixed with the segment name
+trafficRecordFile = None  # type: Optional[str]
+# created by control.py when recording
+trafficRecorder = None  # type: Optional[TrafficRecorder]
+
+# serial devices connected by a null-modem cable for GatewayTransport.TTY, None = pseudo terminal pair
+ttyDevices = None  # type: Optional[Tuple[str, str]]
+
 realSourceIDs = None  # type: List[ModuleID]
 webAppRunning = False  # type: bool
 
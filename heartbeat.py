@@ -1,9 +1,8 @@
-import time
 from typing import TYPE_CHECKING
 
+from asyncmsgconsumer import AsyncMsgConsumer
 from groupid import GroupID
 from moduleid import ModuleID
-from msgconsumer import MsgConsumer
 from msgid import MsgID
 from msgs.message import Message
 from msgs.requestmsg import RequestMsg
@@ -12,25 +11,25 @@ if TYPE_CHECKING:
     from dispatcher import Dispatcher
 
 """
-Heartbeat thread periodically requesting status updates 
+Heartbeat periodically requesting status updates 
 """
 
+HEARTBEAT_INTERVAL = 2
 
-class Heartbeat(MsgConsumer):
+
+class Heartbeat(AsyncMsgConsumer):
     def __init__(self, dispatcher: 'Dispatcher'):
-        # call the thread class
         super().__init__(id=ModuleID.HEARTBEAT, name='Heartbeat', dispatcher=dispatcher)
 
-    # noinspection PyShadowingNames
-    def run(self):
-        while not self.stopped():
-            time.sleep(2)
-            msg = RequestMsg(ModuleID.HEARTBEAT, typeID=MsgID.REQ_SOURCE_STATUS, groupID=GroupID.SOURCE)
-            self.dispatcher.distribute(msg, self.id)
-            msg = RequestMsg(ModuleID.HEARTBEAT, typeID=MsgID.REQ_CURRENT_VOL_INFO, forID=ModuleID.VOLUME_OPERATOR)
-            self.dispatcher.distribute(msg, self.id)
-            # only one run during development
-            self.stop()
+    def _initializeInThread(self):
+        super()._initializeInThread()
+        self._callLater(HEARTBEAT_INTERVAL, self._beat)
+
+    def _beat(self):
+        msg = RequestMsg(ModuleID.HEARTBEAT, typeID=MsgID.REQ_SOURCE_STATUS, groupID=GroupID.SOURCE)
+        self.dispatcher.distribute(msg, self.id)
+        msg = RequestMsg(ModuleID.HEARTBEAT, typeID=MsgID.REQ_CURRENT_VOL_INFO, forID=ModuleID.VOLUME_OPERATOR)
+        self.dispatcher.distribute(msg, self.id)
 
     def _consume(self, msg: 'Message') -> bool:
         # never called
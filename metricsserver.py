@@ -0,0 +1,63 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import dispatchmetrics
+import globalvars
+
+"""
+Optional HTTP endpoint with dispatch metrics, running next to the WebUI:
+    /metrics        text, rates since the previous request of the page
+    /metrics.json   JSON snapshot with raw counters
+    /trace          dump of the dispatch trace
+"""
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            snapshot = self.server.rateWindow.addRates(dispatchmetrics.snapshotAll())
+            self._reply('text/plain', dispatchmetrics.renderText(snapshot))
+        elif path == '/metrics.json':
+            self._reply('application/json', json.dumps(dispatchmetrics.snapshotAll(), indent=2))
+        elif path == '/trace':
+            self._reply('text/plain', '\n'.join(globalvars.dispatchTrace.dump()) + '\n')
+        else:
+            self.send_error(404)
+
+    def _reply(self, contentType: str, body: str) -> None:
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', contentType + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # polled periodically, not logging each request
+        pass
+
+
+# the endpoint exposes the dispatch trace with message contents, not served to the network unless asked for
+DEFAULT_HOST = '127.0.0.1'
+
+
+class MetricsServer(Thread):
+    def __init__(self, port: int, host: str = DEFAULT_HOST):
+        Thread.__init__(self, name='MetricsServer')
+        self.setDaemon(True)
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        # rates of the text page cover the period since its previous request, JSON readers get raw counts
+        self._server.rateWindow = dispatchmetrics.RateWindow()
+        logging.info("Metrics available at http://" + host + ":" + str(port) + "/metrics")
+        self.start()
+
+    def run(self):
+        self._server.serve_forever()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,62 +1,64 @@
 import abc
 import logging
-from queue import Queue, Empty
 from threading import Thread, Event
-from typing import TYPE_CHECKING, List
+from time import monotonic
+from typing import TYPE_CHECKING, List, FrozenSet, Dict, Iterable
 
 import dispatcher
+import globalvars
 from cansendmessage import CanSendMessage
+from dispatchmetrics import ConsumerMetrics
 from groupid import GroupID
 from moduleid import ModuleID
 from msgid import MsgID
+from msgqueue import MsgQueue, Priority, QueuePolicy, DEFAULT_MSG_PRIORITIES, DEFAULT_QUEUE_POLICY
+from msgs.batchmsg import BatchMsg
 from msgs.integermsg import IntegerMsg
 from msgs.message import Message
+from msgs.subscriptionsmsg import SubscriptionsMsg, Pattern
 
 if TYPE_CHECKING:
     from dispatcher import Dispatcher
 
 """
-Abstract message consumer 
+Abstract message consumers - the common part and the thread-based MsgConsumer
 """
 
 
-class MsgConsumer(CanSendMessage, Thread, abc.ABC):
+class BaseMsgConsumer(CanSendMessage, abc.ABC):
+    """
+    Receive queue, metrics and the consuming contract shared by MsgConsumer and AsyncMsgConsumer.
+    Subclasses only decide where and when _consumeEntry runs
+    """
+
     # noinspection PyShadowingBuiltins
     def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher'):
         CanSendMessage.__init__(self, id, dispatcher)
-        # call the thread class
-        Thread.__init__(self)
         self.name = name
-        self.dispatcher = dispatcher
-        self.__event = Event()
+        self._stopEvent = Event()
         # command queue - contains XXXCommands
-        self.receiveQ = Queue()
-        self.setDaemon(True)
-        # unique ID among modules of same type
-        self.id = id
-        self.start()
+        self.receiveQ = MsgQueue(self._getCoalescibleMsgIDs(), self._getMsgPriorities(), self._getQueuePolicy())
+        self.metrics = ConsumerMetrics()
 
     def stop(self):
-        self.__event.set()
+        self._stopEvent.set()
 
     def stopped(self) -> bool:
-        return self.__event.isSet()
+        return self._stopEvent.isSet()
 
-    def run(self):
-        self._initializeInThread()
-        try:
-            while not self.stopped():
-                # no timeout
-                try:
-                    # timeout allows to stop the thread
-                    msg = self.receiveQ.get(timeout=3)
-                    if msg is not None:
-                        self._consume(msg)
-                except Empty:
-                    # dropping the msg or ignoring the Empty exception, continuing
-                    pass
-        except Exception as e:
-            logging.error(e, exc_info=True)
+    def _consumeEntry(self, msg: 'Message', enqueuedAt: float) -> None:
+        """
+        Consumes one dequeued message, timing it for the metrics
+        """
+        startedAt = monotonic()
+        if msg.typeID == MsgID.BATCH_MSG:
+            self._consumeBatch(msg)
+        else:
+            self._consumeOne(msg)
+        self.metrics.msgConsumed(startedAt - enqueuedAt, monotonic() - startedAt)
+
+    def _consumeOne(self, msg: 'Message') -> None:
+        self._consume(msg)
 
     def receive(self, msg: 'Message'):
         self.receiveQ.put(msg)
@@ -71,6 +73,13 @@ class MsgConsumer(CanSendMessage, Thread, abc.ABC):
         """
         pass
 
+    def _consumeBatch(self, batch: BatchMsg) -> None:
+        """
+        Default - inner messages consumed one by one, in order
+        """
+        for msg in batch.msgs:
+            self._consumeOne(msg)
+
     def close(self):
         self.stop()
 
@@ -79,6 +88,13 @@ class MsgConsumer(CanSendMessage, Thread, abc.ABC):
         self.dispatcher.distribute(
             IntegerMsg(self._getEncodedGroupIDs(), self.id, MsgID.IN_GROUPS_MSG), self.id)
 
+    def _subscribe(self, patterns: Iterable[Pattern]) -> None:
+        """
+        Replaces subscriptions of this module in all dispatchers.
+        :param patterns: (MsgID, fromID) of FILTERABLE_MSG_IDS messages to receive, empty = none of them
+        """
+        self.dispatcher.distribute(SubscriptionsMsg(frozenset(patterns), self.id), self.id)
+
     def _getEncodedGroupIDs(self) -> int:
         groupIDs = self._getGroupIDs()  # type: List[GroupID]
         return dispatcher.encodeGroupIDs(groupIDs)
@@ -86,5 +102,63 @@ class MsgConsumer(CanSendMessage, Thread, abc.ABC):
     def _getGroupIDs(self) -> List[GroupID]:
         return []
 
+    def _getCoalescibleMsgIDs(self) -> FrozenSet[MsgID]:
+        """
+        Message types where only the latest pending message per (typeID, fromID, forID, groupID) is consumed.
+        Default - strict FIFO
+        """
+        return frozenset()
+
+    def _getMsgPriorities(self) -> Dict[MsgID, Priority]:
+        """
+        Queue lane for each message type, user commands overtake requests, requests overtake info messages
+        """
+        return DEFAULT_MSG_PRIORITIES
+
+    def getLaneDepths(self) -> Dict[Priority, int]:
+        """
+        For monitoring
+        """
+        return self.receiveQ.getLaneDepths()
+
+    def _getQueuePolicy(self) -> QueuePolicy:
+        """
+        Capacity, overflow policies and TTLs of the receive queue
+        """
+        return DEFAULT_QUEUE_POLICY
+
+    def getQueues(self) -> Dict[str, MsgQueue]:
+        """
+        For monitoring - all message queues of the consumer
+        """
+        return {'receiveQ': self.receiveQ}
+
     def __str__(self) -> str:
         return self.name
+
+
+class MsgConsumer(BaseMsgConsumer, Thread):
+    # noinspection PyShadowingBuiltins
+    def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher'):
+        # call the thread class
+        Thread.__init__(self)
+        BaseMsgConsumer.__init__(self, id, name, dispatcher)
+        self.setDaemon(True)
+        globalvars.consumerRegistry.register(self)
+        self.start()
+
+    def stop(self):
+        super().stop()
+        # None sentinel wakes up the thread waiting for messages
+        self.receiveQ.put(None)
+
+    def run(self):
+        self._initializeInThread()
+        try:
+            while not self.stopped():
+                # no timeout, stop() wakes up the queue
+                msg, enqueuedAt = self.receiveQ.getEntry()
+                if msg is not None:
+                    self._consumeEntry(msg, enqueuedAt)
+        except Exception as e:
+            logging.error(e, exc_info=True)
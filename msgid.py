@@ -72,3 +72,11 @@ class MsgID(Enum):
     # IntegerMsg(value = bitmapped groupIDs)
     # informs dispatchers about groups of the sender
     IN_GROUPS_MSG = 19
+
+    # SubscriptionsMsg(patterns = frozenset of (MsgID, fromID))
+    # informs dispatchers about filterable info messages wanted by the sender
+    SUBSCRIPTIONS_MSG = 20
+
+    # BatchMsg(msgs = list of messages)
+    # related messages of one sender delivered in one dispatch
+    BATCH_MSG = 21
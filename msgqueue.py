@@ -0,0 +1,321 @@
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from enum import Enum
+from queue import Empty
+from threading import Condition, Lock, local
+from time import monotonic
+from typing import DefaultDict, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgs.message import Message
+
+"""
+Receive queue of MsgConsumer
+"""
+
+DEFAULT_CAPACITY = 1000
+# BLOCK waits at most this long for room in the queue, then drops the new message
+BLOCK_TIMEOUT = 1.0
+
+# info messages where only the latest value is of any interest
+COALESCIBLE_INFO_MSG_IDS = frozenset([
+    MsgID.TIME_POS_INFO,
+    MsgID.CURRENT_VOL_INFO,
+    MsgID.METADATA_INFO,
+    MsgID.AUDIOPARAMS_INFO,
+])  # type: FrozenSet[MsgID]
+
+
+class Priority(Enum):
+    """
+    Queue lanes, lower value is consumed first
+    """
+    COMMAND = 0
+    REQUEST = 1
+    INFO = 2
+
+
+# msgIDs not listed are INFO
+DEFAULT_MSG_PRIORITIES = {
+    MsgID.SET_VOL: Priority.COMMAND,
+    MsgID.ACTIVATE_SOURCE: Priority.COMMAND,
+    MsgID.PLAY_NODE: Priority.COMMAND,
+    MsgID.SOURCE_PLAY_COMMAND: Priority.COMMAND,
+    MsgID.CREATE_NODE_BOOKMARK: Priority.COMMAND,
+    MsgID.DELETE_NODE_BOOKMARK: Priority.COMMAND,
+    # routing information must not wait behind the traffic it routes
+    MsgID.IN_GROUPS_MSG: Priority.COMMAND,
+    MsgID.SUBSCRIPTIONS_MSG: Priority.COMMAND,
+    MsgID.REQ_CURRENT_VOL_INFO: Priority.REQUEST,
+    MsgID.REQ_SOURCE_STATUS: Priority.REQUEST,
+    MsgID.REQ_NODE: Priority.REQUEST,
+    MsgID.REQ_PARENT_NODE: Priority.REQUEST,
+}  # type: Dict[MsgID, Priority]
+
+class OverflowPolicy(Enum):
+    """
+    What put() does with a message of the type when the queue is full
+    """
+    # evicts the oldest message of a lower lane, if none waits up to BLOCK_TIMEOUT for the consumer
+    # - backpressure on the sender
+    BLOCK = 1
+    # evicts the oldest message of the lowest lane not outranking the new message
+    DROP_OLDEST = 2
+    # drops the new message
+    DROP_NEWEST = 3
+
+
+# msgIDs not listed are DROP_OLDEST
+DEFAULT_OVERFLOW_POLICIES = {
+    MsgID.SET_VOL: OverflowPolicy.BLOCK,
+    MsgID.ACTIVATE_SOURCE: OverflowPolicy.BLOCK,
+    MsgID.PLAY_NODE: OverflowPolicy.BLOCK,
+    MsgID.SOURCE_PLAY_COMMAND: OverflowPolicy.BLOCK,
+    MsgID.CREATE_NODE_BOOKMARK: OverflowPolicy.BLOCK,
+    MsgID.DELETE_NODE_BOOKMARK: OverflowPolicy.BLOCK,
+    MsgID.IN_GROUPS_MSG: OverflowPolicy.BLOCK,
+    MsgID.SUBSCRIPTIONS_MSG: OverflowPolicy.BLOCK,
+    # a repeated request is more useful than an old one
+    MsgID.REQ_CURRENT_VOL_INFO: OverflowPolicy.DROP_NEWEST,
+    MsgID.REQ_SOURCE_STATUS: OverflowPolicy.DROP_NEWEST,
+}  # type: Dict[MsgID, OverflowPolicy]
+
+# seconds since Message.createdAt after which a queued message is dropped instead of consumed
+DEFAULT_MSG_TTLS = {
+    MsgID.TIME_POS_INFO: 2.0,
+    MsgID.REQ_NODE: 5.0,
+    MsgID.REQ_PARENT_NODE: 5.0,
+    MsgID.REQ_SOURCE_STATUS: 5.0,
+    MsgID.REQ_CURRENT_VOL_INFO: 5.0,
+}  # type: Dict[MsgID, float]
+
+
+class QueuePolicy:
+    def __init__(self, capacity: Optional[int] = DEFAULT_CAPACITY,
+                 overflowPolicies: Dict[MsgID, OverflowPolicy] = DEFAULT_OVERFLOW_POLICIES,
+                 msgTTLs: Dict[MsgID, float] = DEFAULT_MSG_TTLS):
+        """
+        :param capacity: None = unbounded
+        """
+        self.capacity = capacity
+        self.overflowPolicies = overflowPolicies
+        self.msgTTLs = msgTTLs
+
+
+DEFAULT_QUEUE_POLICY = QueuePolicy()
+
+# starvation protection - a waiting lower lane is served after being overtaken MAX_OVERTAKES times
+MAX_OVERTAKES = 8
+
+_LANES = list(Priority)
+
+# threads which must not wait for room in any queue, see nonBlocking()
+_callerState = local()
+
+
+@contextmanager
+def nonBlocking():
+    """
+    Puts of the current thread within the context treat BLOCK as DROP_OLDEST,
+    e.g. a direct gateway distributing in the thread of the original sender
+    """
+    previous = getattr(_callerState, 'nonBlocking', False)
+    _callerState.nonBlocking = True
+    try:
+        yield
+    finally:
+        _callerState.nonBlocking = previous
+
+
+# addressed copies (e.g. retained values replayed to one UI) must not replace a broadcast or each other
+CoalescingKey = Tuple[MsgID, ModuleID, Optional[ModuleID], Optional[GroupID]]
+
+
+def _getCoalescingKey(msg: Message) -> CoalescingKey:
+    return msg.typeID, msg.fromID, msg.forID, msg.groupID
+
+
+class MsgQueue:
+    """
+    Queue with the put/get/get_nowait/qsize interface of queue.Queue.
+    Messages are split to priority lanes by their typeID, each lane is FIFO.
+    A message of a coalescible type replaces in place the pending message with the same (typeID, fromID, forID, groupID).
+    Capacity, overflow policies and TTLs are given by the QueuePolicy, the None wakeup sentinel bypasses them.
+    """
+
+    def __init__(self, coalescibleMsgIDs: FrozenSet[MsgID] = frozenset(),
+                 msgPriorities: Dict[MsgID, Priority] = DEFAULT_MSG_PRIORITIES,
+                 queuePolicy: QueuePolicy = DEFAULT_QUEUE_POLICY):
+        self._coalescibleMsgIDs = coalescibleMsgIDs
+        self._msgPriorities = msgPriorities
+        self._policy = queuePolicy
+        lock = Lock()
+        self._cond = Condition(lock)
+        self._notFull = Condition(lock)
+        # slots are [msg, enqueuedAt] lists so that a coalesced message can be replaced in place
+        self._lanes = [deque() for _ in _LANES]  # type: List[Deque[list]]
+        # how many times a non-empty lane was overtaken by a higher lane
+        self._overtakes = [0 for _ in _LANES]  # type: List[int]
+        self._size = 0
+        self._pendingSlots = {}  # type: Dict[CoalescingKey, list]
+        # statistics
+        self.coalescedCount = 0
+        self.peakSize = 0
+        self.droppedCounts = defaultdict(int)  # type: DefaultDict[MsgID, int]
+        self.expiredCount = 0
+
+    def put(self, msg: Optional[Message]) -> None:
+        with self._cond:
+            if msg is not None and msg.typeID in self._coalescibleMsgIDs:
+                key = _getCoalescingKey(msg)
+                slot = self._pendingSlots.get(key)
+                if slot is not None:
+                    # latest value wins, keeping the queue position
+                    slot[0] = msg
+                    slot[1] = monotonic()
+                    self.coalescedCount += 1
+                    return
+                if not self._makeRoom(msg):
+                    return
+                slot = [msg, monotonic()]
+                self._pendingSlots[key] = slot
+            else:
+                if msg is not None and not self._makeRoom(msg):
+                    return
+                slot = [msg, monotonic()]
+            self._lanes[self._getLaneIndex(msg)].append(slot)
+            self._size += 1
+            if self._size > self.peakSize:
+                self.peakSize = self._size
+            self._cond.notify()
+
+    def _makeRoom(self, msg: Message) -> bool:
+        """
+        Applies the overflow policy of the message. Called with the lock held
+        :return: msg can be queued
+        """
+        capacity = self._policy.capacity
+        if capacity is None or self._size < capacity:
+            return True
+        policy = self._policy.overflowPolicies.get(msg.typeID, OverflowPolicy.DROP_OLDEST)
+        if policy == OverflowPolicy.BLOCK and getattr(_callerState, 'nonBlocking', False):
+            policy = OverflowPolicy.DROP_OLDEST
+        if policy == OverflowPolicy.BLOCK:
+            if self._evictOldest(self._getLaneIndex(msg) + 1):
+                # lower priority messages make room without waiting
+                return True
+            deadline = monotonic() + BLOCK_TIMEOUT
+            while self._size >= capacity:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._notFull.wait(remaining)
+            else:
+                return True
+        elif policy == OverflowPolicy.DROP_OLDEST and self._evictOldest(self._getLaneIndex(msg)):
+            return True
+        self.droppedCounts[msg.typeID] += 1
+        return False
+
+    def _evictOldest(self, highestLaneIndex: int) -> bool:
+        """
+        Lowest lanes first, never evicting from lanes above highestLaneIndex
+        """
+        for index in range(len(self._lanes) - 1, highestLaneIndex - 1, -1):
+            lane = self._lanes[index]
+            for position, slot in enumerate(lane):
+                victim = slot[0]
+                if victim is not None:
+                    del lane[position]
+                    self._forgetSlot(slot)
+                    self._size -= 1
+                    self.droppedCounts[victim.typeID] += 1
+                    return True
+        return False
+
+    def _forgetSlot(self, slot: list) -> None:
+        msg = slot[0]
+        if msg is not None and msg.typeID in self._coalescibleMsgIDs:
+            key = _getCoalescingKey(msg)
+            if self._pendingSlots.get(key) is slot:
+                del self._pendingSlots[key]
+
+    def _isExpired(self, msg: Optional[Message], now: float) -> bool:
+        if msg is None:
+            return False
+        ttl = self._policy.msgTTLs.get(msg.typeID)
+        return ttl is not None and now - msg.createdAt > ttl
+
+    def _getLaneIndex(self, msg: Optional[Message]) -> int:
+        if msg is None:
+            # wakeup sentinel
+            return Priority.COMMAND.value
+        return self._msgPriorities.get(msg.typeID, Priority.INFO).value
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Optional[Message]:
+        msg, enqueuedAt = self.getEntry(block, timeout)
+        return msg
+
+    def getEntry(self, block: bool = True, timeout: Optional[float] = None) -> Tuple[Optional[Message], float]:
+        """
+        :return: message and its enqueueing time (time.monotonic)
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._size == 0:
+                    if not block:
+                        raise Empty
+                    if deadline is None:
+                        while self._size == 0:
+                            self._cond.wait()
+                    else:
+                        while self._size == 0:
+                            remaining = deadline - monotonic()
+                            if remaining <= 0:
+                                raise Empty
+                            self._cond.wait(remaining)
+                slot = self._lanes[self._chooseLaneIndex()].popleft()
+                self._size -= 1
+                self._forgetSlot(slot)
+                self._notFull.notify()
+                msg, enqueuedAt = slot
+                if not self._isExpired(msg, monotonic()):
+                    return msg, enqueuedAt
+                # stale, trying the next one
+                self.expiredCount += 1
+
+    def _chooseLaneIndex(self) -> int:
+        """
+        Highest non-empty lane, unless a lower lane has been overtaken too many times.
+        Called with the lock held and at least one message queued
+        """
+        chosen = None
+        for index, lane in enumerate(self._lanes):
+            if lane:
+                if chosen is None:
+                    chosen = index
+                else:
+                    self._overtakes[index] += 1
+                    if self._overtakes[index] >= MAX_OVERTAKES:
+                        # starving lower lane, serving it instead
+                        chosen = index
+                        break
+        self._overtakes[chosen] = 0
+        return chosen
+
+    def get_nowait(self) -> Optional[Message]:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return self._size
+
+    def getLaneDepths(self) -> Dict[Priority, int]:
+        with self._cond:
+            return {priority: len(self._lanes[priority.value]) for priority in _LANES}
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
@@ -0,0 +1,21 @@
+from typing import List
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgs.message import Message
+
+
+class BatchMsg(Message):
+    """
+    Envelope of related messages sent by one module at once, e.g. all track details after a track change.
+    Dispatchers route the inner messages, each target receives a single envelope with the messages routed to it.
+    Consumers unpack it within one consume call.
+    """
+
+    def __init__(self, msgs: List[Message], fromID: ModuleID, forID=ModuleID.ANY, groupID=GroupID.ANY):
+        super().__init__(fromID=fromID, typeID=MsgID.BATCH_MSG, forID=forID, groupID=groupID)
+        self.msgs = msgs
+
+    def __str__(self) -> str:
+        return super().__str__() + "; msgs: [" + ', '.join(msg.typeID.name for msg in self.msgs) + "]"
@@ -0,0 +1,329 @@
+"""
+Binary wire codec of messages.
+
+Every frame starts with a fixed little-endian header:
+    version (B), kind (B), typeID (B), fromID (B), forID (B), groupID (B), correlationID (H)
+followed by the kind-specific body. Enums are stored as their small int values,
+strings as length-prefixed UTF-8. A batch body is the count and length-prefixed encodings
+of its inner messages. Decoding works on memoryview slices, no intermediate copies.
+
+Benchmark: python3 -m msgs.codec
+"""
+import struct
+from typing import Callable, Dict, List, Tuple, Type
+
+from errors import ParameterError
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgs.audioparamsmsg import AudioParamsMsg, ParamsItem
+from msgs.batchmsg import BatchMsg
+from msgs.integermsg import IntegerMsg, BiIntegerMsg
+from msgs.jsonmsg import JsonMsg
+from msgs.message import Message
+from msgs.nodemsg import NodeMsg, NodeStruct, NodeItem
+from msgs.requestmsg import RequestMsg
+from msgs.subscriptionsmsg import SubscriptionsMsg
+from msgs.trackmsg import TrackMsg, TrackItem
+
+CODEC_VERSION = 2
+
+# message kinds - one for each Message subclass
+KIND_INTEGER = 1
+KIND_BI_INTEGER = 2
+KIND_REQUEST = 3
+KIND_NODE = 4
+KIND_TRACK = 5
+KIND_AUDIO_PARAMS = 6
+KIND_JSON = 7
+KIND_SUBSCRIPTIONS = 8
+KIND_BATCH = 9
+
+# NodeItem flags
+FLAG_PLAYABLE = 1
+FLAG_LEAF = 2
+FLAG_BOOKMARK = 4
+
+_HEADER = struct.Struct('<BBBBBBH')
+_INT = struct.Struct('<i')
+_BI_INT = struct.Struct('<ii')
+_SHORT_LEN = struct.Struct('<H')
+_LONG_LEN = struct.Struct('<I')
+_NODE_ITEM = struct.Struct('<iB')
+# signed - UIs compute fromChildIndex by arithmetic, it can get negative
+_NODE_STRUCT = struct.Struct('<iiiiH')
+_PARAMS = struct.Struct('<IBB')
+_PATTERN = struct.Struct('<BB')
+
+# value -> enum member, faster than calling the enum class
+_MSG_IDS = {member.value: member for member in MsgID}  # type: Dict[int, MsgID]
+_MODULE_IDS = {member.value: member for member in ModuleID}  # type: Dict[int, ModuleID]
+_GROUP_IDS = {member.value: member for member in GroupID}  # type: Dict[int, GroupID]
+
+
+def encode(msg: Message) -> bytes:
+    try:
+        kind, encodeBody = _ENCODERS[type(msg)]
+    except KeyError:
+        raise ParameterError("No wire encoding for message " + type(msg).__name__)
+    parts = [_HEADER.pack(CODEC_VERSION, kind, msg.typeID.value, msg.fromID.value, msg.forID.value,
+                          msg.groupID.value, msg.correlationID)]
+    encodeBody(msg, parts)
+    return b''.join(parts)
+
+
+def decode(buffer) -> Message:
+    """
+    :param buffer: bytes, bytearray or memoryview holding exactly one encoded message
+    """
+    view = memoryview(buffer)
+    version, kind, typeValue, fromValue, forValue, groupValue, correlationID = _HEADER.unpack_from(view, 0)
+    if version != CODEC_VERSION:
+        raise ParameterError("Unsupported codec version " + str(version))
+    try:
+        decodeBody = _DECODERS[kind]
+    except KeyError:
+        raise ParameterError("Unknown message kind " + str(kind))
+    msg, offset = decodeBody(view, _HEADER.size, _MSG_IDS[typeValue], _MODULE_IDS[fromValue],
+                             _MODULE_IDS[forValue], _GROUP_IDS[groupValue])
+    msg.correlationID = correlationID
+    return msg
+
+
+# ------------------ strings ------------------
+
+def _appendStr(value: str, parts: List[bytes], lenStruct: struct.Struct = _SHORT_LEN) -> None:
+    data = value.encode('utf-8')
+    parts.append(lenStruct.pack(len(data)))
+    parts.append(data)
+
+
+def _readStr(view: memoryview, offset: int, lenStruct: struct.Struct = _SHORT_LEN) -> Tuple[str, int]:
+    length, = lenStruct.unpack_from(view, offset)
+    offset += lenStruct.size
+    end = offset + length
+    return str(view[offset:end], 'utf-8'), end
+
+
+# ------------------ items ------------------
+
+def _appendNodeItem(item: NodeItem, parts: List[bytes]) -> None:
+    flags = (FLAG_PLAYABLE if item.isPlayable else 0) \
+            | (FLAG_LEAF if item.isLeaf else 0) \
+            | (FLAG_BOOKMARK if item.bookmarkID is not None else 0)
+    parts.append(_NODE_ITEM.pack(item.nodeID, flags))
+    if item.bookmarkID is not None:
+        parts.append(_INT.pack(item.bookmarkID))
+    _appendStr(item.label, parts)
+
+
+def _readNodeItem(view: memoryview, offset: int) -> Tuple[NodeItem, int]:
+    nodeID, flags = _NODE_ITEM.unpack_from(view, offset)
+    offset += _NODE_ITEM.size
+    bookmarkID = None
+    if flags & FLAG_BOOKMARK:
+        bookmarkID, = _INT.unpack_from(view, offset)
+        offset += _INT.size
+    label, offset = _readStr(view, offset)
+    return NodeItem(nodeID=nodeID, label=label, isPlayable=bool(flags & FLAG_PLAYABLE),
+                    isLeaf=bool(flags & FLAG_LEAF), bookmarkID=bookmarkID), offset
+
+
+# ------------------ bodies ------------------
+
+def _encodeInteger(msg: IntegerMsg, parts: List[bytes]) -> None:
+    parts.append(_INT.pack(msg.value))
+
+
+def _decodeInteger(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    value, = _INT.unpack_from(view, offset)
+    return IntegerMsg(value=value, fromID=fromID, typeID=typeID, forID=forID, groupID=groupID), \
+           offset + _INT.size
+
+
+def _encodeBiInteger(msg: BiIntegerMsg, parts: List[bytes]) -> None:
+    parts.append(_BI_INT.pack(msg.value1, msg.value2))
+
+
+def _decodeBiInteger(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    value1, value2 = _BI_INT.unpack_from(view, offset)
+    return BiIntegerMsg(value1=value1, value2=value2, fromID=fromID, typeID=typeID, forID=forID,
+                        groupID=groupID), offset + _BI_INT.size
+
+
+# noinspection PyUnusedLocal
+def _encodeRequest(msg: RequestMsg, parts: List[bytes]) -> None:
+    # header only
+    pass
+
+
+def _decodeRequest(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    return RequestMsg(fromID=fromID, typeID=typeID, forID=forID, groupID=groupID), offset
+
+
+def _encodeNode(msg: NodeMsg, parts: List[bytes]) -> None:
+    struct_ = msg.nodeStruct
+    _appendNodeItem(struct_.node, parts)
+    _appendNodeItem(struct_.rootNode, parts)
+    parts.append(_NODE_STRUCT.pack(struct_.totalParents, struct_.parentID, struct_.fromChildIndex,
+                                   struct_.totalChildren, len(struct_.children)))
+    for child in struct_.children:
+        _appendNodeItem(child, parts)
+
+
+# noinspection PyUnusedLocal
+def _decodeNode(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    node, offset = _readNodeItem(view, offset)
+    rootNode, offset = _readNodeItem(view, offset)
+    totalParents, parentID, fromChildIndex, totalChildren, childrenCount = _NODE_STRUCT.unpack_from(view, offset)
+    offset += _NODE_STRUCT.size
+    children = []  # type: List[NodeItem]
+    for _ in range(childrenCount):
+        child, offset = _readNodeItem(view, offset)
+        children.append(child)
+    struct_ = NodeStruct(node=node, rootNode=rootNode, totalParents=totalParents, parentID=parentID,
+                         children=children, fromChildIndex=fromChildIndex, totalChildren=totalChildren)
+    return NodeMsg(nodeStruct=struct_, fromID=fromID, forID=forID, groupID=groupID), offset
+
+
+def _encodeTrack(msg: TrackMsg, parts: List[bytes]) -> None:
+    item = msg.trackItem
+    parts.append(_INT.pack(item.nodeID))
+    _appendStr(item.label, parts)
+    _appendStr(item.descr, parts)
+
+
+# noinspection PyUnusedLocal
+def _decodeTrack(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    nodeID, = _INT.unpack_from(view, offset)
+    label, offset = _readStr(view, offset + _INT.size)
+    descr, offset = _readStr(view, offset)
+    return TrackMsg(trackItem=TrackItem(nodeID=nodeID, label=label, descr=descr), fromID=fromID, forID=forID,
+                    groupID=groupID), offset
+
+
+def _encodeAudioParams(msg: AudioParamsMsg, parts: List[bytes]) -> None:
+    item = msg.paramsItem
+    parts.append(_PARAMS.pack(item.rate, item.bits, item.channels))
+
+
+# noinspection PyUnusedLocal
+def _decodeAudioParams(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    rate, bits, channels = _PARAMS.unpack_from(view, offset)
+    return AudioParamsMsg(paramsItem=ParamsItem(rate=rate, bits=bits, channels=channels), fromID=fromID,
+                          forID=forID, groupID=groupID), offset + _PARAMS.size
+
+
+def _encodeJson(msg: JsonMsg, parts: List[bytes]) -> None:
+    _appendStr(msg.json, parts, _LONG_LEN)
+
+
+def _decodeJson(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    json, offset = _readStr(view, offset, _LONG_LEN)
+    return JsonMsg(json=json, fromID=fromID, typeID=typeID, forID=forID, groupID=groupID), offset
+
+
+def _encodeSubscriptions(msg: SubscriptionsMsg, parts: List[bytes]) -> None:
+    parts.append(_SHORT_LEN.pack(len(msg.patterns)))
+    for msgID, fromID in msg.patterns:
+        parts.append(_PATTERN.pack(msgID.value, fromID.value))
+
+
+# noinspection PyUnusedLocal
+def _decodeSubscriptions(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    count, = _SHORT_LEN.unpack_from(view, offset)
+    offset += _SHORT_LEN.size
+    patterns = []
+    for _ in range(count):
+        msgValue, fromValue = _PATTERN.unpack_from(view, offset)
+        patterns.append((_MSG_IDS[msgValue], _MODULE_IDS[fromValue]))
+        offset += _PATTERN.size
+    return SubscriptionsMsg(patterns=frozenset(patterns), fromID=fromID, forID=forID, groupID=groupID), offset
+
+
+def _encodeBatch(msg: BatchMsg, parts: List[bytes]) -> None:
+    parts.append(_SHORT_LEN.pack(len(msg.msgs)))
+    for innerMsg in msg.msgs:
+        encoded = encode(innerMsg)
+        parts.append(_LONG_LEN.pack(len(encoded)))
+        parts.append(encoded)
+
+
+# noinspection PyUnusedLocal
+def _decodeBatch(view, offset, typeID, fromID, forID, groupID) -> Tuple[Message, int]:
+    count, = _SHORT_LEN.unpack_from(view, offset)
+    offset += _SHORT_LEN.size
+    msgs = []  # type: List[Message]
+    for _ in range(count):
+        length, = _LONG_LEN.unpack_from(view, offset)
+        offset += _LONG_LEN.size
+        msgs.append(decode(view[offset:offset + length]))
+        offset += length
+    return BatchMsg(msgs=msgs, fromID=fromID, forID=forID, groupID=groupID), offset
+
+
+_ENCODERS = {
+    IntegerMsg: (KIND_INTEGER, _encodeInteger),
+    BiIntegerMsg: (KIND_BI_INTEGER, _encodeBiInteger),
+    RequestMsg: (KIND_REQUEST, _encodeRequest),
+    NodeMsg: (KIND_NODE, _encodeNode),
+    TrackMsg: (KIND_TRACK, _encodeTrack),
+    AudioParamsMsg: (KIND_AUDIO_PARAMS, _encodeAudioParams),
+    JsonMsg: (KIND_JSON, _encodeJson),
+    SubscriptionsMsg: (KIND_SUBSCRIPTIONS, _encodeSubscriptions),
+    BatchMsg: (KIND_BATCH, _encodeBatch),
+}  # type: Dict[Type[Message], Tuple[int, Callable]]
+
+_DECODERS = {
+    KIND_INTEGER: _decodeInteger,
+    KIND_BI_INTEGER: _decodeBiInteger,
+    KIND_REQUEST: _decodeRequest,
+    KIND_NODE: _decodeNode,
+    KIND_TRACK: _decodeTrack,
+    KIND_AUDIO_PARAMS: _decodeAudioParams,
+    KIND_JSON: _decodeJson,
+    KIND_SUBSCRIPTIONS: _decodeSubscriptions,
+    KIND_BATCH: _decodeBatch,
+}  # type: Dict[int, Callable]
+
+
+def _createSampleMsgs() -> Dict[str, Message]:
+    children = [NodeItem(nodeID=100 + i, label="Track " + str(i) + " - Some artist", isPlayable=True, isLeaf=True,
+                         bookmarkID=None) for i in range(5)]
+    root = NodeItem(nodeID=1, label="Hudba", isPlayable=True, isLeaf=False, bookmarkID=None)
+    node = NodeItem(nodeID=42, label="Album", isPlayable=True, isLeaf=False, bookmarkID=None)
+    struct_ = NodeStruct(node=node, rootNode=root, totalParents=2, parentID=7, children=children,
+                         fromChildIndex=10, totalChildren=2000)
+    samples = {
+        'TIME_POS_INFO': BiIntegerMsg(value1=65, value2=300, fromID=ModuleID.FILE_SOURCE,
+                                      typeID=MsgID.TIME_POS_INFO, groupID=GroupID.UI),
+        'CURRENT_VOL_INFO': IntegerMsg(value=10, fromID=ModuleID.VOLUME_OPERATOR, typeID=MsgID.CURRENT_VOL_INFO,
+                                       groupID=GroupID.UI),
+        'REQ_SOURCE_STATUS': RequestMsg(ModuleID.HEARTBEAT, typeID=MsgID.REQ_SOURCE_STATUS,
+                                        groupID=GroupID.SOURCE),
+        'NODE_INFO': NodeMsg(nodeStruct=struct_, fromID=ModuleID.FILE_SOURCE, groupID=GroupID.UI),
+        'TRACK_INFO': TrackMsg(trackItem=TrackItem(nodeID=104, label="Album/Track 4 - Some artist", descr=""),
+                               fromID=ModuleID.FILE_SOURCE, groupID=GroupID.UI),
+        'AUDIOPARAMS_INFO': AudioParamsMsg(paramsItem=ParamsItem(rate=44100, bits=16, channels=2),
+                                           fromID=ModuleID.FILE_SOURCE, groupID=GroupID.UI),
+        'METADATA_INFO': JsonMsg(json='{"T": "Some title", "B": "128"}', fromID=ModuleID.RADIO_SOURCE,
+                                 typeID=MsgID.METADATA_INFO, groupID=GroupID.UI),
+        'SUBSCRIPTIONS_MSG': SubscriptionsMsg(patterns=frozenset([(MsgID.TIME_POS_INFO, ModuleID.FILE_SOURCE),
+                                                                  (MsgID.METADATA_INFO, ModuleID.ANY)]),
+                                              fromID=ModuleID.WEBUI_PC),
+    }
+    samples['BATCH_MSG'] = BatchMsg(msgs=[samples['TRACK_INFO'], samples['AUDIOPARAMS_INFO'],
+                                          samples['TIME_POS_INFO']], fromID=ModuleID.FILE_SOURCE)
+    return samples
+
+
+if __name__ == "__main__":
+    import timeit
+
+    rounds = 20000
+    for name, sampleMsg in _createSampleMsgs().items():
+        encoded = encode(sampleMsg)
+        encodeSecs = timeit.timeit(lambda: encode(sampleMsg), number=rounds)
+        decodeSecs = timeit.timeit(lambda: decode(encoded), number=rounds)
+        print("%-18s %5d B   encode %9.0f msgs/s   decode %9.0f msgs/s"
+              % (name, len(encoded), rounds / encodeSecs, rounds / decodeSecs))
@@ -1,10 +1,15 @@
 """
 Abstract message
 """
+from time import monotonic
+
 from groupid import GroupID
 from moduleid import ModuleID
 from msgid import MsgID
 
+# correlationID of messages not related to any request
+NO_CORRELATION = 0
+
 
 class Message():
     def __init__(self, fromID: ModuleID, typeID: MsgID, forID: ModuleID, groupID: GroupID):
@@ -12,9 +17,14 @@ class Message():
         self.fromID = fromID
         self.forID = forID
         self.groupID = groupID
+        # set by the requester, copied by the responder to its reply
+        self.correlationID = NO_CORRELATION
+        # time.monotonic() of creation in this process, for staleness checks
+        self.createdAt = monotonic()
 
     def __str__(self) -> str:
         return "typeID: " + str(self.typeID) \
                + "; fromID: " + str(self.fromID) \
                + "; forID: " + str(self.forID) \
-               + "; groupID: " + str(self.groupID)
+               + "; groupID: " + str(self.groupID) \
+               + ("; correlationID: " + str(self.correlationID) if self.correlationID != NO_CORRELATION else "")
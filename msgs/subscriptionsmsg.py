@@ -0,0 +1,35 @@
+from typing import FrozenSet, Tuple
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgs.message import Message
+
+# (msgID, fromID), fromID ModuleID.ANY matches all senders
+Pattern = Tuple[MsgID, ModuleID]
+
+# high-rate info messages delivered to subscribed modules only when matching their patterns
+FILTERABLE_MSG_IDS = frozenset([
+    MsgID.TIME_POS_INFO,
+    MsgID.METADATA_INFO,
+    MsgID.AUDIOPARAMS_INFO,
+])  # type: FrozenSet[MsgID]
+
+
+class SubscriptionsMsg(Message):
+    """
+    Replaces all subscriptions of the sender.
+    Modules which never sent subscriptions receive all filterable messages of their groups.
+    """
+
+    def __init__(self, patterns: FrozenSet[Pattern], fromID: ModuleID, forID=ModuleID.ANY, groupID=GroupID.ANY):
+        super().__init__(fromID=fromID, typeID=MsgID.SUBSCRIPTIONS_MSG, forID=forID, groupID=groupID)
+        self.patterns = patterns
+
+    def __str__(self) -> str:
+        return super().__str__() + "; patterns: " \
+               + ', '.join(msgID.name + '/' + fromID.name for msgID, fromID in sorted(self.patterns, key=str))
+
+
+def matches(patterns: FrozenSet[Pattern], msgID: MsgID, fromID: ModuleID) -> bool:
+    return (msgID, fromID) in patterns or (msgID, ModuleID.ANY) in patterns
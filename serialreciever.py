@@ -1,8 +1,15 @@
 import logging
-from typing import TYPE_CHECKING
+import struct
+from collections import deque
+from typing import TYPE_CHECKING, Optional, Deque
 
+from errors import ParameterError
 from moduleid import ModuleID
 from msgconsumer import MsgConsumer
+from msgs import codec
+from msgs.message import Message
+from streamlink import StreamLink
+from uis.abstractreader import AbstractReader
 
 if TYPE_CHECKING:
     from dispatcher import Dispatcher
@@ -13,9 +20,13 @@ sender - relay of messages between serial ports
 
 class SerialReciever(MsgConsumer):
     # noinspection PyShadowingBuiltins
-    def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher', mySideSenderID: ModuleID):
+    def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher', mySideSenderID: ModuleID,
+                 link: Optional[StreamLink] = None):
         super().__init__(id, name='SerialReceiver ' + name, dispatcher=dispatcher)
         self.senderID = mySideSenderID
+        self.link = link
+        if link is not None:
+            self._linkReader = LinkReader(link, self)
 
     # consuming the message
     def _consume(self, msg):
@@ -24,3 +35,51 @@ class SerialReciever(MsgConsumer):
         else:
             # just distributing the message
             self.dispatcher.distribute(msg, self.senderID)
+
+    def receiveDirectly(self, msg: 'Message') -> None:
+        """
+        Distributing in the caller thread, bypassing the queue. Routes are learned the same way
+        """
+        self._consume(msg)
+
+    def _consumeBatch(self, batch):
+        # routed by the dispatcher as a whole
+        self._consume(batch)
+
+    def close(self):
+        super().close()
+        if self.link is not None:
+            self._linkReader.close()
+            # unblocks the reader thread
+            self.link.close()
+
+
+class LinkReader(AbstractReader):
+    """
+    Reads frames from the stream link, decoded messages are passed to the receiver queue
+    """
+
+    def __init__(self, link: StreamLink, receiver: SerialReciever):
+        self._link = link
+        self._receiver = receiver
+        self._pending = deque()  # type: Deque[bytes]
+        super().__init__()
+
+    def _readMsg(self) -> Optional['Message']:
+        if not self._pending:
+            try:
+                self._pending.extend(self._link.read())
+            except (EOFError, OSError) as e:
+                logging.info(str(self._receiver) + ": stream link closed: " + str(e))
+                self.stop()
+                return None
+        if self._pending:
+            payload = self._pending.popleft()
+            try:
+                return codec.decode(payload)
+            except (ParameterError, struct.error, KeyError, UnicodeDecodeError) as e:
+                logging.warning(str(self._receiver) + ": dropping undecodable frame: " + str(e))
+        return None
+
+    def _processMsg(self, msg: 'Message'):
+        self._receiver.receive(msg)
@@ -1,9 +1,20 @@
 import logging
-from typing import TYPE_CHECKING
+import struct
+from queue import Empty
+from threading import Lock
+from time import monotonic
+from typing import TYPE_CHECKING, Optional, List, FrozenSet
 
+import globalvars
+from errors import ParameterError
 from moduleid import ModuleID
 from msgconsumer import MsgConsumer
+from msgid import MsgID
+from msgqueue import COALESCIBLE_INFO_MSG_IDS, nonBlocking
+from msgs import codec
+from msgs.message import Message
 from serialreciever import SerialReciever
+from streamlink import StreamLink
 
 if TYPE_CHECKING:
     from dispatcher import Dispatcher
@@ -11,21 +22,123 @@ if TYPE_CHECKING:
 sender - relay of messages between serial ports  
 """
 
+# maximum number of queued messages written to the stream link in one write()
+MAX_BATCH = 64
+
 
 class SerialSender(MsgConsumer):
     """
     dispatcher not used yet
+    Relays either to the other side receiver in this process, or to a framed stream link.
+    A direct sender hands messages over to the other side dispatcher in the distributing thread, unless
+    messages queued earlier are still waiting or being relayed by the sender thread - they must not be overtaken.
     """
 
     # noinspection PyShadowingBuiltins
-    def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher', otherSideReceiver: SerialReciever):
+    def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher',
+                 otherSideReceiver: Optional[SerialReciever] = None, link: Optional[StreamLink] = None,
+                 direct: bool = False):
+        self.receiver = otherSideReceiver
+        self.link = link
+        self._direct = direct
+        # direct sender: nothing queued or relayed by the thread. Changed only with _handoverLock held
+        self._drained = True
+        self._handoverLock = Lock()
         # call the thread class
         super().__init__(id, name='SerialSender ' + name, dispatcher=dispatcher)
-        self.receiver = otherSideReceiver
+
+    def receive(self, msg: 'Message'):
+        if not self._direct:
+            super().receive(msg)
+            return
+        with self._handoverLock:
+            # until all consumers exist the other side dispatcher can wait for them, the thread takes over
+            handOver = self._drained and globalvars.consumersReadyEvent.is_set()
+            if not handOver:
+                self._drained = False
+                # the lock is needed by the thread to report draining, waiting for room here would stall it
+                with nonBlocking():
+                    super().receive(msg)
+        if handOver:
+            self._relayDirectly(msg)
+
+    def _relayDirectly(self, msg: 'Message') -> None:
+        """
+        In the thread of the original sender, which must neither wait for full queues of the other side
+        nor fail because of its routing
+        """
+        startedAt = monotonic()
+        with nonBlocking():
+            self._relaySafely(msg)
+        self.metrics.msgConsumed(0.0, monotonic() - startedAt)
+
+    def _relaySafely(self, msg: 'Message') -> None:
+        try:
+            self._relay(msg)
+        except Exception as e:
+            logging.error(str(self) + ": relaying " + str(msg) + " failed: " + str(e), exc_info=True)
 
     # consuming the message
     def _consume(self, msg):
+        if not self._direct:
+            self._relay(msg)
+            return
+        # the thread must survive to report draining
+        self._relaySafely(msg)
+        with self._handoverLock:
+            if self.receiveQ.empty():
+                # the next message can be handed over directly
+                self._drained = True
+
+    def _relay(self, msg):
         if msg.forID == self.id:
             logging.warning("Message for sender??")
+        elif self.link is not None:
+            self._writeToLink(msg)
+        elif self._direct:
+            self.receiver.receiveDirectly(msg)
         else:
             self.receiver.receive(msg)
+
+    def _consumeBatch(self, batch):
+        # relayed whole, one frame
+        self._consume(batch)
+
+    def _getCoalescibleMsgIDs(self) -> FrozenSet[MsgID]:
+        # a stalled link relays only the latest status values
+        return COALESCIBLE_INFO_MSG_IDS
+
+    def _writeToLink(self, msg: Message) -> None:
+        """
+        Batching all messages already waiting in the queue into a single write.
+        Messages which cannot be encoded or framed are dropped, the link stays up
+        """
+        payloads = []  # type: List[bytes]
+        self._appendPayload(msg, payloads)
+        while len(payloads) < MAX_BATCH:
+            try:
+                nextMsg = self.receiveQ.get_nowait()
+            except Empty:
+                break
+            if nextMsg is None:
+                # stop sentinel
+                break
+            if nextMsg.forID != self.id:
+                self._appendPayload(nextMsg, payloads)
+        if not payloads:
+            return
+        try:
+            self.link.write(payloads)
+        except ParameterError:
+            # some payload too long for the link, nothing was written. Writing one by one to find it
+            for payload in payloads:
+                try:
+                    self.link.write([payload])
+                except ParameterError as e:
+                    logging.warning(str(self) + ": dropping message: " + str(e))
+
+    def _appendPayload(self, msg: Message, payloads: List[bytes]) -> None:
+        try:
+            payloads.append(codec.encode(msg))
+        except (struct.error, ParameterError) as e:
+            logging.warning(str(self) + ": dropping unencodable " + str(msg) + ": " + str(e))
@@ -0,0 +1,258 @@
+import os
+import select
+import struct
+from multiprocessing import shared_memory
+from threading import Lock
+from typing import List, Tuple
+
+from errors import ParameterError
+
+"""
+Shared memory link for gateway pairs of segments running in forked processes on the same host.
+Each direction is a single-producer/single-consumer ring of length-prefixed encoded messages,
+a message crosses the processes by one copy into the ring and one copy out of it.
+The eventfd wakeup is signalled only when the other side sleeps.
+
+The shared memory is unlinked right after creation, it is shared only by inheritance over fork().
+
+Benchmark: python3 shmring.py
+"""
+
+RING_CAPACITY = 1 << 20
+# safety net for a wakeup lost between setting the waiting flag and the other side checking it
+WAKEUP_TIMEOUT = 0.05
+# polls of an empty ring before the reader goes to sleep, spinning only slows down a single core
+SPIN_COUNT = 200 if (os.cpu_count() or 1) > 1 else 0
+
+# head and tail are free-running byte counters, each in its own cache line
+_HEAD_OFFSET = 0
+_TAIL_OFFSET = 64
+_READER_WAITING_OFFSET = 128
+_WRITER_WAITING_OFFSET = 192
+_CLOSED_OFFSET = 256
+_DATA_OFFSET = 320
+
+_COUNTER = struct.Struct('<Q')
+_FLAG = struct.Struct('<B')
+_LENGTH = struct.Struct('<I')
+_EVENT = struct.Struct('<Q')
+
+
+class ShmRing:
+    """
+    One direction of the link. The writer advances head, the reader advances tail.
+    """
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self._capacity = capacity
+        self._shm = shared_memory.SharedMemory(create=True, size=_DATA_OFFSET + capacity)
+        # anonymous from now on, the mapping lives while mapped by any process
+        self._shm.unlink()
+        self._buf = self._shm.buf
+        self._dataReadyFd = os.eventfd(0, os.EFD_CLOEXEC)
+        self._spaceFreeFd = os.eventfd(0, os.EFD_CLOEXEC)
+        # ends using the ring in this process
+        self._users = 2
+        self._closedLocally = False
+
+    def write(self, payloads: List[bytes]) -> None:
+        """
+        All records are joined and copied into the ring at once
+        """
+        records = b''.join(_LENGTH.pack(len(payload)) + payload for payload in payloads)
+        if len(records) > self._capacity:
+            raise ParameterError("Payloads of " + str(len(records)) + " bytes too long for the ring")
+        head = self._getCounter(_HEAD_OFFSET)
+        while self._capacity - (head - self._getCounter(_TAIL_OFFSET)) < len(records):
+            self._waitForSpace(head, len(records))
+        self._copyIn(head, records)
+        # publishing the records only after they are complete
+        _COUNTER.pack_into(self._buf, _HEAD_OFFSET, head + len(records))
+        if self._getFlag(_READER_WAITING_OFFSET):
+            _signal(self._dataReadyFd)
+
+    def read(self) -> List[bytes]:
+        """
+        Blocks until at least one message is available
+        :return: payloads of all available messages
+        """
+        tail = self._getCounter(_TAIL_OFFSET)
+        head = self._getCounter(_HEAD_OFFSET)
+        spins = SPIN_COUNT
+        while head == tail:
+            if spins > 0:
+                # the other process often answers within microseconds, sleeping costs more
+                spins -= 1
+                head = self._getCounter(_HEAD_OFFSET)
+                continue
+            if self._isClosed():
+                raise EOFError("Shared memory link closed")
+            _FLAG.pack_into(self._buf, _READER_WAITING_OFFSET, 1)
+            head = self._getCounter(_HEAD_OFFSET)
+            if head == tail:
+                _wait(self._dataReadyFd)
+                head = self._getCounter(_HEAD_OFFSET)
+            _FLAG.pack_into(self._buf, _READER_WAITING_OFFSET, 0)
+        records = self._copyOut(tail, head - tail)
+        _COUNTER.pack_into(self._buf, _TAIL_OFFSET, head)
+        if self._getFlag(_WRITER_WAITING_OFFSET):
+            _signal(self._spaceFreeFd)
+        payloads = []  # type: List[bytes]
+        offset = 0
+        with memoryview(records) as view:
+            while offset < len(records):
+                length, = _LENGTH.unpack_from(records, offset)
+                offset += _LENGTH.size
+                payloads.append(bytes(view[offset:offset + length]))
+                offset += length
+        return payloads
+
+    def _waitForSpace(self, head: int, recordSize: int) -> None:
+        if self._isClosed():
+            raise EOFError("Shared memory link closed")
+        _FLAG.pack_into(self._buf, _WRITER_WAITING_OFFSET, 1)
+        if self._capacity - (head - self._getCounter(_TAIL_OFFSET)) < recordSize:
+            _wait(self._spaceFreeFd)
+        _FLAG.pack_into(self._buf, _WRITER_WAITING_OFFSET, 0)
+
+    def _copyIn(self, counter: int, data: bytes) -> None:
+        start = counter % self._capacity
+        if start + len(data) <= self._capacity:
+            self._buf[_DATA_OFFSET + start:_DATA_OFFSET + start + len(data)] = data
+            return
+        # wrapped around
+        firstPart = self._capacity - start
+        with memoryview(data) as view:
+            self._buf[_DATA_OFFSET + start:_DATA_OFFSET + self._capacity] = view[:firstPart]
+            self._buf[_DATA_OFFSET:_DATA_OFFSET + len(data) - firstPart] = view[firstPart:]
+
+    def _copyOut(self, counter: int, size: int) -> bytes:
+        start = counter % self._capacity
+        if start + size <= self._capacity:
+            return bytes(self._buf[_DATA_OFFSET + start:_DATA_OFFSET + start + size])
+        firstPart = self._capacity - start
+        return bytes(self._buf[_DATA_OFFSET + start:_DATA_OFFSET + self._capacity]) \
+               + bytes(self._buf[_DATA_OFFSET:_DATA_OFFSET + size - firstPart])
+
+    def _getCounter(self, offset: int) -> int:
+        return _COUNTER.unpack_from(self._buf, offset)[0]
+
+    def _getFlag(self, offset: int) -> int:
+        return _FLAG.unpack_from(self._buf, offset)[0]
+
+    def _isClosed(self) -> bool:
+        return self._getFlag(_CLOSED_OFFSET) != 0
+
+    def markClosed(self) -> None:
+        """
+        Wakes up both sides in all processes, pending messages can still be read
+        """
+        _FLAG.pack_into(self._buf, _CLOSED_OFFSET, 1)
+        _signal(self._dataReadyFd)
+        _signal(self._spaceFreeFd)
+
+    def release(self) -> None:
+        """
+        Unmaps the ring in this process once no end of this process uses it
+        """
+        self._users -= 1
+        if self._users == 0 and not self._closedLocally:
+            self._closedLocally = True
+            os.close(self._dataReadyFd)
+            os.close(self._spaceFreeFd)
+            self._buf = None
+            self._shm.close()
+
+
+def _signal(fd: int) -> None:
+    os.write(fd, _EVENT.pack(1))
+
+
+def _wait(fd: int) -> None:
+    readable, _, _ = select.select([fd], [], [], WAKEUP_TIMEOUT)
+    if readable:
+        os.read(fd, _EVENT.size)
+
+
+class ShmLink:
+    """
+    One end of a full-duplex shared memory link, same interface as streamlink.StreamLink
+    """
+
+    def __init__(self, txRing: ShmRing, rxRing: ShmRing):
+        self._txRing = txRing
+        self._rxRing = rxRing
+        self._writeLock = Lock()
+
+    def write(self, payloads: List[bytes]) -> None:
+        with self._writeLock:
+            self._txRing.write(payloads)
+
+    def read(self) -> List[bytes]:
+        return self._rxRing.read()
+
+    def release(self) -> None:
+        """
+        Releases only the mapping of this process, e.g. the end inherited by a forked process
+        """
+        self._txRing.release()
+        self._rxRing.release()
+
+    def close(self) -> None:
+        """
+        The reader thread can still be inside read(), the mapping is left to the process exit
+        """
+        self._txRing.markClosed()
+        self._rxRing.markClosed()
+
+
+def createShmPair(capacity: int = RING_CAPACITY) -> Tuple[ShmLink, ShmLink]:
+    ring1To2 = ShmRing(capacity)
+    ring2To1 = ShmRing(capacity)
+    return ShmLink(ring1To2, ring2To1), ShmLink(ring2To1, ring1To2)
+
+
+def _benchmark(name: str, links: Tuple, payload: bytes, rounds: int) -> None:
+    """
+    Forked echo process, one-way throughput and round trip latency
+    """
+    import time
+    link, otherLink = links
+    pid = os.fork()
+    if pid == 0:
+        link.release()
+        received = 0
+        while received < rounds:
+            received += len(otherLink.read())
+        otherLink.write([b'done'])
+        for _ in range(rounds):
+            otherLink.write(otherLink.read())
+        os._exit(0)
+    otherLink.release()
+    batch = [payload] * 16
+    start = time.perf_counter()
+    for _ in range(rounds // len(batch)):
+        link.write(batch)
+    link.read()
+    throughputSecs = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(rounds):
+        link.write([payload])
+        link.read()
+    roundTripSecs = time.perf_counter() - start
+    os.waitpid(pid, 0)
+    link.close()
+    print("%-8s throughput %9.0f msgs/s   round trip %7.1f us"
+          % (name, rounds / throughputSecs, roundTripSecs / rounds * 1e6))
+
+
+if __name__ == "__main__":
+    import streamlink
+    from msgs import codec
+
+    rounds = 20000
+    for msgName, sampleMsg in codec._createSampleMsgs().items():
+        encoded = codec.encode(sampleMsg)
+        print("%s, %d B" % (msgName, len(encoded)))
+        _benchmark('socket', streamlink.createSocketPair(), encoded, rounds)
+        _benchmark('shm', createShmPair(), encoded, rounds)
@@ -0,0 +1,180 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+"""
+Tiered detection of audio files:
+    1. extension - allow and deny lists, no syscall
+    2. magic bytes of the file header, a single pread
+    3. audiotools.open for files still undecided
+Results of tiers 2 and 3 are memoised per (device, inode, mtime).
+"""
+
+AUDIO_EXTENSIONS = frozenset([
+    '.mp3', '.mp2', '.flac', '.ogg', '.oga', '.opus', '.m4a', '.m4b', '.aac', '.alac', '.wav', '.wv', '.ape',
+    '.aif', '.aiff', '.mpc', '.wma', '.dsf', '.dff', '.tta', '.shn', '.spx',
+])
+NON_AUDIO_EXTENSIONS = frozenset([
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp', '.txt', '.nfo', '.log', '.cue', '.m3u',
+    '.m3u8', '.pls', '.pdf', '.url', '.ini', '.db', '.sfv', '.md5', '.accurip', '.html', '.htm', '.xml', '.json',
+    '.zip', '.rar', '.7z', '.exe', '.doc', '.docx', '.rtf', '.ds_store', '.lrc', '.srt', '.sub', '.md', '.csv',
+])
+
+SNIFF_SIZE = 512
+# ASF header object GUID - wma
+_ASF_GUID = bytes.fromhex('3026b2758e66cf11a6d900aa0062ce6c')
+# UTF-8, UTF-16 LE/BE - FF FE would pass as MPEG frame sync
+_TEXT_BOMS = (b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')
+
+# directories with more undecided files are probed in parallel
+PARALLEL_THRESHOLD = 32
+MAX_WORKERS = 4
+MEMO_SIZE = 100000
+
+# (st_dev, st_ino, st_mtime_ns)
+FileKey = Tuple[int, int, int]
+
+
+def sniff(header: bytes) -> Optional[bool]:
+    """
+    :return: True for audio signatures, False for known non-audio ones, None = undecided
+    """
+    if header.startswith(_TEXT_BOMS):
+        return False
+    if header[:4] == b'fLaC' or header[:4] == b'OggS' or header[:3] == b'ID3' or header[:4] == b'wvpk' \
+            or header[:4] == b'MAC ' or header[:4] in (b'MPCK', b'MP+\x07') or header[:4] == b'TTA1' \
+            or header[:4] == b'DSD ' or header[:4] == b'FRM8' or header[:16] == _ASF_GUID:
+        return True
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return True
+    if header[:4] == b'FORM' and header[8:12] in (b'AIFF', b'AIFC'):
+        return True
+    if header[4:8] == b'ftyp':
+        # mp4 container, other brands can hold video
+        return True if header[8:12] in (b'M4A ', b'M4B ') else None
+    if _isMpegFrameHeader(header) or _isAdtsHeader(header):
+        return True
+    if header[:3] == b'\xff\xd8\xff' or header[:8] == b'\x89PNG\r\n\x1a\n' or header[:4] == b'%PDF' \
+            or header[:4] == b'PK\x03\x04' or header[:6] in (b'GIF87a', b'GIF89a'):
+        return False
+    return None
+
+
+def _isMpegFrameHeader(header: bytes) -> bool:
+    if len(header) < 3 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return False
+    # reserved version, reserved layer, bad bitrate index, reserved sampling rate
+    return (header[1] & 0x18) != 0x08 and (header[1] & 0x06) != 0 and (header[2] & 0xF0) != 0xF0 \
+        and (header[2] & 0x0C) != 0x0C
+
+
+def _isAdtsHeader(header: bytes) -> bool:
+    # 12 sync bits, layer always 0, sampling frequency index 0-12
+    return len(header) >= 3 and header[0] == 0xFF and (header[1] & 0xF6) == 0xF0 and ((header[2] >> 2) & 0x0F) < 13
+
+
+class AudioDetector:
+    """
+    Thread-safe
+    """
+
+    def __init__(self):
+        self._memo = OrderedDict()  # type: OrderedDict[FileKey, bool]
+        self._memoLock = Lock()
+        self._executor = None  # type: Optional[ThreadPoolExecutor]
+        self._executorLock = Lock()
+        # statistics of tiers deciding, updated from the pool threads too
+        self.decidedBy = {'extension': 0, 'memo': 0, 'magic': 0, 'audiotools': 0}  # type: Dict[str, int]
+        self._decidedByLock = Lock()
+
+    def isAudio(self, path: str) -> bool:
+        decision = self._checkExtension(path)
+        if decision is not None:
+            return decision
+        return self._probe(path)
+
+    def areAudio(self, paths: List[str]) -> List[bool]:
+        """
+        Files undecided by their extensions are probed in parallel for large directories
+        """
+        decisions = [self._checkExtension(path) for path in paths]  # type: List[Optional[bool]]
+        undecided = [index for index, decision in enumerate(decisions) if decision is None]
+        if len(undecided) > PARALLEL_THRESHOLD:
+            probed = self._getExecutor().map(self._probe, (paths[index] for index in undecided))
+        else:
+            probed = map(self._probe, (paths[index] for index in undecided))
+        for index, decision in zip(undecided, probed):
+            decisions[index] = decision
+        return decisions
+
+    def _checkExtension(self, path: str) -> Optional[bool]:
+        extension = os.path.splitext(path)[1].lower()
+        if extension in AUDIO_EXTENSIONS:
+            self._count('extension')
+            return True
+        if extension in NON_AUDIO_EXTENSIONS:
+            self._count('extension')
+            return False
+        return None
+
+    def _probe(self, path: str) -> bool:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            stat = os.fstat(fd)
+            key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+            with self._memoLock:
+                decision = self._memo.get(key)
+                if decision is not None:
+                    self._memo.move_to_end(key)
+            if decision is not None:
+                self._count('memo')
+                return decision
+            decision = sniff(os.pread(fd, SNIFF_SIZE, 0))
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+        if decision is not None:
+            self._count('magic')
+        else:
+            decision = self._openByAudiotools(path)
+            self._count('audiotools')
+        self._remember(key, decision)
+        return decision
+
+    def _count(self, tier: str) -> None:
+        with self._decidedByLock:
+            self.decidedBy[tier] += 1
+
+    @staticmethod
+    def _openByAudiotools(path: str) -> bool:
+        # only the last tier needs audiotools, extensions and sniffing work without it
+        import audiotools
+        try:
+            audiotools.open(path)
+            return True
+        except (audiotools.UnsupportedFile, IOError):
+            return False
+
+    def _remember(self, key: FileKey, decision: bool) -> None:
+        with self._memoLock:
+            self._memo[key] = decision
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+
+    def _getExecutor(self) -> ThreadPoolExecutor:
+        with self._executorLock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='AudioDetector')
+            return self._executor
+
+    def close(self) -> None:
+        with self._executorLock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
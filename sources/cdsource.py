@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING, Optional, List, Dict
 
 import pyudev
 from pyudev import Monitor, MonitorObserver, Devices
-from treelib import Node, Tree
+from treelib import Node
 from unidecode import unidecode
 
 from common.timeutils import secsToTime
@@ -12,6 +12,7 @@ from metadata import Metadata
 from moduleid import ModuleID
 from msgs.nodemsg import NodeID, NodeItem
 from sources.cdplaylist import CDPlaylist, TrackItem, RootItem
+from sources.indexedtreelib import IndexedTreelib
 from sources.mpvtreesource import MPVTreeSource
 
 if TYPE_CHECKING:
@@ -23,7 +24,7 @@ DISK_EJECT_REQUEST_UDEV_TAG = 'DISK_EJECT_REQUEST'
 CD_READ_TRIES = 20
 
 
-class CDSource(MPVTreeSource[Node]):
+class CDSource(IndexedTreelib, MPVTreeSource[Node]):
     def __init__(self, dispatcher: 'Dispatcher'):
         self.__chapterToSwitch = None  # type: Optional[int]
         super().__init__(ModuleID.CD_SOURCE, 'CDSource', dispatcher, monitorTime=True)
@@ -107,13 +108,13 @@ class CDSource(MPVTreeSource[Node]):
     def _initValuesForAvailable(self) -> bool:
         tree = CDPlaylist().loadTreeFromCD()
         if tree:
-            self._tree = tree
+            self._setTree(tree)
             return super()._initValuesForAvailable()
         else:
             return False
 
     def _initValuesForUnavailable(self):
-        self._tree = None  # type: Tree
+        self._setTree(None)
         super()._initValuesForUnavailable()
 
     @staticmethod
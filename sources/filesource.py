@@ -1,13 +1,18 @@
+import logging
 from multiprocessing import Lock
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional, List, Dict
+from threading import Thread
+from typing import TYPE_CHECKING, Optional, List, Dict, Set
 
-import audiotools
 from unidecode import unidecode
 
+import config
 from metadata import Metadata
 from moduleid import ModuleID
 from msgs.nodemsg import NodeID, NodeItem
+from sources.audiodetector import AudioDetector
+from sources.inotifywatcher import InotifyWatcher
+from sources.libraryindex import LibraryIndex
 from sources.mpvtreesource import MPVTreeSource
 from sources.mympv import locked
 from sources.nodeidprovider import NodeIDProvider
@@ -16,6 +21,8 @@ if TYPE_CHECKING:
     from dispatcher import Dispatcher
 
 ROOT_PATH = Path("/home/pavel/Hudba")
+# for configs predating LIBRARY_INDEX_FILE
+DEFAULT_LIBRARY_INDEX_FILE = "/var/tmp/aio-library.db"
 # maximum directory depth for recursive loadfile
 MAX_DIR_DEPTH = 20
 
@@ -26,7 +33,47 @@ class FileSource(MPVTreeSource[Path]):
         self._idsByPathStr = {}  # type: Dict[str, NodeID]
         self._cacheLock = Lock()
         self._idProvider = NodeIDProvider()
+        self._audioDetector = AudioDetector()
+        self._libraryIndex = LibraryIndex(getattr(config, 'LIBRARY_INDEX_FILE', DEFAULT_LIBRARY_INDEX_FILE),
+                                          self._audioDetector.areAudio)
         super().__init__(ModuleID.FILE_SOURCE, 'FileSource', dispatcher, monitorTime=True)
+        # bringing the index up to date in the background, browsing validates each directory anyway
+        Thread(target=self.rescan, name='FileSource rescan', daemon=True).start()
+        # keeping it up to date
+        self._watcher = InotifyWatcher(ROOT_PATH, self._libraryChanged, self.rescan)
+
+    def rescan(self) -> None:
+        try:
+            scanned = self._libraryIndex.rescan(ROOT_PATH)
+            logging.info(str(self) + ": library index rescanned, " + str(scanned) + " changed directories")
+        except Exception as e:
+            logging.error(e, exc_info=True)
+
+    def _libraryChanged(self, changedDirs: Set[Path], removedPaths: Set[Path]) -> None:
+        """
+        Only the affected directories are re-indexed. Node IDs of removed paths are dropped
+        """
+        for path in removedPaths:
+            self._libraryIndex.forget(path)
+            self._forgetIDs(path)
+        for dirPath in changedDirs:
+            self._libraryIndex.refresh(dirPath)
+
+    def _forgetIDs(self, removedPath: Path) -> None:
+        """
+        IDs of the path and its whole subtree
+        """
+        prefix = str(removedPath) + '/'
+        with locked(self._cacheLock):
+            for pathStr in [pathStr for pathStr in self._idsByPathStr
+                            if pathStr == str(removedPath) or pathStr.startswith(prefix)]:
+                nodeID = self._idsByPathStr.pop(pathStr)
+                del self._pathsByID[nodeID]
+
+    def close(self):
+        super().close()
+        self._watcher.close()
+        self._audioDetector.close()
 
     def _getRootNodeItem(self) -> NodeItem:
         return self._getNodeItemForPath(ROOT_PATH)
@@ -38,6 +85,10 @@ class FileSource(MPVTreeSource[Path]):
             return path.parent
 
     def _isLeaf(self, path: Path) -> bool:
+        # flags of listed children come with the listing of their parent
+        isLeaf = self._libraryIndex.isLeaf(path)
+        if isLeaf is not None:
+            return isLeaf
         return path.is_file() or all(False for _ in path.iterdir())
 
     def _isPlayable(self, path: Path) -> bool:
@@ -45,15 +96,17 @@ class FileSource(MPVTreeSource[Path]):
         return True
 
     def _getOrderedChildPaths(self, path: Path) -> List[Path]:
-        children = (item for item in path.iterdir() if item.is_dir() or self._isAudio(item))
-        return sorted(children, key=lambda k: str(k).lower())
+        # audio files and dirs sorted by case insensitive name, served by the library index
+        return [path / name for name, isDir, isLeaf in self._libraryIndex.getOrderedChildren(path)]
 
-    def _isAudio(self, item: Path) -> bool:
-        try:
-            audiotools.open(str(item))
-            return True
-        except audiotools.UnsupportedFile:
-            return False
+    def _childCount(self, path: Path) -> int:
+        return self._libraryIndex.getChildCount(path)
+
+    def _childrenSlice(self, path: Path, start: int, count: int) -> List[Path]:
+        return [path / name for name, isDir, isLeaf in self._libraryIndex.getChildrenSlice(path, start, count)]
+
+    def _indexOf(self, path: Path) -> Optional[int]:
+        return self._libraryIndex.getPosition(path)
 
     def _getRootPath(self):
         return ROOT_PATH
@@ -113,9 +166,10 @@ class FileSource(MPVTreeSource[Path]):
         all subsequent with appendToPlayback
         :param level: currect directory traversal depth
         """
-        # sorted by case insensitive name
-        for childPath in self._getOrderedChildPaths(path):
-            if childPath.is_file():
+        # sorted by case insensitive name, types known from the index
+        for name, isDir, isLeaf in self._libraryIndex.getOrderedChildren(path):
+            childPath = path / name
+            if not isDir:
                 if firstToPlay:
                     self._startPlayback(mpvPath=str(childPath))
                     firstToPlay = False
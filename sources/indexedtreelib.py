@@ -0,0 +1,29 @@
+from typing import Dict, List, Optional
+
+from treelib import Node, Tree
+
+from msgs.nodemsg import NodeID
+
+"""
+Indexed child access of TreeSource for sources with a static treelib tree of Node paths
+"""
+
+
+class IndexedTreelib:
+    def _setTree(self, tree: Optional[Tree]) -> None:
+        self._tree = tree  # type: Optional[Tree]
+        # the tree does not change once loaded
+        self._childPositions = self._indexChildPositions(tree) if tree is not None else {}  # type: Dict[NodeID, int]
+
+    def _childCount(self, path: Node) -> int:
+        return len(self._tree.is_branch(path.identifier))
+
+    def _childrenSlice(self, path: Node, start: int, count: int) -> List[Node]:
+        return [self._tree[childID] for childID in self._tree.is_branch(path.identifier)[start:start + count]]
+
+    def _indexOf(self, path: Node) -> Optional[int]:
+        return self._childPositions.get(path.identifier)
+
+    @staticmethod
+    def _indexChildPositions(tree: Tree) -> Dict[NodeID, int]:
+        return {childID: position for nodeID in tree.nodes for position, childID in enumerate(tree.is_branch(nodeID))}
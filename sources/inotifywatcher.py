@@ -0,0 +1,263 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from threading import Thread, Event
+from typing import Callable, Dict, Optional, Set
+
+from sources.periodictask import PeriodicTask
+
+"""
+Watching a directory tree with inotify (libc via ctypes).
+Events are collected and debounced, the owner receives the affected directories and removed paths in one call.
+When inotify is not available or the watch limit (fs.inotify.max_user_watches) is hit, the watcher falls back
+to periodic sweeps.
+"""
+
+# changes are reported after no event arrived for DEBOUNCE_SECS, at the latest MAX_DELAY_SECS after the first one
+DEBOUNCE_SECS = 1.0
+MAX_DELAY_SECS = 5.0
+# period of the fallback sweeps
+SWEEP_INTERVAL = 300.0
+# checking for stop
+POLL_TIMEOUT = 0.5
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF \
+             | IN_MOVE_SELF | IN_ONLYDIR
+
+_EVENT = struct.Struct('iIII')
+READ_SIZE = 65536
+
+# changed directories, removed paths (files or whole subtrees)
+ChangesCallback = Callable[[Set[Path], Set[Path]], None]
+
+
+class WatchLimitError(Exception):
+    pass
+
+
+class _Inotify:
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._addWatch = libc.inotify_add_watch
+        self._addWatch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rmWatch = libc.inotify_rm_watch
+        self._rmWatch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def addWatch(self, path: Path) -> Optional[int]:
+        """
+        :return: watch descriptor, None if the directory is gone
+        """
+        wd = self._addWatch(self.fd, os.fsencode(str(path)), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise WatchLimitError("inotify watch limit reached at " + str(path))
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return None
+            raise OSError(error, "inotify_add_watch failed for " + str(path))
+        return wd
+
+    def rmWatch(self, wd: int) -> None:
+        self._rmWatch(self.fd, wd)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class InotifyWatcher:
+    def __init__(self, rootPath: Path, onChanges: ChangesCallback, sweep: Callable[[], None]):
+        """
+        Both callbacks are called in the watcher thread
+        :param sweep: full check of the tree, after lost events and in the fallback mode
+        """
+        self._rootPath = rootPath
+        self._onChanges = onChanges
+        self._sweep = sweep
+        self._pathsByWD = {}  # type: Dict[int, Path]
+        self._wdsByPath = {}  # type: Dict[Path, int]
+        # watched subdirectories of each watched directory, unwatching a subtree visits only the subtree
+        self._watchedSubdirs = {}  # type: Dict[Path, Set[Path]]
+        self._inotify = None  # type: Optional[_Inotify]
+        self._sweepTask = None  # type: Optional[PeriodicTask]
+        self._stopEvent = Event()
+        # pending debounced changes
+        self._changedDirs = set()  # type: Set[Path]
+        self._removedPaths = set()  # type: Set[Path]
+        self._firstChangeAt = None  # type: Optional[float]
+        self._lastChangeAt = 0.0
+        # adding watches walks the whole tree, not in the caller thread
+        self._thread = Thread(target=self._run, name='InotifyWatcher', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self._inotify = _Inotify()
+            self._watchTree(self._rootPath)
+        except (OSError, AttributeError, WatchLimitError) as e:
+            # AttributeError - no inotify in libc
+            logging.warning("Inotify unavailable, sweeping the library every " + str(SWEEP_INTERVAL) + " s: "
+                            + str(e))
+            self._switchToSweeps()
+            return
+        try:
+            while not self._stopEvent.is_set():
+                readable, _, _ = select.select([self._inotify.fd], [], [], self._getTimeout())
+                if readable:
+                    self._readEvents()
+                self._reportIfSettled()
+        except WatchLimitError as e:
+            logging.warning(str(e) + ", sweeping the library every " + str(SWEEP_INTERVAL) + " s")
+            self._switchToSweeps()
+        except Exception as e:
+            if not self._stopEvent.is_set():
+                logging.error(e, exc_info=True)
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    def _switchToSweeps(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._pathsByWD.clear()
+        self._wdsByPath.clear()
+        self._watchedSubdirs.clear()
+        if not self._stopEvent.is_set():
+            self._sweepTask = PeriodicTask(SWEEP_INTERVAL, self._sweep)
+
+    def _watchTree(self, dirPath: Path) -> None:
+        pending = [dirPath]
+        while pending:
+            path = pending.pop()
+            wd = self._inotify.addWatch(path)
+            if wd is None:
+                continue
+            self._pathsByWD[wd] = path
+            self._wdsByPath[path] = wd
+            self._watchedSubdirs.setdefault(path.parent, set()).add(path)
+            try:
+                # entry types from the listing (d_type), files are not stat'ed, symlinks not followed
+                with os.scandir(str(path)) as entries:
+                    pending.extend(path / entry.name for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+
+    def _unwatchTree(self, dirPath: Path) -> None:
+        pending = [dirPath]
+        while pending:
+            path = pending.pop()
+            wd = self._wdsByPath.get(path)
+            if wd is not None:
+                self._inotify.rmWatch(wd)
+                self._forgetWatch(wd)
+            pending.extend(self._watchedSubdirs.pop(path, ()))
+
+    def _forgetWatch(self, wd: int) -> None:
+        path = self._pathsByWD.pop(wd)
+        # the path may be watched again already, by a directory created in place of the removed one
+        if self._wdsByPath.get(path) == wd:
+            del self._wdsByPath[path]
+            subdirs = self._watchedSubdirs.get(path.parent)
+            if subdirs is not None:
+                subdirs.discard(path)
+
+    def _readEvents(self) -> None:
+        try:
+            data = os.read(self._inotify.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, nameLength = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + nameLength].rstrip(b'\0'))
+            offset += nameLength
+            self._handleEvent(wd, mask, name)
+
+    def _handleEvent(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            # events lost
+            logging.warning("Inotify queue overflow, sweeping the library")
+            self._sweep()
+            return
+        dirPath = self._pathsByWD.get(wd)
+        if dirPath is None:
+            return
+        if mask & IN_IGNORED:
+            # watch removed - directory deleted or moved away
+            self._forgetWatch(wd)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # reported by the parent directory too
+            return
+        path = dirPath / name
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._removedPaths.add(path)
+            if mask & IN_ISDIR:
+                self._unwatchTree(path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            self._removedPaths.discard(path)
+            if mask & IN_ISDIR:
+                self._watchTree(path)
+                # content of a directory moved in is not reported by events
+                self._changedDirs.add(path)
+        self._changedDirs.add(dirPath)
+        now = time.monotonic()
+        if self._firstChangeAt is None:
+            self._firstChangeAt = now
+        self._lastChangeAt = now
+
+    def _getTimeout(self) -> float:
+        if self._firstChangeAt is None:
+            return POLL_TIMEOUT
+        now = time.monotonic()
+        remaining = min(self._lastChangeAt + DEBOUNCE_SECS, self._firstChangeAt + MAX_DELAY_SECS) - now
+        return max(0.0, min(remaining, POLL_TIMEOUT))
+
+    def _reportIfSettled(self) -> None:
+        if self._firstChangeAt is None:
+            return
+        now = time.monotonic()
+        if now - self._lastChangeAt < DEBOUNCE_SECS and now - self._firstChangeAt < MAX_DELAY_SECS:
+            return
+        changedDirs = self._changedDirs
+        removedPaths = self._removedPaths
+        self._changedDirs = set()
+        self._removedPaths = set()
+        self._firstChangeAt = None
+        # subtrees removed entirely need no re-listing
+        changedDirs = {path for path in changedDirs
+                       if not any(removed == path or removed in path.parents for removed in removedPaths)}
+        try:
+            self._onChanges(changedDirs, removedPaths)
+        except Exception as e:
+            logging.error(e, exc_info=True)
+
+    def close(self) -> None:
+        self._stopEvent.set()
+        if self._sweepTask is not None:
+            self._sweepTask.stop()
@@ -0,0 +1,261 @@
+import logging
+import os
+import sqlite3
+from operator import itemgetter
+from pathlib import Path
+from stat import S_ISDIR
+from threading import Lock
+from typing import Callable, List, Optional, Set, Tuple
+
+"""
+Persistent index of audio directories in SQLite.
+Each directory keeps its ordered children - subdirectories and audio files - validated by the mtime and size
+of the directory. Adding, removing or renaming a child changes the mtime, the listing is then rebuilt.
+Every child carries its leaf flag (file or empty directory), browsing a listing needs no access to the children.
+"""
+
+# user_version of the database, a different one drops the tables
+SCHEMA_VERSION = 2
+
+# (name, isDir, isLeaf)
+Child = Tuple[str, bool, bool]
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS dirs (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        child_count INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS children (
+        dir_path TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        is_dir INTEGER NOT NULL,
+        is_leaf INTEGER NOT NULL,
+        PRIMARY KEY (dir_path, position)
+    ) WITHOUT ROWID""",
+    'CREATE INDEX IF NOT EXISTS children_by_name ON children (dir_path, name)',
+]
+
+
+class LibraryIndex:
+    """
+    Thread-safe, one connection guarded by a lock
+    """
+
+    def __init__(self, dbFile: Optional[str], areAudio: Callable[[List[str]], List[bool]]):
+        """
+        :param dbFile: None = in-memory index lost on exit
+        :param areAudio: deciding which files are listed, called for all files of a changed directory at once
+        """
+        self._areAudio = areAudio
+        self._lock = Lock()
+        self._conn = sqlite3.connect(dbFile if dbFile is not None else ':memory:', check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._initSchema()
+        # statistics
+        self.scannedDirs = 0
+
+    def _initSchema(self) -> None:
+        with self._conn:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._conn.execute('DROP TABLE IF EXISTS dirs')
+                self._conn.execute('DROP TABLE IF EXISTS children')
+                self._conn.execute('PRAGMA user_version = ' + str(SCHEMA_VERSION))
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def getOrderedChildren(self, dirPath: Path) -> List[Child]:
+        """
+        From the index when the directory did not change, otherwise the directory is scanned and re-indexed
+        """
+        return self.getChildrenSlice(dirPath, 0, None)
+
+    def getChildrenSlice(self, dirPath: Path, start: int, count: Optional[int]) -> List[Child]:
+        """
+        Range of the primary key, cost does not grow with the directory size
+        :param count: None = up to the end
+        """
+        pathStr = str(dirPath)
+        if not self._validate(pathStr):
+            return []
+        if count is None:
+            condition = 'position >= ?'
+            params = (pathStr, start)
+        else:
+            condition = 'position >= ? AND position < ?'
+            params = (pathStr, start, start + count)
+        with self._lock:
+            return [(name, bool(isDir), bool(isLeaf)) for name, isDir, isLeaf in self._conn.execute(
+                'SELECT name, is_dir, is_leaf FROM children WHERE dir_path = ? AND ' + condition
+                + ' ORDER BY position', params)]
+
+    def getChildCount(self, dirPath: Path) -> int:
+        pathStr = str(dirPath)
+        if not self._validate(pathStr):
+            return 0
+        with self._lock:
+            row = self._conn.execute('SELECT child_count FROM dirs WHERE path = ?', (pathStr,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def getPosition(self, path: Path) -> Optional[int]:
+        """
+        :return: index of the path in the listing of its parent, None = not listed
+        """
+        parentStr = str(path.parent)
+        if not self._validate(parentStr):
+            return None
+        with self._lock:
+            row = self._conn.execute('SELECT position FROM children WHERE dir_path = ? AND name = ?',
+                                     (parentStr, path.name)).fetchone()
+        return row[0] if row is not None else None
+
+    def _validate(self, pathStr: str) -> bool:
+        """
+        Re-indexes the directory if it changed since its indexing
+        :return: False if pathStr is not an existing directory
+        """
+        try:
+            stat = os.stat(pathStr)
+        except OSError:
+            self.forget(Path(pathStr))
+            return False
+        if not S_ISDIR(stat.st_mode):
+            return False
+        with self._lock:
+            row = self._conn.execute('SELECT mtime_ns, size FROM dirs WHERE path = ?', (pathStr,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return True
+        # scanning without the lock, reading the files takes time
+        children, isEmpty = self._scan(pathStr)
+        self._store(pathStr, stat, children, isEmpty)
+        return True
+
+    def isLeaf(self, path: Path) -> Optional[bool]:
+        """
+        Flag stored with the listing of the parent directory
+        :return: None = parent not indexed
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT is_leaf FROM children WHERE dir_path = ? AND name = ?',
+                                     (str(path.parent), path.name)).fetchone()
+        return bool(row[0]) if row is not None else None
+
+    def refresh(self, dirPath: Path) -> None:
+        """
+        Re-indexing regardless of the mtime, e.g. after a file content was written
+        """
+        try:
+            stat = os.stat(str(dirPath))
+        except OSError:
+            self.forget(dirPath)
+            return
+        children, isEmpty = self._scan(str(dirPath))
+        self._store(str(dirPath), stat, children, isEmpty)
+
+    def _scan(self, pathStr: str) -> Tuple[List[Child], bool]:
+        """
+        One scandir pass, entry types come from the listing itself (d_type), stat only for symlinks.
+        Subdirectories are checked for emptiness here, once per listing.
+        :return: ordered children, directory has no entries at all
+        """
+        dirNames = []  # type: List[str]
+        fileNames = []  # type: List[str]
+        isEmpty = True
+        try:
+            with os.scandir(pathStr) as entries:
+                for entry in entries:
+                    isEmpty = False
+                    try:
+                        isDir = entry.is_dir()
+                    except OSError:
+                        isDir = False
+                    (dirNames if isDir else fileNames).append(entry.name)
+        except OSError as e:
+            logging.warning("Cannot list " + pathStr + ": " + str(e))
+        # (sort key, child)
+        keyedChildren = [(name.lower(), (name, True, self._isEmptyDir(os.path.join(pathStr, name))))
+                         for name in dirNames]
+        areAudio = self._areAudio([os.path.join(pathStr, name) for name in fileNames])
+        keyedChildren.extend((name.lower(), (name, False, True))
+                             for name, isAudio in zip(fileNames, areAudio) if isAudio)
+        keyedChildren.sort(key=itemgetter(0))
+        self.scannedDirs += 1
+        return [child for _, child in keyedChildren], isEmpty
+
+    @staticmethod
+    def _isEmptyDir(pathStr: str) -> bool:
+        try:
+            with os.scandir(pathStr) as entries:
+                return next(entries, None) is None
+        except OSError:
+            return True
+
+    def _store(self, pathStr: str, stat: os.stat_result, children: List[Child], isEmpty: bool) -> None:
+        parentStr, dirName = os.path.split(pathStr)
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM children WHERE dir_path = ?', (pathStr,))
+            self._conn.executemany(
+                'INSERT INTO children (dir_path, position, name, is_dir, is_leaf) VALUES (?, ?, ?, ?, ?)',
+                ((pathStr, position, name, int(isDir), int(isLeaf))
+                 for position, (name, isDir, isLeaf) in enumerate(children)))
+            self._conn.execute('INSERT OR REPLACE INTO dirs (path, mtime_ns, size, child_count) VALUES (?, ?, ?, ?)',
+                               (pathStr, stat.st_mtime_ns, stat.st_size, len(children)))
+            # content changes of the directory do not touch the parent mtime, its listing is updated here
+            self._conn.execute('UPDATE children SET is_leaf = ? WHERE dir_path = ? AND name = ?',
+                               (int(isEmpty), parentStr, dirName))
+
+    def forget(self, dirPath: Path) -> None:
+        """
+        Removes the directory and its whole subtree from the index
+        """
+        pathStr = str(dirPath).rstrip('/')
+        # subtree paths range from 'dir/' up to 'dir0', '0' follows '/'
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM children WHERE dir_path = ? OR (dir_path > ? AND dir_path < ?)',
+                               (pathStr, pathStr + '/', pathStr + '0'))
+            self._conn.execute('DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)',
+                               (pathStr, pathStr + '/', pathStr + '0'))
+
+    def rescan(self, rootPath: Path) -> int:
+        """
+        Walks the whole tree, only directories changed since their indexing are listed again.
+        Directories gone from the tree are removed from the index.
+        :return: number of directories scanned
+        """
+        scannedBefore = self.scannedDirs
+        visited = set()
+        # symlinked directories are listed, each real directory is walked once - no loops
+        walkedDirs = set()  # type: Set[Tuple[int, int]]
+        aliasPrefixes = []  # type: List[str]
+        pending = [rootPath]
+        while pending:
+            dirPath = pending.pop()
+            try:
+                stat = os.stat(str(dirPath))
+            except OSError:
+                continue
+            visited.add(str(dirPath))
+            if (stat.st_dev, stat.st_ino) in walkedDirs:
+                # another path to a walked directory, listed by browsing - its indexed subtree is kept
+                aliasPrefixes.append(str(dirPath).rstrip('/') + '/')
+                continue
+            walkedDirs.add((stat.st_dev, stat.st_ino))
+            for name, isDir, isLeaf in self.getOrderedChildren(dirPath):
+                if isDir:
+                    pending.append(dirPath / name)
+        with self._lock:
+            indexed = [row[0] for row in self._conn.execute('SELECT path FROM dirs')]
+        rootStr = str(rootPath).rstrip('/') + '/'
+        for pathStr in indexed:
+            if pathStr not in visited and (pathStr == str(rootPath) or pathStr.startswith(rootStr)) \
+                    and not pathStr.startswith(tuple(aliasPrefixes)):
+                self.forget(Path(pathStr))
+        return self.scannedDirs - scannedBefore
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -35,12 +35,33 @@ import sys
 import tempfile
 import threading
 import time
+from contextlib import nullcontext
 from queue import Queue, Empty, Full
 
 from config import IPC_SERVER_OPTION, AUDIO_DEV, MPV_LOG_FILE
 
 # The original 5secs increased to allow for slow mpv start after resume
 MPV_TIMEOUT_SECS = 10
+# events not collected in time (e.g. a stuck callback) are dropped oldest first
+EVENT_QUEUE_SIZE = 500
+
+
+def _putReplacingOldest(queue: Queue, item) -> bool:
+    """
+    Never blocks the reader thread
+    :return: an item was dropped
+    """
+    dropped = False
+    while True:
+        try:
+            queue.put_nowait(item)
+            return dropped
+        except Full:
+            try:
+                queue.get_nowait()
+                dropped = True
+            except Empty:
+                pass
 
 
 class MPVError(Exception):
@@ -175,7 +196,8 @@ class MPVBase:
         """
         self._request_queue = Queue(1)
         self._response_queues = {}
-        self._event_queue = Queue()
+        self._event_queue = Queue(EVENT_QUEUE_SIZE)
+        self.droppedEvents = 0
         self._stop_event = threading.Event()
 
     def _start_thread(self):
@@ -259,11 +281,13 @@ class MPVBase:
             except Empty:
                 raise MPVCommunicationError("got a response without a pending request")
 
-            self._response_queues[thread_id].put(message)
+            # one request per thread at a time - a response left over after a timeout is stale
+            _putReplacingOldest(self._response_queues[thread_id], message)
 
         elif "event" in message:
             # This message is an asynchronous event.
-            self._event_queue.put(message)
+            if _putReplacingOldest(self._event_queue, message):
+                self.droppedEvents += 1
 
         else:
             raise MPVCommunicationError("invalid message %r" % message)
@@ -285,7 +309,13 @@ class MPVBase:
         thread_id = self._thread_id()
         if thread_id not in self._response_queues:
             # Prepare a response queue for the thread to wait on.
-            self._response_queues[thread_id] = Queue()
+            self._response_queues[thread_id] = Queue(1)
+        else:
+            # dropping a late response to a previous timed out request
+            try:
+                self._response_queues[thread_id].get_nowait()
+            except Empty:
+                pass
 
         # Put the id of the current thread on the request queue. This id is
         # later used to associate responses from the mpv process with this
@@ -430,7 +460,19 @@ class MPV(MPVBase):
             if message is None:
                 continue
 
-            self._handle_event(message)
+            with self._event_burst():
+                self._handle_event(message)
+                # events already waiting belong to the same change, e.g. a new track
+                message = self._get_event()
+                while message is not None:
+                    self._handle_event(message)
+                    message = self._get_event()
+
+    def _event_burst(self):
+        """Context of handling a burst of waiting events, subclasses can batch
+           what their callbacks produce.
+        """
+        return nullcontext()
 
     def _handle_event(self, message):
         """Lookup and call the callbacks for a particular event message.
@@ -1,7 +1,7 @@
 import abc
 import re
 from time import sleep
-from typing import TYPE_CHECKING, Optional, List, Dict, Generic
+from typing import TYPE_CHECKING, ContextManager, Optional, List, Dict, Generic
 
 from groupid import GroupID
 from metadata import Metadata
@@ -52,6 +52,10 @@ class MPVTreeSource(TreeSource, UsesMPV, Generic[PATH]):
         TreeSource.close(self)
         UsesMPV.close(self)
 
+    def batchedCallbacks(self) -> ContextManager:
+        # e.g. track, playback status, audio params and metadata of a new track redrawn at once
+        return self.dispatcher.batch(self.id)
+
     def chapterWasChanged(self, chapter: Optional[int]) -> None:
         pass
 
@@ -37,6 +37,10 @@ class MyMPV(MPV):
     def getOwner(self) -> Optional['UsesMPV']:
         return self._owner
 
+    def _event_burst(self):
+        # messages of all callbacks of the burst sent together
+        return self._owner.batchedCallbacks()
+
     # -------------------------------------------------------------------------
     # Callbacks
     # -------------------------------------------------------------------------
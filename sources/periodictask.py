@@ -1,33 +1,32 @@
-from threading import Lock, Timer
+from threading import Lock, Thread, Event
 
 
 class PeriodicTask(object):
     """
-    A periodic task running in threading.Timers
+    A periodic task running in one thread for its whole life, not a new threading.Timer for every tick
     """
 
     def __init__(self, interval: float, function):
         self._lock = Lock()
-        self._timer = None
+        self._thread = None
+        self._stopEvent = Event()
         self.function = function
         self.interval = interval
-        self._stopped = True
         self.start()
 
-    def start(self, from_run=False):
-        self._lock.acquire()
-        if from_run or self._stopped:
-            self._stopped = False
-            self._timer = Timer(self.interval, self._run)
-            self._timer.start()
-            self._lock.release()
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stopEvent = Event()
+                self._thread = Thread(target=self._run, args=(self._stopEvent,), name='PeriodicTask')
+                self._thread.setDaemon(True)
+                self._thread.start()
 
-    def _run(self):
-        self.start(from_run=True)
-        self.function()
+    def _run(self, stopEvent: Event):
+        while not stopEvent.wait(self.interval):
+            self.function()
 
     def stop(self):
-        self._lock.acquire()
-        self._stopped = True
-        self._timer.cancel()
-        self._lock.release()
+        with self._lock:
+            self._stopEvent.set()
+            self._thread = None
@@ -10,6 +10,7 @@ from metadata import Metadata
 from moduleid import ModuleID
 from msgs.nodemsg import NodeID, NodeItem
 from sources import playlistparsers
+from sources.indexedtreelib import IndexedTreelib
 from sources.mpvtreesource import MPVTreeSource
 from sources.periodictask import PeriodicTask
 from sources.playbackstatus import PlaybackStatus
@@ -31,14 +32,14 @@ def isOnline() -> bool:
     return False
 
 
-class RadioSource(MPVTreeSource[Node]):
+class RadioSource(IndexedTreelib, MPVTreeSource[Node]):
     def __init__(self, dispatcher: 'Dispatcher'):
-        self._tree = None
+        self._setTree(None)
         # XML tree must be loaded in the thread so that this constructor exits fast
         super().__init__(ModuleID.RADIO_SOURCE, 'RadioSource', dispatcher, monitorTime=False)
 
     def _initializeInThread(self):
-        self._tree = self._initTree()
+        self._setTree(self._initTree())
         self.__onlineChecker = PeriodicTask(ONLINE_CHECK__INTERVAL, self._watchAvailability)
         super()._initializeInThread()
 
@@ -7,7 +7,7 @@ from groupid import GroupID
 from moduleid import ModuleID
 from msgid import MsgID
 from msgs.integermsg import BiIntegerMsg, IntegerMsg
-from msgs.message import Message
+from msgs.message import Message, NO_CORRELATION
 from msgs.nodemsg import NodeID, NON_EXISTING_NODE_ID, NodeItem, NodeStruct, NodeMsg
 from sources.source import Source
 
@@ -35,11 +35,12 @@ class TreeSource(Source, abc.ABC, Generic[PATH]):
             if self._status.isAvailable():
                 if msg.typeID == MsgID.REQ_NODE:
                     msg = msg  # type: BiIntegerMsg
-                    self._sendNodeInfo(msg.value1, msg.value2)
+                    # replying only to the requester
+                    self._sendNodeInfo(msg.value1, msg.value2, forID=msg.fromID, correlationID=msg.correlationID)
                     return True
                 elif msg.typeID == MsgID.REQ_PARENT_NODE:
                     msg = msg  # type: IntegerMsg
-                    self._sendParentNodeInfo(msg.value)
+                    self._sendParentNodeInfo(msg.value, forID=msg.fromID, correlationID=msg.correlationID)
                     return True
                 elif msg.typeID == MsgID.PLAY_NODE:
                     path = self.__getPathFromNodeIntegerMsg(msg)
@@ -65,7 +66,13 @@ class TreeSource(Source, abc.ABC, Generic[PATH]):
         path = self._getPath(nodeID)
         return path
 
-    def _sendNodeInfo(self, nodeID: NodeID, fromIndex: int) -> None:
+    def _sendNodeInfo(self, nodeID: NodeID, fromIndex: int, forID: ModuleID = ModuleID.ANY,
+                      correlationID: int = NO_CORRELATION) -> None:
+        """
+        :param forID: requester, ModuleID.ANY broadcasts to all UIs
+        """
+        # UIs step the window by arithmetic, e.g. fewer children than MAX_CHILDREN yield a negative index
+        fromIndex = max(fromIndex, 0)
         nodeID = self._getExistingNodeID(nodeID)
         path = self._getPath(nodeID)  # type: PATH
         nodeItem = self._createNodeItem(nodeID, path)
@@ -78,44 +85,34 @@ class TreeSource(Source, abc.ABC, Generic[PATH]):
                             children=children,
                             fromChildIndex=fromIndex,
                             totalChildren=totalChildren)
-        msg = NodeMsg(nodeStruct=struct, fromID=self.id, groupID=GroupID.UI)
+        # groupID UI as fallback for a requester with unknown route
+        msg = NodeMsg(nodeStruct=struct, fromID=self.id, forID=forID, groupID=GroupID.UI)
+        msg.correlationID = correlationID
         self.dispatcher.distribute(msg, self.id)
 
-    def _sendParentNodeInfo(self, nodeID: NodeID) -> None:
+    def _sendParentNodeInfo(self, nodeID: NodeID, forID: ModuleID = ModuleID.ANY,
+                            correlationID: int = NO_CORRELATION) -> None:
         nodeID = self._getExistingNodeID(nodeID)
         if nodeID == self._rootNode.nodeID:
-            self._sendNodeInfo(self._rootNode.nodeID, 0)
+            self._sendNodeInfo(self._rootNode.nodeID, 0, forID, correlationID)
         else:
             path = self._getPath(nodeID)
             parentPath = self._getParentPath(path)
             index, total = self._findIndexOfPath(path, parentPath)
             fromIndex = self._calculateFromIndex(index, total)
             parentID = self._getID(parentPath)
-            self._sendNodeInfo(parentID, fromIndex)
+            self._sendNodeInfo(parentID, fromIndex, forID, correlationID)
 
     def _findIndexOfPath(self, path: PATH, parentPath: PATH) -> (int, int):
-        index = 0
-        orderedPaths = self._getOrderedChildPaths(parentPath)
-        for childPath in orderedPaths:
-            if self._areEqual(childPath, path):
-                return index, len(orderedPaths)
-            index += 1
-        return 0, len(orderedPaths)
+        index = self._indexOf(path)
+        return index if index is not None else 0, self._childCount(parentPath)
 
     def _findChildrenAndTotal(self, path: PATH, fromIndex: int) -> Tuple[List[NodeItem], int]:
-        index = 0
-        total = 0
-        childrenCount = 0
-        children = []  # type: List[NodeItem]
-        if not self._isLeaf(path):
-            # sorted by case insensitive name
-            for childPath in self._getOrderedChildPaths(path):
-                if (index >= fromIndex) and (childrenCount < MAX_CHILDREN):
-                    children.append(self._getNodeItemForPath(childPath))
-                    childrenCount += 1
-                index += 1
-                total += 1
-        return children, total
+        if self._isLeaf(path):
+            return [], 0
+        children = [self._getNodeItemForPath(childPath)
+                    for childPath in self._childrenSlice(path, fromIndex, MAX_CHILDREN)]
+        return children, self._childCount(path)
 
     def _createNodeItemForID(self, nodeID: NodeID) -> NodeItem:
         path = self._getPath(nodeID)
@@ -197,11 +194,14 @@ class TreeSource(Source, abc.ABC, Generic[PATH]):
     def _playSibling(self, currentPath: PATH, offset: int) -> None:
         parent = self._getParentPath(currentPath)
         if parent is not None:
-            paths = self._getOrderedChildPaths(parent)
-            currentIndex = paths.index(currentPath)
-            newIndex = clamp(currentIndex + offset, 0, len(paths) - 1)
-            pathToPlay = paths[newIndex]
-            self._playPath(pathToPlay)
+            currentIndex = self._indexOf(currentPath)
+            if currentIndex is None:
+                # no longer among the children
+                return
+            newIndex = clamp(currentIndex + offset, 0, self._childCount(parent) - 1)
+            paths = self._childrenSlice(parent, newIndex, 1)
+            if paths:
+                self._playPath(paths[0])
 
     @abc.abstractmethod
     def _playPath(self, path: PATH) -> None:
@@ -247,6 +247,26 @@ class TreeSource(Source, abc.ABC, Generic[PATH]):
     def _getOrderedChildPaths(self, path: PATH) -> List[PATH]:
         pass
 
+    # indexed access to the ordered children, paging must not cost more with growing number of children
+
+    @abc.abstractmethod
+    def _childCount(self, path: PATH) -> int:
+        pass
+
+    @abc.abstractmethod
+    def _childrenSlice(self, path: PATH, start: int, count: int) -> List[PATH]:
+        """
+        :return: up to count children from index start, in the order of _getOrderedChildPaths
+        """
+        pass
+
+    @abc.abstractmethod
+    def _indexOf(self, path: PATH) -> Optional[int]:
+        """
+        :return: index of path among children of its parent, None = not found
+        """
+        pass
+
     @abc.abstractmethod
     def _areEqual(self, path1: PATH, path2: PATH) -> bool:
         pass
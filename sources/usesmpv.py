@@ -1,8 +1,9 @@
 import abc
 import logging
-from queue import Queue
+from contextlib import nullcontext
+from queue import Queue, Full, Empty
 from threading import Thread, Event, Lock
-from typing import Optional, Tuple
+from typing import ContextManager, Optional, Tuple
 
 from common.mathutils import roundToInt, clamp
 from sources.mpv import MPVCommandError
@@ -173,6 +174,12 @@ class UsesMPV(abc.ABC):
         else:
             return False
 
+    def batchedCallbacks(self) -> ContextManager:
+        """
+        Context of the callbacks called for one burst of mpv events. Default - no batching
+        """
+        return nullcontext()
+
     @abc.abstractmethod
     def chapterWasChanged(self, chapter: Optional[int]) -> None:
         pass
@@ -230,7 +237,8 @@ class TimePosTimer(Thread):
         self._finishEvent = Event()
         self._triggerEvent = Event()
         self._enabled = False
-        self._queue = Queue()
+        # only the latest time position is of interest
+        self._queue = Queue(1)
         self.start()
 
     def run(self):
@@ -278,4 +286,12 @@ class TimePosTimer(Thread):
 
     def timePosCallback(self, timePos: float):
         if timePos is not None:
-            self._queue.put(timePos)
+            try:
+                self._queue.put_nowait(timePos)
+            except Full:
+                # replacing the stale value
+                try:
+                    self._queue.get_nowait()
+                except Empty:
+                    pass
+                self._queue.put_nowait(timePos)
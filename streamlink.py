@@ -0,0 +1,173 @@
+import os
+import socket
+import struct
+import termios
+import tty
+import zlib
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from errors import ParameterError
+
+"""
+Framed byte stream link for gateway pairs - tty, pty or socket.
+Frame: SYNC (2B) | payload length (H) | payload | CRC32 of length and payload (I), all little-endian
+"""
+
+SYNC = b'\xa5\x5a'
+# a node with a few hundred children stays far below. A false SYNC in garbage makes the decoder
+# wait for at most this many bytes, longer lengths are recognised as garbage at once
+MAX_PAYLOAD = 32768
+READ_SIZE = 65536
+
+_LENGTH = struct.Struct('<H')
+_CRC = struct.Struct('<I')
+_PREFIX_SIZE = len(SYNC) + _LENGTH.size
+_FRAME_OVERHEAD = _PREFIX_SIZE + _CRC.size
+
+
+def encodeFrame(payload: bytes) -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ParameterError("Payload of " + str(len(payload)) + " bytes too long for a frame")
+    lengthAndPayload = _LENGTH.pack(len(payload)) + payload
+    return SYNC + lengthAndPayload + _CRC.pack(zlib.crc32(lengthAndPayload))
+
+
+class FrameDecoder:
+    """
+    Splits the incoming byte stream to frame payloads.
+    Garbage and corrupted frames are skipped by searching for the next SYNC.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # statistics
+        self.droppedBytes = 0
+        self.badFrames = 0
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buffer = self._buffer
+        buffer.extend(data)
+        payloads = []  # type: List[bytes]
+        while True:
+            start = buffer.find(SYNC)
+            if start < 0:
+                # keeping the last byte, it can be the first half of SYNC
+                keep = 1 if buffer[-1:] == SYNC[:1] else 0
+                self.droppedBytes += len(buffer) - keep
+                del buffer[:len(buffer) - keep]
+                break
+            if start > 0:
+                self.droppedBytes += start
+                del buffer[:start]
+            if len(buffer) < _PREFIX_SIZE:
+                break
+            length, = _LENGTH.unpack_from(buffer, len(SYNC))
+            if length > MAX_PAYLOAD:
+                valid = False
+            else:
+                frameSize = length + _FRAME_OVERHEAD
+                if len(buffer) < frameSize:
+                    break
+                crc, = _CRC.unpack_from(buffer, _PREFIX_SIZE + length)
+                with memoryview(buffer) as view:
+                    valid = zlib.crc32(view[len(SYNC):_PREFIX_SIZE + length]) == crc
+                    if valid:
+                        payloads.append(bytes(view[_PREFIX_SIZE:_PREFIX_SIZE + length]))
+            if valid:
+                del buffer[:frameSize]
+            else:
+                # resynchronisation - skipping the false SYNC
+                self.badFrames += 1
+                self.droppedBytes += 1
+                del buffer[:1]
+        return payloads
+
+
+class StreamLink:
+    """
+    One end of a full-duplex framed byte stream.
+    Written by the gateway sender, read by the reader thread of the gateway receiver.
+    """
+
+    def __init__(self, fd: int, owner: Optional[object] = None):
+        self._fd = fd
+        # keeps e.g. the socket object alive
+        self._owner = owner
+        self._writeLock = Lock()
+        self._decoder = FrameDecoder()
+
+    def fileno(self) -> int:
+        # for select()
+        return self._fd
+
+    def write(self, payloads: List[bytes]) -> None:
+        """
+        All payloads are framed and written with as few write() calls as possible
+        """
+        data = memoryview(b''.join(encodeFrame(payload) for payload in payloads))
+        with self._writeLock:
+            while len(data) > 0:
+                written = os.write(self._fd, data)
+                data = data[written:]
+
+    def read(self) -> List[bytes]:
+        """
+        Blocking read of available bytes
+        :return: payloads of all complete frames, can be empty
+        """
+        data = os.read(self._fd, READ_SIZE)
+        if not data:
+            raise EOFError("Stream link closed")
+        return self._decoder.feed(data)
+
+    def release(self) -> None:
+        """
+        Closes only the descriptor of this process, e.g. the end inherited by a forked process
+        which belongs to the other side. The link stays open for the other processes.
+        """
+        if isinstance(self._owner, socket.socket):
+            self._owner.close()
+        else:
+            os.close(self._fd)
+
+    def close(self) -> None:
+        if isinstance(self._owner, socket.socket):
+            try:
+                self._owner.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._owner.close()
+        else:
+            os.close(self._fd)
+
+
+def createSocketPair() -> Tuple[StreamLink, StreamLink]:
+    sock1, sock2 = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    return StreamLink(sock1.fileno(), sock1), StreamLink(sock2.fileno(), sock2)
+
+
+def createPtyPair() -> Tuple[StreamLink, StreamLink]:
+    """
+    Pseudo terminal pair emulating a serial line
+    """
+    master, slave = os.openpty()
+    tty.setraw(master, termios.TCSANOW)
+    tty.setraw(slave, termios.TCSANOW)
+    return StreamLink(master), StreamLink(slave)
+
+
+def openTty(path: str) -> StreamLink:
+    """
+    Serial device in raw mode, line speed is expected to be configured by the system
+    """
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd, termios.TCSANOW)
+    return StreamLink(fd)
+
+
+def openTtyPair(path1: str, path2: str) -> Tuple[StreamLink, StreamLink]:
+    """
+    Two serial devices connected by a null-modem cable
+    """
+    return openTty(path1), openTty(path2)
@@ -0,0 +1,79 @@
+import time
+import unittest
+from threading import Event
+
+import globalvars
+from asyncmsgconsumer import AsyncMsgConsumer, SegmentRunner
+from consumerregistry import ConsumerRegistry
+from dispatcher import Dispatcher
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgqueue import MsgQueue, QueuePolicy, BLOCK_TIMEOUT
+from msgs.batchmsg import BatchMsg
+from msgs.integermsg import IntegerMsg
+
+WAIT_TIMEOUT = 2.0
+
+
+def createSetVol(volume: int) -> IntegerMsg:
+    return IntegerMsg(value=volume, fromID=ModuleID.UI_CONSOLE, typeID=MsgID.SET_VOL, forID=ModuleID.VOLUME_OPERATOR,
+                      groupID=GroupID.ANY)
+
+
+class RecordingAsyncModule(AsyncMsgConsumer):
+    def __init__(self, dispatcher: Dispatcher):
+        self.values = []
+        self.allReceived = Event()
+        super().__init__(ModuleID.VOLUME_OPERATOR, 'Recording async', dispatcher)
+
+    def _consume(self, msg):
+        if msg.value < 0:
+            raise ValueError("bad value")
+        return self._record(msg.value)
+
+    async def _record(self, value: int):
+        self.values.append(value)
+        if len(self.values) == 3:
+            self.allReceived.set()
+
+
+class AsyncMsgConsumerTest(unittest.TestCase):
+    def setUp(self):
+        globalvars.consumerRegistry = ConsumerRegistry()
+        self.dispatcher = Dispatcher("Async", gatewayIDs=[])
+        self.runner = SegmentRunner(self.dispatcher)
+        self.module = RecordingAsyncModule(self.dispatcher)
+
+    def tearDown(self):
+        self.module.close()
+        self.runner.stop()
+
+    def test_coroutinesConsumedInOrderDespiteFailures(self):
+        self.module.receive(createSetVol(1))
+        self.module.receive(createSetVol(-1))
+        self.module.receive(BatchMsg([createSetVol(2), createSetVol(-1), createSetVol(3)], ModuleID.UI_CONSOLE))
+        self.assertTrue(self.module.allReceived.wait(WAIT_TIMEOUT))
+        self.assertEqual(self.module.values, [1, 2, 3])
+        self.assertEqual(self.module.metrics.snapshot()['consumeTime']['count'], 3)
+
+    def test_loopThreadNeverBlocksOnFullQueue(self):
+        queue = MsgQueue(queuePolicy=QueuePolicy(capacity=1))
+        done = Event()
+        durations = []
+
+        def putTwice():
+            startedAt = time.monotonic()
+            queue.put(createSetVol(1))
+            queue.put(createSetVol(2))
+            durations.append(time.monotonic() - startedAt)
+            done.set()
+
+        self.runner.callSoon(putTwice)
+        self.assertTrue(done.wait(WAIT_TIMEOUT))
+        self.assertLess(durations[0], BLOCK_TIMEOUT / 2)
+        self.assertEqual(queue.get_nowait().value, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from sources.audiodetector import AudioDetector, sniff
+
+
+class SniffTest(unittest.TestCase):
+    def test_mpegAndAdtsFramesAreAudio(self):
+        self.assertTrue(sniff(b'\xff\xfb\x90\x64' + bytes(60)))
+        self.assertTrue(sniff(b'\xff\xf1\x50\x80' + bytes(60)))
+
+    def test_textWithBOMIsNotAudio(self):
+        self.assertFalse(sniff('[00:01.00]lyrics'.encode('utf-16')))
+        self.assertFalse(sniff(b'\xff\xfe[\x00t\x00i\x00:\x00'))
+        self.assertFalse(sniff('\ufefftitle'.encode('utf-8')))
+
+    def test_reservedHeaderBitsAreNotMpeg(self):
+        # reserved version
+        self.assertIsNone(sniff(b'\xff\xeb\x90\x64'))
+        # reserved layer
+        self.assertIsNone(sniff(b'\xff\xe1\x90\x64'))
+        # bad bitrate index
+        self.assertIsNone(sniff(b'\xff\xfb\xf0\x64'))
+
+
+class DecidedByTest(unittest.TestCase):
+    def test_countsFromManyThreadsAddUp(self):
+        detector = AudioDetector()
+        paths = ['song%d.mp3' % index for index in range(10000)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(detector.isAudio, paths))
+        self.assertEqual(detector.decidedBy['extension'], len(paths))
+
+
+class ProbeTest(unittest.TestCase):
+    def test_filesDecidedByMagicBytes(self):
+        detector = AudioDetector()
+        with tempfile.TemporaryDirectory() as tmpDir:
+            lyrics = os.path.join(tmpDir, 'song.lyrics')
+            with open(lyrics, 'wb') as file:
+                file.write('[00:01.00]la la'.encode('utf-16'))
+            track = os.path.join(tmpDir, 'track.bin')
+            with open(track, 'wb') as file:
+                file.write(b'ID3\x04\x00' + bytes(100))
+            self.assertEqual(detector.areAudio([lyrics, track]), [False, True])
+        self.assertEqual(detector.decidedBy['magic'], 2)
+        detector.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
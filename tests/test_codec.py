@@ -0,0 +1,28 @@
+import unittest
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgs.codec import encode, decode, _createSampleMsgs
+from msgs.nodemsg import NodeItem, NodeStruct, NodeMsg
+
+
+class CodecTest(unittest.TestCase):
+    def test_samplesRoundTrip(self):
+        for name, msg in _createSampleMsgs().items():
+            with self.subTest(name):
+                self.assertEqual(encode(decode(encode(msg))), encode(msg))
+
+    def test_nodeWithNegativeFromIndex(self):
+        # next button of a UI with fewer children than the window computes a negative fromIndex
+        node = NodeItem(nodeID=42, label="Album", isPlayable=True, isLeaf=False, bookmarkID=None)
+        child = NodeItem(nodeID=43, label="Track", isPlayable=True, isLeaf=True, bookmarkID=None)
+        struct_ = NodeStruct(node=node, rootNode=node, totalParents=1, parentID=1, children=[child],
+                             fromChildIndex=-4, totalChildren=1)
+        msg = decode(encode(NodeMsg(nodeStruct=struct_, fromID=ModuleID.FILE_SOURCE, groupID=GroupID.UI)))
+        self.assertEqual(msg.nodeStruct.fromChildIndex, -4)
+        self.assertEqual(msg.nodeStruct.totalChildren, 1)
+        self.assertEqual(msg.nodeStruct.children[0].nodeID, 43)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import time
+import unittest
+from typing import Callable, List
+
+import globalvars
+from consumerregistry import ConsumerRegistry
+from dispatcher import Dispatcher
+from gateways import GatewayTransport, createGatewayPair
+from groupid import GroupID
+from moduleid import ModuleID
+from msgconsumer import MsgConsumer
+from msgid import MsgID
+from msgs.audioparamsmsg import AudioParamsMsg, ParamsItem
+from msgs.integermsg import IntegerMsg
+from msgs.message import Message
+
+WAIT_TIMEOUT = 2.0
+
+
+class RecordingModule(MsgConsumer):
+    # noinspection PyShadowingBuiltins
+    def __init__(self, id: ModuleID, dispatcher: Dispatcher, groupIDs: List[GroupID]):
+        self._groupIDs = groupIDs
+        self.received = []  # type: List[Message]
+        super().__init__(id, name='Recording ' + id.name, dispatcher=dispatcher)
+
+    def _consume(self, msg: Message) -> bool:
+        self.received.append(msg)
+        return True
+
+    def _getGroupIDs(self) -> List[GroupID]:
+        return self._groupIDs
+
+    def subscribe(self, patterns) -> None:
+        self._subscribe(patterns)
+
+    def send(self, msg: Message) -> None:
+        self.dispatcher.distribute(msg, self.id)
+
+    def receivedOf(self, msgID: MsgID) -> List[Message]:
+        return [msg for msg in self.received if msg.typeID == msgID]
+
+
+def waitFor(condition: Callable[[], bool]) -> bool:
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class RetainedReplayAcrossSegmentsTest(unittest.TestCase):
+    """
+    Segment PC with the source and a UI, segment MCU with another UI, one gateway pair between them
+    """
+
+    def setUp(self):
+        globalvars.consumerRegistry = ConsumerRegistry()
+        # announcements wait for the gateways, as in control.py
+        globalvars.consumersReadyEvent.clear()
+        self.pc = Dispatcher("On PC", gatewayIDs=[ModuleID.PC_MCU_SENDER])
+        self.mcu = Dispatcher("On MCU", gatewayIDs=[ModuleID.MCU_PC_SENDER])
+        createGatewayPair(GatewayTransport.IN_PROCESS,
+                          'PC', self.pc, ModuleID.PC_MCU_SENDER, ModuleID.MCU_PC_RECEIVER,
+                          'MCU', self.mcu, ModuleID.MCU_PC_SENDER, ModuleID.PC_MCU_RECEIVER)
+        self.source = RecordingModule(ModuleID.FILE_SOURCE, self.pc, [GroupID.SOURCE])
+        self.localUI = RecordingModule(ModuleID.WEBUI_PC, self.pc, [GroupID.UI])
+        self.remoteUI = RecordingModule(ModuleID.WEBUI_RC, self.mcu, [GroupID.UI])
+        globalvars.consumersReadyEvent.set()
+        modules = [self.source, self.localUI, self.remoteUI]
+        self.assertTrue(waitFor(lambda: all(dispatcher.hasRouteTo(module.id) for dispatcher in (self.pc, self.mcu)
+                                            for module in modules)))
+
+    def tearDown(self):
+        for consumer in globalvars.consumerRegistry.getAll():
+            consumer.close()
+
+    def _sendAudioParams(self):
+        self.source.send(AudioParamsMsg(paramsItem=ParamsItem(rate=44100, bits=16, channels=2),
+                                        fromID=ModuleID.FILE_SOURCE, groupID=GroupID.UI))
+
+    def test_subscribingRemoteUIGetsValuePrunedAtGateway(self):
+        # no UI interested, the value stays on PC
+        self.localUI.subscribe([])
+        self.remoteUI.subscribe([])
+        self.assertTrue(waitFor(lambda: ModuleID.WEBUI_RC in self.pc._routingTable.subscriptionMap))
+        self._sendAudioParams()
+        time.sleep(0.1)
+        self.assertEqual(self.remoteUI.receivedOf(MsgID.AUDIOPARAMS_INFO), [])
+
+        self.remoteUI.subscribe([(MsgID.AUDIOPARAMS_INFO, ModuleID.FILE_SOURCE)])
+        self.assertTrue(waitFor(lambda: self.remoteUI.receivedOf(MsgID.AUDIOPARAMS_INFO)))
+        time.sleep(0.1)
+        replayed = self.remoteUI.receivedOf(MsgID.AUDIOPARAMS_INFO)
+        self.assertEqual(len(replayed), 1)
+        self.assertEqual(replayed[0].fromID, ModuleID.FILE_SOURCE)
+        # replayed to the subscriber only
+        self.assertEqual(self.localUI.receivedOf(MsgID.AUDIOPARAMS_INFO), [])
+
+    def test_twoRemoteUIsSubscribingTogetherGetTheirReplays(self):
+        remoteConsole = RecordingModule(ModuleID.UI_CONSOLE, self.mcu, [GroupID.UI])
+        self.assertTrue(waitFor(lambda: self.pc.hasRouteTo(ModuleID.UI_CONSOLE)))
+        self._sendAudioParams()
+        self.assertTrue(waitFor(lambda: remoteConsole.receivedOf(MsgID.AUDIOPARAMS_INFO)
+                                and self.remoteUI.receivedOf(MsgID.AUDIOPARAMS_INFO)))
+        remoteConsole.received.clear()
+        self.remoteUI.received.clear()
+        # both replays pass the same gateway queue together with a new broadcast
+        self.remoteUI.subscribe([(MsgID.AUDIOPARAMS_INFO, ModuleID.FILE_SOURCE)])
+        remoteConsole.subscribe([(MsgID.AUDIOPARAMS_INFO, ModuleID.FILE_SOURCE)])
+        self._sendAudioParams()
+        for ui in (self.remoteUI, remoteConsole):
+            self.assertTrue(waitFor(lambda: len(ui.receivedOf(MsgID.AUDIOPARAMS_INFO)) >= 2))
+
+    def test_announcingRemoteUIGetsEachValueOnce(self):
+        self.source.send(IntegerMsg(value=5, fromID=ModuleID.FILE_SOURCE, typeID=MsgID.SOURCE_STATUS_INFO,
+                                    groupID=GroupID.UI))
+        self.assertTrue(waitFor(lambda: self.remoteUI.receivedOf(MsgID.SOURCE_STATUS_INFO)))
+        self.remoteUI.received.clear()
+        # restarting UI announces itself again
+        self.remoteUI.send(IntegerMsg(value=1 << GroupID.UI.value, fromID=ModuleID.WEBUI_RC,
+                                      typeID=MsgID.IN_GROUPS_MSG))
+        self.assertTrue(waitFor(lambda: self.remoteUI.receivedOf(MsgID.SOURCE_STATUS_INFO)))
+        time.sleep(0.1)
+        self.assertEqual(len(self.remoteUI.receivedOf(MsgID.SOURCE_STATUS_INFO)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
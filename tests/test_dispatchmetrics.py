@@ -0,0 +1,84 @@
+import unittest
+from threading import Thread
+
+from dispatchmetrics import ConsumerMetrics, DispatcherMetrics, RateWindow
+from metricsserver import MetricsServer
+from msgid import MsgID
+
+THREADS = 8
+COUNT = 5000
+
+
+class DispatcherMetricsTest(unittest.TestCase):
+    def test_concurrentCountsAddUp(self):
+        metrics = DispatcherMetrics()
+
+        def count():
+            for _ in range(COUNT):
+                metrics.msgDistributed(MsgID.SOURCE_STATUS_INFO)
+                metrics.msgSubmitted()
+
+        def snapshot():
+            for _ in range(200):
+                metrics.snapshot()
+
+        threads = [Thread(target=count) for _ in range(THREADS)] + [Thread(target=snapshot) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['count'], THREADS * COUNT)
+        self.assertEqual(snapshot['submitted'], THREADS * COUNT)
+        self.assertEqual(snapshot['msgs']['SOURCE_STATUS_INFO']['count'], THREADS * COUNT)
+
+    def test_readersKeepTheirOwnRateWindows(self):
+        metrics = DispatcherMetrics()
+        console = RateWindow()
+        scraper = RateWindow()
+
+        def read(window: RateWindow) -> dict:
+            return window.addRates({'dispatchers': {'On PC': metrics.snapshot()}})['dispatchers']['On PC']
+
+        read(console)
+        for _ in range(5):
+            metrics.msgDistributed(MsgID.SOURCE_STATUS_INFO)
+        read(scraper)
+        # the scraper saw all messages already, the console period still holds them
+        self.assertEqual(read(scraper)['rate'], 0)
+        consoleMetrics = read(console)
+        self.assertGreater(consoleMetrics['rate'], 0)
+        self.assertGreater(consoleMetrics['msgs']['SOURCE_STATUS_INFO']['rate'], 0)
+        self.assertNotIn('rate', metrics.snapshot())
+
+
+class ConsumerMetricsTest(unittest.TestCase):
+    def test_concurrentObservationsAddUp(self):
+        # direct relays record from all distributing threads
+        metrics = ConsumerMetrics()
+
+        def consume():
+            for _ in range(COUNT):
+                metrics.msgConsumed(0.0, 0.001)
+
+        threads = [Thread(target=consume) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['consumeTime']['count'], THREADS * COUNT)
+        self.assertEqual(sum(snapshot['consumeTime']['buckets'].values()), THREADS * COUNT)
+
+
+class MetricsServerTest(unittest.TestCase):
+    def test_bindsToLocalhostByDefault(self):
+        server = MetricsServer(0)
+        try:
+            self.assertEqual(server._server.server_address[0], '127.0.0.1')
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
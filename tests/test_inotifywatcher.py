@@ -0,0 +1,62 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from sources.inotifywatcher import InotifyWatcher, DEBOUNCE_SECS
+
+WAIT_TIMEOUT = DEBOUNCE_SECS + 3.0
+
+
+def waitFor(condition) -> bool:
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class WatchedTreeTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmpDir.name) / 'library'
+        (self.root / 'artist' / 'album' / 'cd1').mkdir(parents=True)
+        (self.root / 'artist' / 'album' / 'track.flac').touch()
+        os.symlink(str(self.root), str(self.root / 'artist' / 'loop'))
+        self.changes = []
+        self.watcher = InotifyWatcher(self.root, lambda changed, removed: self.changes.append((changed, removed)),
+                                      sweep=lambda: None)
+
+    def tearDown(self):
+        self.watcher.close()
+        self._tmpDir.cleanup()
+
+    def _watchedPaths(self):
+        return set(self.watcher._wdsByPath)
+
+    def test_watchesDirectoriesOnly(self):
+        expected = {self.root, self.root / 'artist', self.root / 'artist' / 'album',
+                    self.root / 'artist' / 'album' / 'cd1'}
+        self.assertTrue(waitFor(lambda: self._watchedPaths() == expected))
+        self.assertEqual(set(self.watcher._pathsByWD.values()), expected)
+
+    def test_movedAwaySubtreeIsUnwatched(self):
+        self.assertTrue(waitFor(lambda: len(self._watchedPaths()) == 4))
+        os.rename(str(self.root / 'artist'), str(Path(self._tmpDir.name) / 'artist'))
+        self.assertTrue(waitFor(lambda: self.changes))
+        self.assertEqual(self._watchedPaths(), {self.root})
+        self.assertEqual(set(self.watcher._pathsByWD.values()), {self.root})
+        changedDirs, removedPaths = self.changes[0]
+        self.assertEqual(removedPaths, {self.root / 'artist'})
+        self.assertEqual(changedDirs, {self.root})
+
+    def test_createdSubtreeIsWatched(self):
+        self.assertTrue(waitFor(lambda: len(self._watchedPaths()) == 4))
+        (self.root / 'new').mkdir()
+        self.assertTrue(waitFor(lambda: self.root / 'new' in self._watchedPaths()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from sources.libraryindex import LibraryIndex
+
+
+def allAudio(paths):
+    return [True] * len(paths)
+
+
+class RescanTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmpDir.name)
+        (self.root / 'artist' / 'album').mkdir(parents=True)
+        (self.root / 'artist' / 'album' / 'track.flac').touch()
+        self.index = LibraryIndex(None, allAudio)
+
+    def tearDown(self):
+        self.index.close()
+        self._tmpDir.cleanup()
+
+    def test_symlinkLoopIsWalkedOnce(self):
+        os.symlink(str(self.root), str(self.root / 'artist' / 'album' / 'loop'))
+        self.assertEqual(self.index.rescan(self.root), 3)
+        # the symlink is still browsable
+        names = [name for name, isDir, isLeaf in self.index.getOrderedChildren(self.root / 'artist' / 'album')]
+        self.assertEqual(names, ['loop', 'track.flac'])
+
+    def test_symlinkedAlbumStaysBrowsable(self):
+        (self.root / 'other').mkdir()
+        os.symlink(str(self.root / 'artist' / 'album'), str(self.root / 'other' / 'album'))
+        self.index.rescan(self.root)
+        self.assertEqual(self.index.getChildCount(self.root / 'other' / 'album'), 1)
+
+    def test_browsedSymlinkedDirectoryIsKeptByRescan(self):
+        (self.root / 'artist' / 'album' / 'cd1').mkdir()
+        (self.root / 'other').mkdir()
+        os.symlink(str(self.root / 'artist' / 'album'), str(self.root / 'other' / 'album'))
+        self.index.rescan(self.root)
+        # browsing through both paths indexes both
+        for albumPath in (self.root / 'artist' / 'album', self.root / 'other' / 'album'):
+            self.index.getOrderedChildren(albumPath)
+            self.index.getOrderedChildren(albumPath / 'cd1')
+        indexedBefore = self._indexedDirs()
+        # nothing changed on disk, nothing is forgotten and listed again
+        self.assertEqual(self.index.rescan(self.root), 0)
+        self.assertEqual(self._indexedDirs(), indexedBefore)
+        self.assertIn(str(self.root / 'other' / 'album' / 'cd1'), indexedBefore)
+        self.assertIn(str(self.root / 'artist' / 'album' / 'cd1'), indexedBefore)
+
+    def _indexedDirs(self):
+        return {row[0] for row in self.index._conn.execute('SELECT path FROM dirs')}
+
+
+if __name__ == '__main__':
+    unittest.main()
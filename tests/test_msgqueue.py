@@ -0,0 +1,66 @@
+import time
+import unittest
+
+from groupid import GroupID
+from moduleid import ModuleID
+from msgid import MsgID
+from msgqueue import MsgQueue, QueuePolicy, BLOCK_TIMEOUT, COALESCIBLE_INFO_MSG_IDS, nonBlocking
+from msgs.integermsg import IntegerMsg
+
+
+def createSetVol(volume: int) -> IntegerMsg:
+    return IntegerMsg(value=volume, fromID=ModuleID.UI_CONSOLE, typeID=MsgID.SET_VOL, forID=ModuleID.VOLUME_OPERATOR,
+                      groupID=GroupID.ANY)
+
+
+class NonBlockingPutTest(unittest.TestCase):
+    def test_blockPolicyDropsOldestWithoutWaiting(self):
+        queue = MsgQueue(queuePolicy=QueuePolicy(capacity=2))
+        queue.put(createSetVol(1))
+        queue.put(createSetVol(2))
+        startedAt = time.monotonic()
+        with nonBlocking():
+            queue.put(createSetVol(3))
+        self.assertLess(time.monotonic() - startedAt, BLOCK_TIMEOUT / 2)
+        self.assertEqual([queue.get_nowait().value for _ in range(queue.qsize())], [2, 3])
+        self.assertEqual(queue.droppedCounts[MsgID.SET_VOL], 1)
+
+    def test_blockPolicyWaitsOutsideTheContext(self):
+        queue = MsgQueue(queuePolicy=QueuePolicy(capacity=1))
+        queue.put(createSetVol(1))
+        startedAt = time.monotonic()
+        queue.put(createSetVol(2))
+        self.assertGreaterEqual(time.monotonic() - startedAt, BLOCK_TIMEOUT * 0.9)
+        self.assertEqual(queue.get_nowait().value, 1)
+
+
+def createVolInfo(volume: int, forID=None) -> IntegerMsg:
+    return IntegerMsg(value=volume, fromID=ModuleID.VOLUME_OPERATOR, typeID=MsgID.CURRENT_VOL_INFO, forID=forID,
+                      groupID=GroupID.UI)
+
+
+class CoalescingTest(unittest.TestCase):
+    def test_latestBroadcastWins(self):
+        queue = MsgQueue(COALESCIBLE_INFO_MSG_IDS)
+        queue.put(createVolInfo(1))
+        queue.put(createVolInfo(2))
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(queue.get_nowait().value, 2)
+
+    def test_replaysToTwoUIsKeepPendingBroadcast(self):
+        # gateway queue: broadcast still pending when retained values are replayed to two late UIs
+        queue = MsgQueue(COALESCIBLE_INFO_MSG_IDS)
+        queue.put(createVolInfo(1))
+        queue.put(createVolInfo(1, forID=ModuleID.WEBUI_RC))
+        queue.put(createVolInfo(1, forID=ModuleID.UI_CONSOLE))
+        msgs = [queue.get_nowait() for _ in range(queue.qsize())]
+        self.assertEqual([msg.forID for msg in msgs], [None, ModuleID.WEBUI_RC, ModuleID.UI_CONSOLE])
+        # a newer replay for the same UI still replaces the older one
+        queue.put(createVolInfo(1, forID=ModuleID.WEBUI_RC))
+        queue.put(createVolInfo(2, forID=ModuleID.WEBUI_RC))
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(queue.get_nowait().value, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
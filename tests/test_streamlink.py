@@ -0,0 +1,67 @@
+import select
+import unittest
+from typing import List
+
+from errors import ParameterError
+from streamlink import FrameDecoder, StreamLink, SYNC, MAX_PAYLOAD, encodeFrame, createPtyPair
+
+READ_TIMEOUT = 2.0
+
+
+def readPayloads(link: StreamLink, count: int) -> List[bytes]:
+    payloads = []  # type: List[bytes]
+    while len(payloads) < count:
+        readable, _, _ = select.select([link], [], [], READ_TIMEOUT)
+        if not readable:
+            break
+        payloads.extend(link.read())
+    return payloads
+
+
+class FrameDecoderTest(unittest.TestCase):
+    def test_resyncAfterGarbage(self):
+        decoder = FrameDecoder()
+        garbage = b'\x00\xa5noise\x5a\xa5'
+        self.assertEqual(decoder.feed(garbage + encodeFrame(b'first') + encodeFrame(b'second')),
+                         [b'first', b'second'])
+        self.assertEqual(decoder.droppedBytes, len(garbage))
+
+    def test_frameSplitToSingleBytes(self):
+        decoder = FrameDecoder()
+        payloads = []
+        for byte in encodeFrame(b'payload'):
+            payloads.extend(decoder.feed(bytes([byte])))
+        self.assertEqual(payloads, [b'payload'])
+
+    def test_resyncAfterCorruptedFrame(self):
+        decoder = FrameDecoder()
+        corrupted = bytearray(encodeFrame(b'corrupted'))
+        corrupted[6] ^= 0xFF
+        self.assertEqual(decoder.feed(bytes(corrupted) + encodeFrame(b'next')), [b'next'])
+        self.assertEqual(decoder.badFrames, 1)
+
+    def test_falseSyncWithLongLengthDoesNotStall(self):
+        decoder = FrameDecoder()
+        falseSync = SYNC + (MAX_PAYLOAD + 1).to_bytes(2, 'little')
+        self.assertEqual(decoder.feed(falseSync + encodeFrame(b'next')), [b'next'])
+
+    def test_tooLongPayloadRejected(self):
+        with self.assertRaises(ParameterError):
+            encodeFrame(bytes(MAX_PAYLOAD + 1))
+
+
+class PtyLinkTest(unittest.TestCase):
+    def test_roundTrip(self):
+        link1, link2 = createPtyPair()
+        try:
+            link1.write([b'ping', bytes(range(256))])
+            self.assertEqual(readPayloads(link2, 2), [b'ping', bytes(range(256))])
+            link2.write([b'pong'])
+            self.assertEqual(readPayloads(link1, 1), [b'pong'])
+        finally:
+            link1.close()
+            link2.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
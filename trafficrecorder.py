@@ -0,0 +1,110 @@
+import struct
+import time
+from threading import Lock
+from typing import TYPE_CHECKING, BinaryIO, Iterator, List
+
+from errors import ParameterError
+from moduleid import ModuleID
+from msgs import codec
+
+if TYPE_CHECKING:
+    from msgs.message import Message
+
+"""
+Traffic recording - every distributed message appended to a file for a later replay (python3 -m bench.replay).
+
+File: MAGIC | format version (B) | codec version (B), then records:
+    wall time (d), senderID (B), dispatcher name length (B), payload length (I), dispatcher name, codec payload
+"""
+
+MAGIC = b'AIOREC'
+FORMAT_VERSION = 1
+# buffered records are flushed at least this often
+FLUSH_INTERVAL = 1.0
+
+_FILE_HEADER = struct.Struct('<BB')
+_RECORD = struct.Struct('<dBBI')
+
+
+class RecordedMsg:
+    def __init__(self, timestamp: float, dispatcherName: str, senderID: ModuleID, msg: 'Message'):
+        # time.time() of the distribution
+        self.timestamp = timestamp
+        self.dispatcherName = dispatcherName
+        self.senderID = senderID
+        self.msg = msg
+
+
+class TrafficRecorder:
+    """
+    Called by Dispatcher.distribute in the distributing thread, encoding is the main cost
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'ab')  # type: BinaryIO
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + _FILE_HEADER.pack(FORMAT_VERSION, codec.CODEC_VERSION))
+        self._lock = Lock()
+        self._lastFlush = time.monotonic()
+        # statistics
+        self.recordedCount = 0
+        self.skippedCount = 0
+
+    def record(self, dispatcherName: str, senderID: ModuleID, msg: 'Message') -> None:
+        timestamp = time.time()
+        try:
+            payload = codec.encode(msg)
+        except ParameterError:
+            # no wire encoding
+            self.skippedCount += 1
+            return
+        name = dispatcherName.encode('utf-8')
+        record = _RECORD.pack(timestamp, senderID.value, len(name), len(payload)) + name + payload
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(record)
+            self.recordedCount += 1
+            now = time.monotonic()
+            if now - self._lastFlush > FLUSH_INTERVAL:
+                self._file.flush()
+                self._lastFlush = now
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def readRecording(path: str) -> Iterator[RecordedMsg]:
+    """
+    A truncated last record (recording process killed) is ignored
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    headerSize = len(MAGIC) + _FILE_HEADER.size
+    if data[:len(MAGIC)] != MAGIC or len(data) < headerSize:
+        raise ParameterError(path + " is not a traffic recording")
+    formatVersion, codecVersion = _FILE_HEADER.unpack_from(data, len(MAGIC))
+    if formatVersion != FORMAT_VERSION or codecVersion != codec.CODEC_VERSION:
+        raise ParameterError("Unsupported recording version " + str(formatVersion) + "/" + str(codecVersion))
+    view = memoryview(data)
+    offset = headerSize
+    while offset + _RECORD.size <= len(data):
+        timestamp, senderValue, nameLength, payloadLength = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        end = offset + nameLength + payloadLength
+        if end > len(data):
+            break
+        name = str(view[offset:offset + nameLength], 'utf-8')
+        msg = codec.decode(view[offset + nameLength:end])
+        offset = end
+        yield RecordedMsg(timestamp, name, ModuleID(senderValue), msg)
+
+
+def mergeRecordings(paths: List[str]) -> List[RecordedMsg]:
+    """
+    Recordings of segment processes ordered by their wall time
+    """
+    records = [record for path in paths for record in readRecording(path)]
+    records.sort(key=lambda record: record.timestamp)
+    return records
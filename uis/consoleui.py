@@ -1,10 +1,11 @@
 import logging
-from typing import List, TYPE_CHECKING
+from typing import List, TYPE_CHECKING, FrozenSet
 
 from groupid import GroupID
 from moduleid import ModuleID
 from msgconsumer import MsgConsumer
 from msgid import MsgID
+from msgqueue import COALESCIBLE_INFO_MSG_IDS
 from msgs.integermsg import IntegerMsg
 from msgs.message import Message
 from sources.sourcestatus import SourceStatus
@@ -56,5 +57,14 @@ class ConsoleUI(MsgConsumer, HasSourceParts):
             SourcePart(id=self.id, dispatcher=self.dispatcher, sourceID=ModuleID.CD_SOURCE)
         ]
 
+    def _initializeInThread(self):
+        super()._initializeInThread()
+        # no track details shown in the console
+        self._subscribe([])
+
     def _getGroupIDs(self) -> List[GroupID]:
         return [GroupID.UI]
+
+    def _getCoalescibleMsgIDs(self) -> FrozenSet[MsgID]:
+        # only the latest status values are displayed
+        return COALESCIBLE_INFO_MSG_IDS
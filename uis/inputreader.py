@@ -2,7 +2,9 @@ import logging
 from typing import Optional, List
 
 import exiting
+import globalvars
 import msgconsumer
+from errors import ParameterError
 from groupid import GroupID
 from moduleid import ModuleID
 from msgid import MsgID
@@ -21,10 +23,30 @@ class InputReader(AbstractReader):
 
     def _readMsg(self) -> Optional['Message']:
         line = input("READER ID " + str(self.id) + ": Enter msg:\n")
+        try:
+            return self._parseLine(line)
+        except (ValueError, IndexError, ParameterError) as e:
+            # mistyped numbers, missing arguments, unknown IDs
+            logging.warning("Invalid command " + line + ": " + str(e))
+            return None
+
+    def _parseLine(self, line: str) -> Optional['Message']:
         parts = line.split()  # type: List[str]
         if len(parts) > 0:
             if parts[0] == 'E':
                 exiting.exitCleanly(0)
+            elif parts[0] == 'T':
+                self._dumpTrace()
+                return None
+            elif parts[0] == 'TS' and len(parts) > 1:
+                # trace every n-th message
+                globalvars.dispatchTrace.configure(sampleEvery=int(parts[1]))
+                return None
+            elif parts[0] == 'TF':
+                # trace only listed msgIDs, no msgID = trace all
+                msgIDs = set(MsgID(int(part)) for part in parts[1:])
+                globalvars.dispatchTrace.configure(msgIDs=msgIDs if msgIDs else None, allMsgIDs=not msgIDs)
+                return None
             elif parts[0].isdigit():
                 msg = self._formatMessage(parts)
                 if msg is not None:
@@ -33,6 +55,11 @@ class InputReader(AbstractReader):
         logging.warning("Unknown command " + line)
         return None
 
+    @staticmethod
+    def _dumpTrace():
+        for line in globalvars.dispatchTrace.dump():
+            print(line)
+
     def _formatMessage(self, parts: List[str]) -> Optional['Message']:
         msgID = int(parts[0])
         if msgID == MsgID.SET_VOL.value:
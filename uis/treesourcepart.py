@@ -5,6 +5,7 @@ from dispatcher import Dispatcher
 from moduleid import ModuleID
 from msgid import MsgID
 from msgs.integermsg import BiIntegerMsg, IntegerMsg
+from msgs.message import NO_CORRELATION
 from msgs.nodemsg import NodeMsg, NodeStruct, NodeID
 from msgs.trackmsg import TrackMsg, TrackItem
 from sources.playbackstatus import PlaybackStatus
@@ -17,6 +18,9 @@ if TYPE_CHECKING:
 Source part supporting treesources
 """
 
+# correlationID is transferred as unsigned short
+MAX_CORRELATION_ID = 0xFFFF
+
 
 class TreeSourcePart(SourcePart, abc.ABC):
     # noinspection PyShadowingBuiltins
@@ -25,6 +29,8 @@ class TreeSourcePart(SourcePart, abc.ABC):
         self.name = name
         # currently played trackitem
         self._playingTrackItem = None  # type: Optional[TrackItem]
+        # correlationID of the latest node request, replies to older requests are outdated
+        self._lastCorrelationID = NO_CORRELATION  # type: int
 
     def handleMsgFromSource(self, msg) -> bool:
         if super().handleMsgFromSource(msg):
@@ -35,7 +41,9 @@ class TreeSourcePart(SourcePart, abc.ABC):
             return True
         elif msg.typeID == MsgID.NODE_INFO:
             msg = msg  # type: NodeMsg
-            self._handleNodeInfo(msg.nodeStruct)
+            if msg.correlationID == NO_CORRELATION or msg.correlationID == self._lastCorrelationID:
+                self._handleNodeInfo(msg.nodeStruct)
+            # else reply to a request superseded by a newer one, not matching the screen
             return True
         else:
             return False
@@ -57,13 +65,14 @@ class TreeSourcePart(SourcePart, abc.ABC):
         msg = BiIntegerMsg(value1=nodeID, value2=fromIndex, fromID=self.id,
                            typeID=MsgID.REQ_NODE,
                            forID=self.sourceID)
+        msg.correlationID = self.__nextCorrelationID()
         self.dispatcher.distribute(msg, self.id)
 
     def sendPlayNodeMsg(self, nodeID: NodeID) -> None:
         self.__sendIntegerNodeMsgToSource(MsgID.PLAY_NODE, nodeID)
 
     def sendReqParentNodeMsg(self, nodeID: NodeID) -> None:
-        self.__sendIntegerNodeMsgToSource(MsgID.REQ_PARENT_NODE, nodeID)
+        self.__sendIntegerNodeMsgToSource(MsgID.REQ_PARENT_NODE, nodeID, self.__nextCorrelationID())
 
     def sendCreateBookmarkMsg(self, nodeID: NodeID) -> None:
         self.__sendIntegerNodeMsgToSource(MsgID.CREATE_NODE_BOOKMARK, nodeID)
@@ -71,8 +80,14 @@ class TreeSourcePart(SourcePart, abc.ABC):
     def sendDeleteBookmarkMsg(self, nodeID: NodeID) -> None:
         self.__sendIntegerNodeMsgToSource(MsgID.DELETE_NODE_BOOKMARK, nodeID)
 
-    def __sendIntegerNodeMsgToSource(self, msgID: MsgID, nodeID: NodeID):
+    def __sendIntegerNodeMsgToSource(self, msgID: MsgID, nodeID: NodeID, correlationID: int = NO_CORRELATION):
         msg = IntegerMsg(value=nodeID, fromID=self.id,
                          typeID=msgID,
                          forID=self.sourceID)
+        msg.correlationID = correlationID
         self.dispatcher.distribute(msg, self.id)
+
+    def __nextCorrelationID(self) -> int:
+        # skipping NO_CORRELATION when wrapping around
+        self._lastCorrelationID = self._lastCorrelationID % MAX_CORRELATION_ID + 1
+        return self._lastCorrelationID
@@ -1,13 +1,16 @@
 import logging
-from queue import Empty, Queue
+from queue import Empty
 from typing import Optional, TYPE_CHECKING, List
 
 import globalvars
 from cansendmessage import CanSendMessage
+from dispatcher import encodeGroupIDs
 from groupid import GroupID
 from moduleid import ModuleID
 from msgid import MsgID
+from msgs.batchmsg import BatchMsg
 from msgs.integermsg import IntegerMsg
+from msgqueue import MsgQueue
 from msgs.message import Message
 from remi import App, gui
 from sources.sourcestatus import SourceStatus
@@ -42,7 +45,7 @@ class WebApp(App, CanSendMessage, HasSourceParts):
         ]
 
     # noinspection PyAttributeOutsideInit,PyShadowingBuiltins
-    def main(self, id: ModuleID, dispatcher: 'Dispatcher', queue: Queue) -> gui.Widget:
+    def main(self, id: ModuleID, dispatcher: 'Dispatcher', queue: MsgQueue) -> gui.Widget:
         CanSendMessage.__init__(self, id=id, dispatcher=dispatcher)
         HasSourceParts.__init__(self)
         self._inputQueue = queue
@@ -69,6 +72,9 @@ class WebApp(App, CanSendMessage, HasSourceParts):
 
         # let know the app is running now
         globalvars.webAppRunning = True
+        # re-announcing the UI, the dispatcher replays the current state from its retained cache
+        self.dispatcher.distribute(
+            IntegerMsg(encodeGroupIDs([GroupID.UI]), self.id, MsgID.IN_GROUPS_MSG), self.id)
 
         # returning the root widget
         return self._rootBox
@@ -122,7 +128,11 @@ class WebApp(App, CanSendMessage, HasSourceParts):
             return None
 
     def _handleMsg(self, msg: 'Message'):
-        if msg.typeID == MsgID.CURRENT_VOL_INFO:
+        if msg.typeID == MsgID.BATCH_MSG:
+            msg = msg  # type: BatchMsg
+            for innerMsg in msg.msgs:
+                self._handleMsg(innerMsg)
+        elif msg.typeID == MsgID.CURRENT_VOL_INFO:
             msg = msg  # type: IntegerMsg
             self.setVolume(msg.value)
         elif msg.typeID == MsgID.SOURCE_STATUS_INFO:
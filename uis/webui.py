@@ -1,13 +1,18 @@
 import logging
-from queue import Queue
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Dict, List, FrozenSet, Optional
 
 import globalvars
 from groupid import GroupID
 from moduleid import ModuleID
 from msgconsumer import MsgConsumer
+from msgid import MsgID
+from msgqueue import COALESCIBLE_INFO_MSG_IDS, MsgQueue, QueuePolicy
+from msgs.batchmsg import BatchMsg
+from msgs.integermsg import IntegerMsg
 from msgs.message import Message
+from msgs.subscriptionsmsg import FILTERABLE_MSG_IDS
 from remi import Server
+from sources.sourcestatus import SourceStatus
 from uis.webapp import WebApp
 
 if TYPE_CHECKING:
@@ -17,14 +22,19 @@ if TYPE_CHECKING:
 WEB UI 
 '''
 
+# messages waiting for the idle() cycle of the web app
+APP_QUEUE_POLICY = QueuePolicy(capacity=200)
+
 
 class WebUI(MsgConsumer):
     # noinspection PyShadowingBuiltins
     def __init__(self, id: ModuleID, name: str, dispatcher: 'Dispatcher', port: int):
         # call the thread class
         super().__init__(id=id, name=name, dispatcher=dispatcher)
-        # to make it available to webapp
-        self._appQueue = Queue()
+        # to make it available to webapp. Bounded - the browser can be gone while the app still exists
+        self._appQueue = MsgQueue(COALESCIBLE_INFO_MSG_IDS, queuePolicy=APP_QUEUE_POLICY)
+        # activated source with track details shown in the web app
+        self._subscribedSourceID = None  # type: Optional[ModuleID]
         self._server = self._startServer(WebApp, address='0.0.0.0', port=port, start_browser=True)
 
     def stop(self):
@@ -32,13 +42,41 @@ class WebUI(MsgConsumer):
         self._server.stop()
         globalvars.stopWebApp = True
 
+    def _initializeInThread(self):
+        super()._initializeInThread()
+        self._subscribe([])
+
     def _consume(self, msg: 'Message'):
         """
         forward messages to the app only when running, otherwise drop them
         """
+        if msg.typeID == MsgID.SOURCE_STATUS_INFO:
+            self._updateSubscriptions(msg)
         if globalvars.webAppRunning:
             self._appQueue.put(msg)
 
+    def _consumeBatch(self, batch: 'BatchMsg') -> None:
+        """
+        The whole batch is handled in one idle() cycle of the app - one redraw
+        """
+        for msg in batch.msgs:
+            if msg.typeID == MsgID.SOURCE_STATUS_INFO:
+                self._updateSubscriptions(msg)
+        if globalvars.webAppRunning:
+            self._appQueue.put(batch)
+
+    def _updateSubscriptions(self, msg: 'IntegerMsg') -> None:
+        """
+        Track details are displayed for the activated source only
+        """
+        status = SourceStatus(msg.value)
+        if status == SourceStatus.ACTIVATED and self._subscribedSourceID != msg.fromID:
+            self._subscribedSourceID = msg.fromID
+            self._subscribe((msgID, msg.fromID) for msgID in FILTERABLE_MSG_IDS)
+        elif status != SourceStatus.ACTIVATED and self._subscribedSourceID == msg.fromID:
+            self._subscribedSourceID = None
+            self._subscribe([])
+
     def _startServer(self, mainGuiClass, **kwargs) -> 'Server':
         """This method starts the webserver with a specific App subclass."""
         logging.getLogger('remi').setLevel(level=logging.INFO)
@@ -49,6 +87,15 @@ class WebUI(MsgConsumer):
     def _getGroupIDs(self) -> List[GroupID]:
         return [GroupID.UI]
 
+    def getQueues(self) -> Dict[str, MsgQueue]:
+        queues = super().getQueues()
+        queues['appQueue'] = self._appQueue
+        return queues
+
+    def _getCoalescibleMsgIDs(self) -> FrozenSet[MsgID]:
+        # only the latest status values are displayed
+        return COALESCIBLE_INFO_MSG_IDS
+
 
 class MyServer(Server):
     # I do not need the server to keep cycling
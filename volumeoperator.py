@@ -1,8 +1,8 @@
 from typing import TYPE_CHECKING
 
+from asyncmsgconsumer import AsyncMsgConsumer
 from groupid import GroupID
 from moduleid import ModuleID
-from msgconsumer import MsgConsumer
 from msgid import MsgID
 from msgs.integermsg import IntegerMsg
 from msgs.message import Message
@@ -17,9 +17,8 @@ Handles physical volume control
 '''
 
 
-class VolumeOperator(MsgConsumer):
+class VolumeOperator(AsyncMsgConsumer):
     def __init__(self, dispatcher: 'Dispatcher'):
-        # call the thread class
         super().__init__(id=ModuleID.VOLUME_OPERATOR, name='VolOp', dispatcher=dispatcher)
 
     def _initializeInThread(self):